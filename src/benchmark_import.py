@@ -0,0 +1,85 @@
+"""
+Замер скорости импорта товаров: построчный INSERT с COMMIT на каждую
+строку (как импорт работал раньше), INSERT пачками (execute_many) и COPY.
+
+Запуск:  python benchmark_import.py --rows 20000
+Синтетические товары получают артикулы BENCH-*, после замера удаляются.
+Ускорение считается относительно построчного режима.
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from database import Database
+from import_data import DataImporter
+
+
+class RowByRowDatabase(Database):
+    """execute_many по-старому: отдельный INSERT и COMMIT на каждую строку"""
+
+    def execute_many(self, query, rows, page_size=1000):
+        failed = 0
+        for values in rows:
+            if not self.execute_update(query, values):
+                failed += 1
+        return failed == 0
+
+
+def make_products(count):
+    """Синтетический прайс-лист в формате Tovar.xlsx"""
+    return pd.DataFrame(
+        {
+            "Артикул": [f"BENCH-{i}" for i in range(count)],
+            "Наименование товара": "Ботинки",
+            "Единица измерения": "шт.",
+            "Цена": [1000 + i % 5000 for i in range(count)],
+            "Поставщик": "Kari",
+            "Производитель": "Kari",
+            "Категория товара": "Женская обувь",
+            "Действующая скидка": [i % 30 for i in range(count)],
+            "Кол-во на складе": [i % 50 for i in range(count)],
+            "Описание товара": "Синтетический товар для замера импорта",
+            "Фото": "",
+        }
+    )
+
+
+def run(importer, df):
+    importer.db.execute_update("DELETE FROM products WHERE article LIKE 'BENCH-%%'")
+    started = time.perf_counter()
+    importer.load_products(df)
+    elapsed = time.perf_counter() - started
+    importer.db.execute_update("DELETE FROM products WHERE article LIKE 'BENCH-%%'")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    Database().bootstrap()
+    df = make_products(args.rows)
+    print(f"Строк: {args.rows}")
+
+    row_by_row = DataImporter(bulk=False)
+    row_by_row.db = RowByRowDatabase()
+    variants = [
+        ("построчно", row_by_row),
+        ("пачками", DataImporter(bulk=False)),
+        ("COPY", DataImporter(bulk=True)),
+    ]
+    baseline = None
+    for title, importer in variants:
+        elapsed = run(importer, df)
+        baseline = baseline or elapsed
+        print(
+            f" {title:<10} {elapsed:8.2f} с  {args.rows / elapsed:10.0f} строк/с"
+            f"  x{baseline / elapsed:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Замер памяти под загруженные товары: все колонки кортежами против
+записей Product в проекции карточек (укороченное описание).
+
+Запуск:  python benchmark_memory.py --rows 100000 --description 1000
+Товары создаются в таблице bench_products (как в benchmark_search) с
+описанием длиной --description символов; после замера таблица удаляется.
+Печатается память, занятая загруженными строками, и пик при загрузке
+(tracemalloc).
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmark_search import fill
+from catalog import PRODUCT_CARD_COLUMNS, PRODUCT_COLUMNS, products_from
+from database import Database
+from models import Product
+
+
+def measure(load):
+    """(строк, занято МБ, пик МБ, секунд) для load() -> список строк"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = load()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(rows), current / 2**20, peak / 2**20, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--description", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = Database()
+    db.bootstrap()
+    fill(db, args.rows)
+    db.execute_update(
+        "UPDATE bench_products "
+        "SET description = rpad(description, %s, ' текст описания')",
+        (args.description,),
+    )
+
+    full = f"SELECT {PRODUCT_COLUMNS} FROM {products_from('bench_products')}"
+    cards = f"SELECT {PRODUCT_CARD_COLUMNS} FROM {products_from('bench_products')}"
+    variants = [
+        ("кортежи, все колонки", lambda: db.execute_query(full)),
+        ("Product, карточки", lambda: [
+            Product._make(row) for row in db.iter_query(cards)
+        ]),
+    ]
+    try:
+        print(f"Товаров: {args.rows}, описание: {args.description} символов")
+        print(f" {'вариант':<24}{'занято':>10}{'пик':>10}{'время':>9}")
+        for title, load in variants:
+            count, current, peak, elapsed = measure(load)
+            if count != args.rows:
+                print(f" ⚠ {title}: загружено {count} строк")
+            print(f" {title:<24}{current:7.1f} МБ{peak:7.1f} МБ{elapsed:7.2f} с")
+    finally:
+        db.execute_update("DROP TABLE IF EXISTS bench_products")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Замер частых запросов: обычное выполнение против подготовленного (PREPARE).
+
+Запуск:  python benchmark_prepared.py --calls 2000
+Каждый запрос выполняется --calls раз на одном соединении обоими
+способами; печатается среднее время вызова в микросекундах.
+"""
+
+import argparse
+import time
+
+from catalog import (
+    ALL_SUPPLIERS, PRODUCT_COLUMNS, build_products_query, products_from,
+)
+from config import Config
+from database import Database, execute_prepared
+from order_window import ORDER_CARD_COLUMNS, ORDER_ITEMS_JOIN
+
+ORDERS_PAGE = "SELECT " + ORDER_CARD_COLUMNS + """
+    FROM orders o
+    LEFT JOIN pickup_points p ON o.pickup_point_id = p.id
+""" + ORDER_ITEMS_JOIN + """
+    WHERE o.status = %s
+    ORDER BY o.order_number DESC LIMIT %s
+"""
+
+
+def hot_queries(db):
+    """(название, запрос, параметры) - запросы с горячих путей интерфейса"""
+    product_id = (db.execute_query("SELECT min(id) FROM products") or [(0,)])[0][0]
+    page, page_params = build_products_query(
+        "", ALL_SUPPLIERS, "По возрастанию", limit=Config.PAGE_SIZE
+    )
+    return [
+        (
+            "вход",
+            "SELECT role, full_name FROM users WHERE login = %s AND password = %s",
+            ("nobody", "nobody"),
+        ),
+        (
+            "товар по id",
+            f"SELECT {PRODUCT_COLUMNS} FROM {products_from()} WHERE p.id = %s",
+            (product_id,),
+        ),
+        ("страница товаров", page, page_params),
+        ("страница заказов", ORDERS_PAGE, ("Новый", Config.PAGE_SIZE)),
+    ]
+
+
+def measure(cur, run, calls):
+    run()  # первый вызов (и PREPARE) не считается
+    started = time.perf_counter()
+    for _ in range(calls):
+        run()
+        cur.fetchall()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    db = Database()
+    db.bootstrap()
+    print(f"Вызовов на запрос: {args.calls}")
+    print(f" {'запрос':<18}{'обычный':>12}{'PREPARE':>12}")
+    with db.connection() as conn, conn.cursor() as cur:
+        for title, query, params in hot_queries(db):
+            plain = measure(cur, lambda: cur.execute(query, params), args.calls)
+            prepared = measure(
+                cur, lambda: execute_prepared(cur, query, params), args.calls
+            )
+            print(f" {title:<18}{plain:9.0f} мкс{prepared:9.0f} мкс")
+            conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
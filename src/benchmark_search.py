@@ -0,0 +1,100 @@
+"""
+Замер поиска по каталогу на синтетических данных.
+
+Запуск:  python benchmark_search.py --rows 100000 1000000
+Для каждого размера создаётся таблица bench_products с теми же колонками,
+индексами и поисковым триггером, что и products (категории, производители
+и поставщики - из общих справочников); печатается время запроса и план
+EXPLAIN. После замера таблица удаляется.
+"""
+
+import argparse
+import time
+
+from database import Database
+from catalog import (
+    ALL_SUPPLIERS, build_products_query, ensure_references, reference_id_sql,
+)
+
+SEARCHES = ["ботинки", "kari женская", "rieker", "риекер", "F635"]
+
+CATEGORIES = ["Женская обувь", "Мужская обувь"]
+MANUFACTURERS = ["Kari", "Marco Tozzi", "Rieker", "Alessio Nesca", "CROSBY"]
+SUPPLIERS = ["Kari", "Обувь для вас"]
+
+
+def _pick(field, names, modulo):
+    """id справочника для строки g: names[g % modulo]"""
+    array = ", ".join(f"'{name}'" for name in names)
+    return reference_id_sql(field, f"(ARRAY[{array}])[g %% {modulo} + 1]")
+
+
+def fill(db, rows):
+    db.execute_update("DROP TABLE IF EXISTS bench_products")
+    db.execute_update(
+        "CREATE TABLE bench_products (LIKE products INCLUDING ALL)"
+    )
+    db.execute_update(
+        "CREATE TRIGGER bench_products_search BEFORE INSERT ON bench_products "
+        "FOR EACH ROW EXECUTE FUNCTION products_search_refresh()"
+    )
+    ensure_references(db, {
+        "category": CATEGORIES,
+        "manufacturer": MANUFACTURERS,
+        "supplier": SUPPLIERS,
+    })
+    db.execute_update(
+        f"""
+        INSERT INTO bench_products
+            (article, name, category_id, description, manufacturer_id,
+             supplier_id, price, unit, stock, discount, photo_path)
+        SELECT
+            'B' || g,
+            (ARRAY['Ботинки', 'Туфли', 'Кроссовки', 'Сапоги', 'Кеды'])[g %% 5 + 1],
+            {_pick("category", CATEGORIES, 2)},
+            'Описание ' || md5(g::text),
+            {_pick("manufacturer", MANUFACTURERS, 5)},
+            {_pick("supplier", SUPPLIERS, 2)},
+            1000 + g %% 5000, 'шт.', g %% 50, g %% 30, ''
+        FROM generate_series(1, %s) AS g
+        """,
+        (rows,),
+    )
+    db.execute_update("ANALYZE bench_products")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    args = parser.parse_args()
+
+    db = Database()
+    db.bootstrap()
+    trigram = db.has_extension("pg_trgm")
+    print(f"pg_trgm: {'да' if trigram else 'нет'}")
+
+    try:
+        for rows in args.rows:
+            print(f"\n=== {rows} товаров ===")
+            fill(db, rows)
+            for search in SEARCHES:
+                query, params = build_products_query(
+                    search, ALL_SUPPLIERS, "Нет",
+                    trigram=trigram, table="bench_products",
+                )
+                started = time.perf_counter()
+                found = db.execute_query(query, params)
+                elapsed = (time.perf_counter() - started) * 1000
+                print(f"\n'{search}': {len(found or [])} строк за {elapsed:.1f} мс")
+
+                plan = db.execute_query(
+                    "EXPLAIN (ANALYZE, BUFFERS) " + query, params
+                )
+                for (line,) in plan or []:
+                    print("   " + line)
+    finally:
+        db.execute_update("DROP TABLE IF EXISTS bench_products")
+
+
+if __name__ == "__main__":
+    main()
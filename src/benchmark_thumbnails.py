@@ -0,0 +1,54 @@
+"""
+Замер отрисовки миниатюр каталога: холодный кэш, диск, память.
+
+Запуск:  python benchmark_thumbnails.py --cards 300
+Каждый проход запрашивает миниатюры для --cards карточек (фото из
+data/product_images по кругу), как это делает главное окно. Нужен дисплей:
+PhotoImage создаётся в скрытом окне Tk.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tkinter as tk
+
+from config import Config
+from image_cache import ThumbnailCache
+
+
+def render(cache, photos, cards):
+    started = time.perf_counter()
+    for i in range(cards):
+        cache.get(photos[i % len(photos)])
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cards", type=int, default=300)
+    args = parser.parse_args()
+
+    images_dir = os.path.join(Config.DATA_DIR, "product_images")
+    photos = sorted(os.path.join(images_dir, f) for f in os.listdir(images_dir))
+
+    root = tk.Tk()
+    root.withdraw()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = ThumbnailCache(cache_dir=cache_dir)
+        # Память вмещает только пару миниатюр - каждый раз идём на диск
+        disk = ThumbnailCache(cache_dir=cache_dir, max_bytes=1)
+
+        results = [
+            ("холодный (декодирование)", render(cold, photos, len(photos))),
+            ("диск", render(disk, photos, args.cards)),
+            ("память", render(cold, photos, args.cards)),
+        ]
+        for title, elapsed in results:
+            print(f" {title:<26} {elapsed:9.1f} мс")
+        print(f" статистика: {cold.stats()}")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Замер проверки строк товаров: построчно (iterrows) против векторной.
+
+Запуск:  python benchmark_validation.py --rows 1000000
+БД не нужна: сравнивается только подготовка строк к загрузке.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from import_validation import frame_rows, validate_products
+
+
+def make_products(count):
+    """Синтетический прайс-лист; примерно 1% строк с ошибками"""
+    rng = np.random.default_rng(0)
+    price = rng.integers(100, 10000, count).astype(object)
+    price[rng.random(count) < 0.005] = "нет"
+    return pd.DataFrame(
+        {
+            "Артикул": [f"V-{i}" for i in range(count)],
+            "Наименование товара": "Ботинки",
+            "Единица измерения": "шт.",
+            "Цена": price,
+            "Поставщик": "Kari",
+            "Производитель": "Kari",
+            "Категория товара": "Женская обувь",
+            "Действующая скидка": rng.integers(0, 105, count),
+            "Кол-во на складе": rng.integers(-1, 50, count),
+            "Описание товара": "Описание",
+            "Фото": "",
+        }
+    )
+
+
+def per_row(df, photo_dir):
+    """Прежний способ: преобразование полей внутри цикла по строкам"""
+    rows, rejected = [], 0
+    for _, row in df.iterrows():
+        try:
+            photo = str(row["Фото"]) if pd.notna(row["Фото"]) else ""
+            discount = int(row["Действующая скидка"])
+            stock = int(row["Кол-во на складе"])
+            if not 0 <= discount <= 100 or stock < 0:
+                raise ValueError("вне диапазона")
+            rows.append((
+                str(row["Артикул"]),
+                str(row["Наименование товара"]),
+                str(row["Категория товара"]),
+                str(row["Описание товара"]) if pd.notna(row["Описание товара"]) else "",
+                str(row["Производитель"]),
+                str(row["Поставщик"]),
+                float(row["Цена"]),
+                str(row["Единица измерения"]),
+                stock,
+                discount,
+                os.path.join(photo_dir, photo.strip()) if photo.strip() else "",
+            ))
+        except Exception:
+            rejected += 1
+    return len(rows), rejected
+
+
+def vectorized(df, photo_dir):
+    clean, rejected = validate_products(df, photo_dir)
+    return sum(1 for _ in frame_rows(clean)), len(rejected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    df = make_products(args.rows)
+    print(f"Строк: {args.rows}")
+    for title, run in (("построчно", per_row), ("векторно", vectorized)):
+        started = time.perf_counter()
+        clean, rejected = run(df, "product_images")
+        elapsed = time.perf_counter() - started
+        print(
+            f" {title:<10} {elapsed:8.2f} с  "
+            f"годных {clean}, отклонено {rejected}"
+        )
+
+
+if __name__ == "__main__":
+    main()
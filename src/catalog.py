@@ -0,0 +1,197 @@
+"""Запросы к каталогу товаров (поиск, фильтр по поставщику, сортировка)"""
+
+import re
+
+from models import Product
+
+ALL_SUPPLIERS = "Все поставщики"
+
+# Справочники товаров: название поля -> (таблица, колонка products с id)
+REFERENCES = {
+    "category": ("categories", "category_id"),
+    "manufacturer": ("manufacturers", "manufacturer_id"),
+    "supplier": ("suppliers", "supplier_id"),
+}
+
+# Символов описания в карточке каталога
+DESCRIPTION_PREVIEW = 150
+
+
+def _product_columns(description):
+    return (
+        f"p.id, p.article, p.name, coalesce(c.name, '') AS category, {description}, "
+        "coalesce(m.name, '') AS manufacturer, coalesce(s.name, '') AS supplier, "
+        "p.price, p.unit, p.stock, p.discount, p.photo_path"
+    )
+
+
+# Все колонки товара (окно редактирования)
+PRODUCT_COLUMNS = _product_columns("p.description")
+# Карточки каталога: те же колонки, но от описания - только начало,
+# чтобы страница товаров не тянула длинные тексты целиком
+PRODUCT_CARD_COLUMNS = _product_columns(
+    f"CASE WHEN length(p.description) > {DESCRIPTION_PREVIEW} "
+    f"THEN left(p.description, {DESCRIPTION_PREVIEW - 1}) || '…' "
+    "ELSE p.description END AS description"
+)
+
+# Позиции ключей сортировки в строке PRODUCT_COLUMNS
+ID, ARTICLE, STOCK = 0, 1, 9
+
+
+def products_from(table="products"):
+    """FROM для PRODUCT_COLUMNS: товары (алиас p) с названиями из справочников"""
+    return (
+        f"{table} p "
+        "LEFT JOIN categories c ON c.id = p.category_id "
+        "LEFT JOIN manufacturers m ON m.id = p.manufacturer_id "
+        "LEFT JOIN suppliers s ON s.id = p.supplier_id"
+    )
+
+
+def reference_id_sql(field, value="%s"):
+    """Подзапрос id справочника по названию: value - параметр или колонка"""
+    table = REFERENCES[field][0]
+    return f"(SELECT id FROM {table} WHERE name = {value})"
+
+
+def ensure_references(db, names):
+    """Добавить в справочники недостающие названия.
+
+    names - {"category": [...], "manufacturer": [...], "supplier": [...]},
+    пустые названия пропускаются (у товара будет NULL).
+    Возвращает True, если все справочники обновлены (внутри
+    db.transaction() ошибка не возвращается, а выбрасывается).
+    """
+    for field, values in names.items():
+        values = sorted({str(v) for v in values if v})
+        if not values:
+            continue
+        ok = db.execute_update(
+            f"INSERT INTO {REFERENCES[field][0]} (name) "
+            "SELECT unnest(%s::TEXT[]) ON CONFLICT (name) DO NOTHING",
+            (values,),
+        )
+        if not ok:
+            return False
+    return True
+
+
+def load_product(db, product_id):
+    """Товар целиком (с полным описанием) для окна редактирования.
+
+    Возвращает Product или None, если товар не найден или запрос не удался.
+    """
+    rows = db.execute_query(
+        f"SELECT {PRODUCT_COLUMNS} FROM {products_from()} WHERE p.id = %s",
+        (product_id,),
+        prepare=True,
+    )
+    return Product._make(rows[0]) if rows else None
+
+
+def load_product_cards(db, ids):
+    """Товары с данными id в проекции карточек (Product); None при ошибке"""
+    rows = db.execute_query(
+        f"SELECT {PRODUCT_CARD_COLUMNS} FROM {products_from()} WHERE p.id = ANY(%s)",
+        (list(ids),),
+        prepare=True,
+    )
+    return None if rows is None else Product.from_rows(rows)
+
+
+def search_terms(search):
+    """Разбить строку поиска на слова: "Туфли kari" -> ["туфли", "kari"]"""
+    return [t for t in search.strip().lower().split() if t]
+
+
+def _tsquery_words(terms):
+    """Слова, безопасные для to_tsquery (без операторов & | ! : ( ) ')"""
+    words = []
+    for term in terms:
+        words += re.findall(r"\w+", term)
+    return words
+
+
+def build_products_query(search, supplier, sort, trigram=True, table="products",
+                         limit=None, after=None, offset=0,
+                         columns=PRODUCT_CARD_COLUMNS):
+    """Собрать SELECT товаров с учётом поиска/фильтра/сортировки.
+
+    Поиск идёт по индексируемым колонкам:
+      search_text   - склейка всех текстовых полей в нижнем регистре
+                      (GIN gin_trgm_ops: подстрока LIKE и опечатки через <%);
+      search_vector - tsvector (russian + simple) для поиска по основам слов.
+    Каждое слово должно найтись (AND между словами), результат без явной
+    сортировки упорядочивается по релевантности.
+
+    trigram=False - pg_trgm не установлен: без поиска с опечатками.
+
+    Постраничная загрузка: limit - размер страницы, after - последняя строка
+    предыдущей страницы. Страницы выбираются по ключу (keyset): article
+    или (stock, id), поэтому следующая страница стоит столько же, сколько
+    первая. Порядок по релевантности вычисляется, а не хранится, и для него
+    используется offset - число уже загруженных строк.
+    columns - выбираемые колонки (по умолчанию - для карточек каталога).
+    Возвращает (query, params).
+    """
+    terms = search_terms(search)
+    words = _tsquery_words(terms)
+
+    params = []
+    select = f"SELECT {columns} FROM {products_from(table)} WHERE 1=1"
+    where = ""
+
+    # фильтр по поставщику (по индексу supplier_id)
+    if supplier != ALL_SUPPLIERS:
+        where += f" AND p.supplier_id = {reference_id_sql('supplier')}"
+        params.append(supplier)
+
+    # ПОИСК ПО НЕСКОЛЬКИМ СЛОВАМ (OR по способам совпадения, AND между словами)
+    for term in terms:
+        like = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        where += " AND (p.search_text LIKE %s"
+        params.append(like)
+        if re.search(r"\w", term):
+            where += " OR p.search_vector @@ plainto_tsquery('russian', %s)"
+            params.append(term)
+        if trigram:
+            where += " OR %s <%% p.search_text"
+            params.append(term)
+        where += ")"
+
+    # сортировка и ключ страницы
+    order_params = []
+    ranked = False
+    if sort == "По возрастанию":
+        order = " ORDER BY p.stock ASC, p.id ASC"
+        if after is not None:
+            where += " AND (p.stock, p.id) > (%s, %s)"
+            params += [after[STOCK], after[ID]]
+    elif sort == "По убыванию":
+        order = " ORDER BY p.stock DESC, p.id DESC"
+        if after is not None:
+            where += " AND (p.stock, p.id) < (%s, %s)"
+            params += [after[STOCK], after[ID]]
+    elif words:
+        ranked = True
+        rank = "ts_rank(p.search_vector, to_tsquery('russian', %s))"
+        order_params.append(" | ".join(words))
+        if trigram:
+            rank += " + word_similarity(%s, p.search_text)"
+            order_params.append(" ".join(terms))
+        order = f" ORDER BY {rank} DESC, p.article"
+    else:
+        order = " ORDER BY p.article"
+        if after is not None:
+            where += " AND p.article > %s"
+            params.append(after[ARTICLE])
+
+    if limit is not None:
+        order += " LIMIT %s"
+        order_params.append(limit)
+        if ranked and offset:
+            order += " OFFSET %s"
+            order_params.append(offset)
+
+    return select + where + order, params + order_params
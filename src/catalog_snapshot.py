@@ -0,0 +1,209 @@
+"""Снимок каталога товаров в памяти: фильтр, сортировка и поиск без БД"""
+
+import threading
+import time
+
+import numpy as np
+
+from catalog import (
+    ALL_SUPPLIERS, PRODUCT_CARD_COLUMNS, products_from, search_terms,
+)
+from config import Config
+from database import Database, on_table_change
+from models import Product
+from query_cache import ALL_TABLES
+
+# Таблицы, изменения которых меняют строки снимка
+CATALOG_TABLES = {"products", "categories", "manufacturers", "suppliers"}
+
+# Изменения перечитываются с запасом: транзакция, начатая раньше последней
+# сверки, могла закоммитить строки с updated_at меньше отметки
+WATERMARK_OVERLAP = "1 minute"
+
+
+class _Columns:
+    """Колоночное представление строк снимка (неизменяемое после сборки)"""
+
+    __slots__ = ("rows", "ids", "stock", "article_rank", "supplier_codes",
+                 "suppliers", "tokens")
+
+    def __init__(self, rows, search_texts):
+        self.rows = rows
+        count = len(rows)
+        self.ids = np.fromiter((r.id for r in rows), np.int64, count)
+        # NULL в остатке - в конце по возрастанию, как в PostgreSQL
+        missing = np.iinfo(np.int64).max
+        self.stock = np.fromiter(
+            (missing if r.stock is None else r.stock for r in rows),
+            np.int64, count,
+        )
+
+        # Место строки в порядке артикулов
+        order = sorted(range(count), key=lambda i: rows[i].article or "")
+        self.article_rank = np.empty(count, np.int64)
+        self.article_rank[order] = np.arange(count)
+
+        # Поставщики - коды вместо строк
+        self.suppliers = {}
+        self.supplier_codes = np.fromiter(
+            (self.suppliers.setdefault(r.supplier, len(self.suppliers))
+             for r in rows),
+            np.int64, count,
+        )
+
+        # Слово search_text -> номера строк, где оно встречается
+        postings = {}
+        for position, text in enumerate(search_texts):
+            for token in set((text or "").split()):
+                postings.setdefault(token, []).append(position)
+        self.tokens = {
+            token: np.array(positions, np.int64)
+            for token, positions in postings.items()
+        }
+
+    def term_mask(self, term):
+        """Строки, в search_text которых есть подстрока term.
+
+        term не содержит пробелов, поэтому подстрока целиком лежит в одном
+        слове: проверяются только слова словаря, а не тексты всех строк.
+        """
+        mask = np.zeros(len(self.rows), bool)
+        for token, positions in self.tokens.items():
+            if term in token:
+                mask[positions] = True
+        return mask
+
+
+class CatalogSnapshot:
+    """Товары каталога в памяти процесса в виде колонок NumPy.
+
+    Товары хранятся записями Product в проекции карточек каталога
+    (PRODUCT_CARD_COLUMNS, описание укорочено).
+    query() повторяет фильтр, сортировку и поиск build_products_query без
+    обращения к БД. Отличия: поиск - только по подстроке search_text
+    (как LIKE), без морфологии и опечаток, а результат поиска без явной
+    сортировки упорядочен по артикулу, а не по релевантности.
+
+    refresh() догружает только товары с updated_at новее последней сверки;
+    удалённые товары обнаруживаются по расхождению числа строк. Сверка
+    выполняется после уведомления об изменении таблиц каталога
+    (on_table_change) или если снимок старше max_age секунд.
+    query() и refresh() вызываются из одного потока (цикла Tk).
+    """
+
+    def __init__(self, db=None, max_age=None):
+        self.db = db or Database()
+        self.max_age = Config.LOCAL_CATALOG_MAX_AGE if max_age is None else max_age
+        self._rows = {}     # id -> Product
+        self._search = {}   # id -> search_text
+        self._watermark = None
+        self._checked = None
+        self._dirty = True
+        self._columns = _Columns([], [])
+        on_table_change(self._on_change)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _on_change(self, tables):
+        if ALL_TABLES in tables or tables & CATALOG_TABLES:
+            self._dirty = True
+
+    def refresh(self, force=False):
+        """Догрузить изменения из БД; True - снимок изменился"""
+        stale = (
+            self._checked is None
+            or time.monotonic() - self._checked >= self.max_age
+        )
+        if not (force or self._dirty or stale):
+            return False
+        # Сбрасывается до запроса: изменение во время сверки снова его выставит
+        self._dirty = False
+        self._checked = time.monotonic()
+
+        query = (
+            f"SELECT {PRODUCT_CARD_COLUMNS}, p.search_text, p.updated_at "
+            f"FROM {products_from()}"
+        )
+        params = None
+        if self._watermark is not None:
+            query += f" WHERE p.updated_at > %s - INTERVAL '{WATERMARK_OVERLAP}'"
+            params = (self._watermark,)
+        # Строки разбираются по мере получения с сервера: первая загрузка
+        # всего каталога не держит в памяти полный список кортежей
+        modified = False
+        watermark = self._watermark
+        try:
+            for row in self.db.iter_query(query, params):
+                product = Product._make(row[:-2])
+                search_text, updated_at = row[-2], row[-1]
+                if self._rows.get(product.id) != product:
+                    self._rows[product.id] = product
+                    self._search[product.id] = search_text
+                    modified = True
+                if updated_at is not None and (
+                    watermark is None or updated_at > watermark
+                ):
+                    watermark = updated_at
+            # Отметка сдвигается, только если прочитаны все изменения
+            self._watermark = watermark
+
+            counted = self.db.execute_query("SELECT count(*) FROM products")
+            if counted is None:
+                self._dirty = True
+            elif counted[0][0] != len(self._rows):
+                existing = {
+                    product_id
+                    for (product_id,) in self.db.iter_query("SELECT id FROM products")
+                }
+                for product_id in list(self._rows):
+                    if product_id not in existing:
+                        del self._rows[product_id]
+                        del self._search[product_id]
+                        modified = True
+        except Exception as e:
+            print(f"❌ Ошибка обновления снимка каталога: {e}")
+            self._dirty = True
+
+        if modified:
+            ids = list(self._rows)
+            self._columns = _Columns(
+                [self._rows[i] for i in ids], [self._search[i] for i in ids]
+            )
+        return modified
+
+    def query(self, search, supplier, sort):
+        """Товары (Product) с учётом поиска, фильтра и сортировки"""
+        columns = self._columns
+        mask = np.ones(len(columns.rows), bool)
+
+        if supplier != ALL_SUPPLIERS:
+            code = columns.suppliers.get(supplier)
+            if code is None:
+                return []
+            mask &= columns.supplier_codes == code
+
+        for term in search_terms(search):
+            mask &= columns.term_mask(term)
+
+        found = np.flatnonzero(mask)
+        if sort in ("По возрастанию", "По убыванию"):
+            found = found[np.lexsort((columns.ids[found], columns.stock[found]))]
+            if sort == "По убыванию":
+                found = found[::-1]
+        else:
+            found = found[np.argsort(columns.article_rank[found])]
+        return [columns.rows[i] for i in found]
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_catalog_snapshot():
+    """Общий для процесса снимок каталога (создаётся при первом обращении)"""
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = CatalogSnapshot()
+        return _snapshot
@@ -14,6 +14,15 @@ class Config:
         'client_encoding': 'UTF8'
     }
 
+    # Общий пул соединений процесса
+    DB_POOL = {
+        'min_size': 1,              # столько соединений держим открытыми всегда
+        'max_size': 5,              # больше соединений не открываем, ждём свободное
+        'checkout_timeout': 10,     # сек ожидания свободного соединения
+        'health_check_after': 30,   # сек простоя, после которых соединение проверяется SELECT 1
+        'idle_timeout': 300,        # сек простоя, после которых лишние соединения закрываются
+    }
+
     # Пути к файлам (относительно src/)
     BASE_DIR = os.path.dirname(os.path.dirname(__file__))
     DATA_DIR = os.path.join(BASE_DIR, 'data')
@@ -24,6 +33,58 @@ class Config:
     LOGO_PATH = os.path.join(RESOURCES_DIR, 'logo.png')
     PLACEHOLDER_IMAGE = os.path.join(RESOURCES_DIR, 'picture.png')
 
+    # Кэш миниатюр товаров
+    THUMB_CACHE_DIR = os.path.join(BASE_DIR, '.cache', 'thumbnails')
+    THUMB_CACHE_MEMORY_BYTES = 32 * 1024 * 1024
+    IMAGE_WORKERS = 4               # потоков для фонового декодирования фото
+
+    # Поиск: пауза после последнего нажатия клавиши перед запросом (мс)
+    SEARCH_DEBOUNCE_MS = 300
+
+    # Подготовленных запросов (PREPARE) на одно соединение пула, не больше
+    PREPARED_STATEMENTS = 50
+
+    # Кэш результатов запросов каталога (execute_query(..., cache=True)):
+    # записей не больше max_entries, каждая живёт не дольше ttl секунд
+    QUERY_CACHE = {'max_entries': 256, 'ttl': 60}
+    # Канал LISTEN/NOTIFY, по которому рассылаются имена изменённых таблиц
+    QUERY_CACHE_CHANNEL = 'table_changed'
+    # Канал, по которому триггеры products и orders рассылают изменённые
+    # строки (операция и id); окна по нему обновляют отдельные карточки.
+    # Если запрос изменил больше ROW_CHANGES_MAX_IDS строк, id не
+    # передаются и окно перечитывает загруженный список целиком
+    ROW_CHANGES_CHANNEL = 'row_changed'
+    ROW_CHANGES_MAX_IDS = 200
+
+    # Размер страницы при постраничной загрузке товаров и заказов
+    PAGE_SIZE = 100
+
+    # Строк, получаемых за одно обращение к серверу при потоковом чтении
+    # (Database.iter_query, серверный курсор)
+    QUERY_ITERSIZE = 2000
+
+    # Локальный каталог: товары один раз загружаются в память, а фильтр,
+    # сортировка и поиск в главном окне выполняются без запросов к БД.
+    # Снимок догружает изменения по уведомлениям БД и не реже, чем раз
+    # в LOCAL_CATALOG_MAX_AGE секунд
+    LOCAL_CATALOG = False
+    LOCAL_CATALOG_MAX_AGE = 30
+
+    # Строк в одной пачке потокового импорта (чтение файла и COPY в БД)
+    IMPORT_BATCH_ROWS = 10000
+
+    # Процессов для параллельных этапов импорта (1 - этапы по очереди)
+    IMPORT_WORKERS = 3
+
+    # Сколько ждать остановки фонового импорта при выходе из приложения (сек)
+    IMPORT_STOP_TIMEOUT = 30
+
+    # Куда записываются отчёты об отклонённых при импорте строках
+    IMPORT_REPORT_DIR = os.path.join(BASE_DIR, 'import_reports')
+
+    # Пауза между импортами в режиме python -m src.import_data --watch (сек)
+    IMPORT_WATCH_INTERVAL = 60
+
     # Роли пользователей
     ROLES = {
         'guest': 'Гость',
@@ -1,110 +1,1148 @@
+import hashlib
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.extras
 from config import Config
+from query_cache import CacheListener, QueryCache, read_tables, write_tables
+
+
+def _copy_value(value):
+    """Значение в текстовом формате COPY (NULL -> \\N, экранирование спецсимволов)"""
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class _CopyStream:
+    """Файлоподобный объект для COPY FROM STDIN поверх итератора строк.
+
+    Строки формируются по мере чтения, поэтому весь набор данных
+    не собирается в памяти целиком.
+    """
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ""
+        self.count = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += "\t".join(_copy_value(v) for v in row) + "\n"
+            self.count += 1
+
+        if size < 0 or size >= len(self._buffer):
+            chunk, self._buffer = self._buffer, ""
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+    readline = read
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Соединение пула, которое помнит подготовленные на нём запросы.
+
+    prepared: имя -> число параметров; недавно использованные - в конце.
+    Подготовленные запросы живут до закрытия соединения и переживают
+    ROLLBACK, поэтому реестр хранится вместе с соединением.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = OrderedDict()
+
+
+_PLACEHOLDER = re.compile(r"%%|%s")
+
+
+def _server_sql(query):
+    """Запрос с %s -> запрос с $1, $2, ... для PREPARE и число параметров"""
+    count = 0
+
+    def number(match):
+        nonlocal count
+        if match.group() == "%%":
+            return "%"
+        count += 1
+        return f"${count}"
+
+    return _PLACEHOLDER.sub(number, query), count
+
+
+def execute_prepared(cur, query, params=None):
+    """Выполнить запрос как подготовленный на сервере.
+
+    На каждом соединении запрос разбирается (PREPARE) один раз, дальше
+    выполняется EXECUTE без повторного разбора; после нескольких выполнений
+    PostgreSQL может перейти и на общий план. Имя - хэш текста запроса,
+    на соединении хранится не больше Config.PREPARED_STATEMENTS запросов
+    (давно не использованные удаляются DEALLOCATE).
+    """
+    conn = cur.connection
+    name = "stmt_" + hashlib.sha1(" ".join(query.split()).encode()).hexdigest()[:16]
+    if name in conn.prepared:
+        conn.prepared.move_to_end(name)
+    else:
+        sql, count = _server_sql(query)
+        cur.execute(f"PREPARE {name} AS {sql}")
+        conn.prepared[name] = count
+        while len(conn.prepared) > Config.PREPARED_STATEMENTS:
+            old, _ = conn.prepared.popitem(last=False)
+            cur.execute(f"DEALLOCATE {old}")
+
+    count = conn.prepared[name]
+    args = " (" + ", ".join(["%s"] * count) + ")" if count else ""
+    try:
+        cur.execute(f"EXECUTE {name}{args}", params)
+    except psycopg2.errors.InvalidSqlStatementName:
+        # Запрос удалён на сервере (DISCARD ALL) - подготовить заново в следующий раз
+        conn.prepared.pop(name, None)
+        raise
+
+
+class PoolTimeoutError(Exception):
+    """Свободное соединение не появилось за отведённое время"""
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений с PostgreSQL.
+
+    - держит не меньше min_size и не больше max_size соединений;
+    - соединение, простоявшее дольше health_check_after, перед выдачей
+      проверяется запросом SELECT 1 и при ошибке переоткрывается;
+    - лишние (сверх min_size) соединения, простоявшие дольше idle_timeout,
+      закрываются при очередном обращении к пулу.
+    """
+
+    def __init__(self, min_size, max_size, checkout_timeout,
+                 health_check_after, idle_timeout):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self.idle_timeout = idle_timeout
+
+        self._cond = threading.Condition()
+        self._idle = []  # [(conn, время возврата в пул)]
+        self._size = 0
+        self._closed = False
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        config = Config.DATABASE_CONFIG.copy()
+        config['client_encoding'] = 'UTF8'
+        return psycopg2.connect(connection_factory=PreparedConnection, **config)
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _reap_idle(self):
+        """Закрыть лишние простаивающие соединения (вызывать под блокировкой)"""
+        now = time.monotonic()
+        keep = []
+        # Самые старые соединения лежат в начале списка
+        for conn, returned_at in self._idle:
+            expired = now - returned_at > self.idle_timeout
+            if (expired and self._size > self.min_size) or conn.closed:
+                conn.close()
+                self._size -= 1
+            else:
+                keep.append((conn, returned_at))
+        self._idle = keep
+
+    def getconn(self):
+        """Взять соединение из пула (при необходимости открыть новое)"""
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise psycopg2.InterfaceError("пул соединений закрыт")
+                self._reap_idle()
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    conn, returned_at = None, None
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"нет свободных соединений за {self.checkout_timeout} с"
+                    )
+                self._cond.wait(remaining)
+
+        try:
+            if conn is not None and not self._is_healthy(conn, returned_at):
+                conn.close()
+                conn = None
+            if conn is None:
+                conn = self._connect()
+            return conn
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn, close=False):
+        """Вернуть соединение в пул; close=True - соединение испорчено"""
+        if not close and not conn.closed:
+            try:
+                status = conn.info.transaction_status
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+
+        with self._cond:
+            if close or conn.closed or self._closed:
+                conn.close()
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        """Закрыть все простаивающие соединения и запретить выдачу новых"""
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                conn.close()
+                self._size -= 1
+            self._idle = []
+            self._cond.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_cache = QueryCache(**Config.QUERY_CACHE)
+_cache_listener = None
+_change_callbacks = []
+_row_callbacks = []
+_cursor_ids = itertools.count(1)  # имена серверных курсоров iter_query
+_local = threading.local()  # открытая транзакция потока (Database.transaction)
+_schema_lock = threading.Lock()
+_schema_ready = False
+_extensions = {}
+
+
+def get_pool():
+    """Общий для всего процесса пул соединений (создаётся при первом обращении)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = ConnectionPool(**Config.DB_POOL)
+                print("✓ Подключение к БД успешно")
+            except Exception as e:
+                print(f"❌ Ошибка подключения: {e}")
+                raise
+        return _pool
+
+
+def get_query_cache():
+    """Общий для процесса кэш результатов запросов"""
+    return _cache
+
+
+def start_cache_listener():
+    """Слушать уведомления об изменениях таблиц и вытеснять их из кэша.
+
+    Нужен, чтобы правки с других рабочих мест и из процессов импорта
+    не оставляли в кэше устаревшие строки. Повторный вызов ничего не делает.
+    """
+    global _cache_listener
+    with _pool_lock:
+        if _cache_listener is None:
+            _cache_listener = CacheListener(
+                _cache, Config.QUERY_CACHE_CHANNEL, _change_callbacks,
+                row_channel=Config.ROW_CHANGES_CHANNEL,
+                row_callbacks=_row_callbacks,
+            )
+            _cache_listener.start()
+
+
+def on_table_change(callback):
+    """Вызывать callback(tables) при изменении таблиц в БД.
+
+    Работает, пока запущен start_cache_listener(); вызывается из потока
+    слушателя. tables - имена таблиц или {ALL_TABLES}, если изменения
+    могли быть пропущены.
+    """
+    _change_callbacks.append(callback)
+
+
+def on_row_change(callback):
+    """Вызывать callback(changes) при изменении строк products и orders.
+
+    changes - список query_cache.RowChange, вызывается из потока слушателя
+    (start_cache_listener), поэтому окна Tk складывают изменения в очередь
+    и разбирают их в своём цикле. Отписка - off_row_change(callback).
+    """
+    _row_callbacks.append(callback)
+
+
+def off_row_change(callback):
+    """Перестать вызывать callback, добавленный on_row_change"""
+    try:
+        _row_callbacks.remove(callback)
+    except ValueError:
+        pass
+
+
+def close_pool():
+    """Закрыть общий пул соединений (при выходе из приложения)"""
+    global _pool, _cache_listener
+    with _pool_lock:
+        if _cache_listener is not None:
+            _cache_listener.stop()
+            _cache_listener = None
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+class QueryHandle:
+    """SELECT-запрос, который можно отменить из другого потока.
+
+    run() выполняется в рабочем потоке, cancel() - из любого: если запрос
+    уже идёт на сервере, он прерывается через PQcancel (как
+    pg_cancel_backend для своего соединения), и run() возвращает None.
+    """
+
+    def __init__(self, db, query, params=None, cache=False, prepare=False):
+        self.db = db
+        self.query = query
+        self.params = params
+        self.cache = cache
+        self.prepare = prepare
+        self.cancelled = False
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def run(self):
+        """Выполнить запрос; None - если он был отменён"""
+        key = QueryCache.key(self.query, self.params)
+        if self.cache:
+            rows = _cache.get(key)
+            if rows is not None:
+                return rows
+            tables = read_tables(self.query)
+            # Версия берётся до запроса: см. QueryCache
+            version = _cache.version(tables)
+        with self.db.connection() as conn:
+            with self._lock:
+                if self.cancelled:
+                    return None
+                self._conn = conn
+            try:
+                with conn.cursor() as cur:
+                    if self.prepare:
+                        execute_prepared(cur, self.query, self.params)
+                    else:
+                        cur.execute(self.query, self.params)
+                    rows = cur.fetchall()
+                if self.cache:
+                    _cache.put(key, rows, tables, version)
+                return rows
+            except psycopg2.extensions.QueryCanceledError:
+                if self.cancelled:
+                    return None
+                raise
+            finally:
+                with self._lock:
+                    self._conn = None
+
+    def cancel(self):
+        """Отменить запрос (ещё не начатый или уже выполняющийся)"""
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None:
+                self._conn.cancel()
+
 
 class Database:
-    """Класс для работы с PostgreSQL"""
-    
+    """Класс для работы с PostgreSQL
+
+    Экземпляры лёгкие: соединения берутся из общего пула на время
+    одного запроса и сразу возвращаются обратно.
+    """
+
     def __init__(self):
-        self.conn = None
-        self.connect()
-    
-    def connect(self):
-        """Подключение к БД"""
+        self.pool = get_pool()
+
+    @contextmanager
+    def connection(self):
+        """Одолжить соединение из пула на время блока with.
+
+        Внутри transaction() выдаётся соединение транзакции.
+        """
+        tx = getattr(_local, "tx", None)
+        if tx is not None:
+            yield tx["conn"]
+            return
+        conn = self.pool.getconn()
+        broken = False
         try:
-            config = Config.DATABASE_CONFIG.copy()
-            config['client_encoding'] = 'UTF8'
-            self.conn = psycopg2.connect(**config)
-            print("✓ Подключение к БД успешно")
-            self.create_tables()
-        except Exception as e:
-            print(f"❌ Ошибка подключения: {e}")
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
             raise
-    
+        finally:
+            self.pool.putconn(conn, close=broken)
+
+    @contextmanager
+    def transaction(self):
+        """Выполнить запросы блока with одной транзакцией.
+
+        execute_update, execute_many, execute_values и copy_merge внутри
+        блока не фиксируют каждый свой запрос: COMMIT (и уведомления
+        об изменённых таблицах) выполняется один раз при выходе из блока,
+        а при исключении всё откатывается. Ошибка любого запроса внутри
+        блока (и execute_query тоже) не печатается, а выбрасывается -
+        чтобы блок откатился целиком.
+        Вложенный блок становится частью внешней транзакции.
+        Транзакция принадлежит потоку, который её открыл.
+        """
+        if getattr(_local, "tx", None) is not None:
+            yield
+            return
+        with self.connection() as conn:
+            _local.tx = {"conn": conn, "tables": set()}
+            try:
+                yield
+                tables = _local.tx["tables"]
+                if tables:
+                    with conn.cursor() as cur:
+                        self._notify_tables(cur, tables)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                _local.tx = None
+        _cache.invalidate(tables)
+
+    @contextmanager
+    def _write(self):
+        """Курсор для изменяющих запросов: yield (cur, tables).
+
+        Вне transaction() - своё соединение и COMMIT в конце блока,
+        внутри - соединение транзакции без COMMIT; имена изменённых
+        таблиц добавляются в tables и рассылаются при фиксации.
+        """
+        tx = getattr(_local, "tx", None)
+        if tx is not None:
+            with tx["conn"].cursor() as cur:
+                yield cur, tx["tables"]
+            return
+        tables = set()
+        with self.connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    yield cur, tables
+                    if tables:
+                        self._notify_tables(cur, tables)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        _cache.invalidate(tables)
+
+    @staticmethod
+    def in_transaction():
+        """Открыт ли в этом потоке блок transaction()"""
+        return getattr(_local, "tx", None) is not None
+
+    def bootstrap(self):
+        """Однократно подготовить схему БД (вызывается при старте приложения)"""
+        global _schema_ready
+        with _schema_lock:
+            if _schema_ready:
+                return
+            self.create_tables()
+            self.create_search_index()
+            self.create_change_notifications()
+            self.migrate_product_references()
+            self.migrate_order_items()
+            self.migrate_order_dates()
+            _schema_ready = True
+
     def create_tables(self):
         """Создать таблицы если их нет"""
-        try:
-            with self.conn.cursor() as cur:
-                # Таблица пользователей
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS users (
-                        id SERIAL PRIMARY KEY,
-                        role VARCHAR(50),
-                        full_name VARCHAR(255),
-                        login VARCHAR(100) UNIQUE,
-                        password VARCHAR(255)
-                    );
-                """)
+        with self.connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    # Таблица пользователей
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS users (
+                            id SERIAL PRIMARY KEY,
+                            role VARCHAR(50),
+                            full_name VARCHAR(255),
+                            login VARCHAR(100) UNIQUE,
+                            password VARCHAR(255)
+                        );
+                    """)
                 
-                # Таблица пунктов выдачи
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS pickup_points (
-                        id SERIAL PRIMARY KEY,
-                        address VARCHAR(255) UNIQUE
-                    );
-                """)
+                    # Таблица пунктов выдачи
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS pickup_points (
+                            id SERIAL PRIMARY KEY,
+                            address VARCHAR(255) UNIQUE
+                        );
+                    """)
+                    # Нормализованный адрес для поиска (как normalize_address)
+                    cur.execute(r"""
+                        ALTER TABLE pickup_points
+                        ADD COLUMN IF NOT EXISTS address_key TEXT
+                        GENERATED ALWAYS AS (
+                            lower(regexp_replace(btrim(address), '\s+', ' ', 'g'))
+                        ) STORED;
+                    """)
+                    cur.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_pickup_points_address_key
+                        ON pickup_points (address_key);
+                    """)
                 
-                # Таблица товаров
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS products (
-                        id SERIAL PRIMARY KEY,
-                        article VARCHAR(100) UNIQUE,
-                        name VARCHAR(255),
-                        category VARCHAR(100),
-                        description TEXT,
-                        manufacturer VARCHAR(100),
-                        supplier VARCHAR(100),
-                        price DECIMAL(10,2),
-                        unit VARCHAR(50),
-                        stock INTEGER,
-                        discount INTEGER,
-                        photo_path VARCHAR(255)
-                    );
-                """)
+                    # Справочники товаров
+                    for table in ("categories", "manufacturers", "suppliers"):
+                        cur.execute(f"""
+                            CREATE TABLE IF NOT EXISTS {table} (
+                                id SERIAL PRIMARY KEY,
+                                name VARCHAR(100) UNIQUE NOT NULL
+                            );
+                        """)
+
+                    # Таблица товаров
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS products (
+                            id SERIAL PRIMARY KEY,
+                            article VARCHAR(100) UNIQUE,
+                            name VARCHAR(255),
+                            category_id INTEGER REFERENCES categories(id),
+                            description TEXT,
+                            manufacturer_id INTEGER REFERENCES manufacturers(id),
+                            supplier_id INTEGER REFERENCES suppliers(id),
+                            price DECIMAL(10,2),
+                            unit VARCHAR(50),
+                            stock INTEGER,
+                            discount INTEGER,
+                            photo_path VARCHAR(255)
+                        );
+                    """)
+                    # Ссылки на справочники в базе, созданной до их появления
+                    # (данные переносит migrate_product_references)
+                    cur.execute("""
+                        ALTER TABLE products
+                        ADD COLUMN IF NOT EXISTS category_id INTEGER
+                            REFERENCES categories(id),
+                        ADD COLUMN IF NOT EXISTS manufacturer_id INTEGER
+                            REFERENCES manufacturers(id),
+                        ADD COLUMN IF NOT EXISTS supplier_id INTEGER
+                            REFERENCES suppliers(id);
+                    """)
+                    for column in ("category_id", "manufacturer_id", "supplier_id"):
+                        cur.execute(f"""
+                            CREATE INDEX IF NOT EXISTS idx_products_{column}
+                            ON products ({column});
+                        """)
+                    # Ключ страницы при сортировке по количеству
+                    cur.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_products_stock_id
+                        ON products (stock, id);
+                    """)
+                    # Время последнего изменения товара: по нему локальный
+                    # снимок каталога догружает только изменившиеся строки
+                    cur.execute("""
+                        ALTER TABLE products
+                        ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP
+                            DEFAULT CURRENT_TIMESTAMP;
+                    """)
+                    cur.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_products_updated_at
+                        ON products (updated_at);
+                    """)
+                    cur.execute("""
+                        CREATE OR REPLACE FUNCTION update_product_timestamp()
+                        RETURNS TRIGGER AS $$
+                        BEGIN
+                            NEW.updated_at = clock_timestamp();
+                            RETURN NEW;
+                        END;
+                        $$ LANGUAGE plpgsql;
+                    """)
+                    cur.execute("""
+                        CREATE OR REPLACE TRIGGER product_update_timestamp
+                        BEFORE UPDATE ON products
+                        FOR EACH ROW EXECUTE FUNCTION update_product_timestamp();
+                    """)
                 
-                # Таблица заказов
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS orders (
-                        id SERIAL PRIMARY KEY,
-                        order_number INTEGER UNIQUE,
-                        order_articles VARCHAR(255),
-                        order_date VARCHAR(50),
-                        delivery_date VARCHAR(50),
-                        pickup_point_id INTEGER REFERENCES pickup_points(id),
-                        client_name VARCHAR(255),
-                        pickup_code VARCHAR(100),
-                        status VARCHAR(50)
-                    );
-                """)
+                    # Таблица заказов
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS orders (
+                            id SERIAL PRIMARY KEY,
+                            order_number INTEGER UNIQUE,
+                            order_articles VARCHAR(255),
+                            order_date DATE,
+                            delivery_date DATE,
+                            pickup_point_id INTEGER REFERENCES pickup_points(id),
+                            client_name VARCHAR(255),
+                            pickup_code VARCHAR(100),
+                            status VARCHAR(50)
+                        );
+                    """)
+
+                    # Позиции заказов (вместо строки order_articles)
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS order_items (
+                            order_id INTEGER NOT NULL
+                                REFERENCES orders(id) ON DELETE CASCADE,
+                            product_id INTEGER NOT NULL REFERENCES products(id),
+                            quantity INTEGER NOT NULL CHECK (quantity > 0),
+                            PRIMARY KEY (order_id, product_id)
+                        );
+                    """)
+                    cur.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_order_items_product
+                        ON order_items (product_id);
+                    """)
+
+                    # Метаданные инкрементального импорта: отпечатки файлов
+                    # и хэши строк по естественному ключу
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS import_files (
+                            path VARCHAR(255) PRIMARY KEY,
+                            size BIGINT,
+                            mtime_ns BIGINT,
+                            sha256 CHAR(64),
+                            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        );
+                    """)
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS import_rows (
+                            source VARCHAR(50),
+                            row_key VARCHAR(255),
+                            row_hash BIGINT,
+                            PRIMARY KEY (source, row_key)
+                        );
+                    """)
                 
-                self.conn.commit()
+                conn.commit()
                 print("✓ Таблицы созданы")
-        except Exception as e:
-            print(f"⚠ Таблицы уже существуют: {e}")
-            self.conn.rollback()
-    
-    def execute_query(self, query, params=None):
-        """Выполнить SELECT запрос"""
+            except Exception as e:
+                print(f"⚠ Таблицы уже существуют: {e}")
+                conn.rollback()
+
+    def create_search_index(self):
+        """Поисковые колонки и индексы каталога товаров.
+
+        search_text и search_vector пересчитывает триггер
+        products_search_refresh при каждом INSERT/UPDATE товара (и из окна
+        товара, и из импорта). Вычисляемыми (GENERATED) колонками они быть
+        не могут: названия категории, производителя и поставщика лежат
+        в справочниках. При переименовании записи справочника триггер
+        пересчитывает её товары.
+        """
+        with self.connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT column_name, is_generated
+                        FROM information_schema.columns
+                        WHERE table_schema = current_schema()
+                          AND table_name = 'products'
+                          AND column_name IN ('search_text', 'search_vector')
+                    """)
+                    existing = dict(cur.fetchall())
+                    cur.execute("""
+                        ALTER TABLE products
+                        ADD COLUMN IF NOT EXISTS search_text TEXT,
+                        ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+                    """)
+                    # Раньше колонки были вычисляемыми - значения сохраняются
+                    for column, generated in existing.items():
+                        if generated == "ALWAYS":
+                            cur.execute(
+                                f"ALTER TABLE products ALTER COLUMN {column} DROP EXPRESSION"
+                            )
+
+                    cur.execute("""
+                        CREATE OR REPLACE FUNCTION products_search_refresh()
+                        RETURNS TRIGGER AS $$
+                        DECLARE
+                            category_name TEXT := (
+                                SELECT name FROM categories WHERE id = NEW.category_id);
+                            manufacturer_name TEXT := (
+                                SELECT name FROM manufacturers WHERE id = NEW.manufacturer_id);
+                            supplier_name TEXT := (
+                                SELECT name FROM suppliers WHERE id = NEW.supplier_id);
+                        BEGIN
+                            NEW.search_text := lower(
+                                coalesce(NEW.article, '') || ' ' ||
+                                coalesce(NEW.name, '') || ' ' ||
+                                coalesce(category_name, '') || ' ' ||
+                                coalesce(manufacturer_name, '') || ' ' ||
+                                coalesce(supplier_name, '') || ' ' ||
+                                coalesce(NEW.description, '')
+                            );
+                            NEW.search_vector :=
+                                setweight(to_tsvector('simple', coalesce(NEW.article, '')), 'A') ||
+                                setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+                                setweight(to_tsvector('russian',
+                                    coalesce(category_name, '') || ' ' ||
+                                    coalesce(manufacturer_name, '') || ' ' ||
+                                    coalesce(supplier_name, '')), 'B') ||
+                                setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'C') ||
+                                setweight(to_tsvector('simple',
+                                    coalesce(NEW.name, '') || ' ' ||
+                                    coalesce(manufacturer_name, '') || ' ' ||
+                                    coalesce(supplier_name, '')), 'D');
+                            RETURN NEW;
+                        END;
+                        $$ LANGUAGE plpgsql;
+                    """)
+                    cur.execute("""
+                        CREATE OR REPLACE TRIGGER products_search_refresh
+                        BEFORE INSERT OR UPDATE OF article, name, description,
+                            category_id, manufacturer_id, supplier_id
+                        ON products
+                        FOR EACH ROW EXECUTE FUNCTION products_search_refresh();
+                    """)
+                    # Переименование в справочнике: "UPDATE products SET col = col"
+                    # для его товаров запускает products_search_refresh
+                    cur.execute("""
+                        CREATE OR REPLACE FUNCTION products_reference_renamed()
+                        RETURNS TRIGGER AS $$
+                        BEGIN
+                            EXECUTE format(
+                                'UPDATE products SET %1$I = %1$I WHERE %1$I = $1',
+                                TG_ARGV[0]
+                            ) USING NEW.id;
+                            RETURN NULL;
+                        END;
+                        $$ LANGUAGE plpgsql;
+                    """)
+                    for table, column in (
+                        ("categories", "category_id"),
+                        ("manufacturers", "manufacturer_id"),
+                        ("suppliers", "supplier_id"),
+                    ):
+                        cur.execute(f"""
+                            CREATE OR REPLACE TRIGGER {table}_renamed
+                            AFTER UPDATE OF name ON {table}
+                            FOR EACH ROW
+                            WHEN (OLD.name IS DISTINCT FROM NEW.name)
+                            EXECUTE FUNCTION products_reference_renamed('{column}');
+                        """)
+
+                    # Колонки только что добавлены - заполнить их триггером
+                    if len(existing) < 2:
+                        cur.execute("UPDATE products SET article = article")
+
+                    cur.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_products_search_vector
+                        ON products USING GIN (search_vector);
+                    """)
+                conn.commit()
+            except Exception as e:
+                print(f"⚠ Ошибка создания поискового индекса: {e}")
+                conn.rollback()
+                return
+
+            # pg_trgm может отсутствовать на сервере - тогда поиск
+            # работает без индекса подстрок и без учёта опечаток
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+                    cur.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_products_search_trgm
+                        ON products USING GIN (search_text gin_trgm_ops);
+                    """)
+                conn.commit()
+                print("✓ Поисковый индекс готов")
+            except Exception as e:
+                print(f"⚠ Расширение pg_trgm недоступно: {e}")
+                conn.rollback()
+            _extensions.clear()
+
+    def create_change_notifications(self):
+        """Триггеры, рассылающие изменённые строки products и orders.
+
+        После каждого INSERT/UPDATE/DELETE триггер уровня оператора шлёт
+        в Config.ROW_CHANGES_CHANNEL одно уведомление
+        {"table": ..., "op": ..., "ids": [...]} (JSON); если строк больше
+        Config.ROW_CHANGES_MAX_IDS, вместо списка - null. Уведомление
+        уходит при COMMIT, и его получают все рабочие места.
+        """
+        args = f"'{Config.ROW_CHANGES_CHANNEL}', '{Config.ROW_CHANGES_MAX_IDS}'"
+        with self.connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        CREATE OR REPLACE FUNCTION notify_row_changes()
+                        RETURNS TRIGGER AS $$
+                        DECLARE
+                            max_ids INTEGER := TG_ARGV[1]::INTEGER;
+                            ids INTEGER[];
+                        BEGIN
+                            -- На одну строку больше предела: понять, что он превышен
+                            IF TG_OP = 'DELETE' THEN
+                                ids := ARRAY(SELECT id FROM old_rows LIMIT max_ids + 1);
+                            ELSE
+                                ids := ARRAY(SELECT id FROM new_rows LIMIT max_ids + 1);
+                            END IF;
+                            IF cardinality(ids) = 0 THEN
+                                RETURN NULL;
+                            END IF;
+                            PERFORM pg_notify(TG_ARGV[0], json_build_object(
+                                'table', TG_TABLE_NAME,
+                                'op', TG_OP,
+                                'ids', CASE WHEN cardinality(ids) <= max_ids
+                                            THEN to_json(ids) END
+                            )::TEXT);
+                            RETURN NULL;
+                        END;
+                        $$ LANGUAGE plpgsql;
+                    """)
+                    for table in ("products", "orders"):
+                        for op, rows in (
+                            ("insert", "NEW TABLE AS new_rows"),
+                            ("update", "NEW TABLE AS new_rows"),
+                            ("delete", "OLD TABLE AS old_rows"),
+                        ):
+                            cur.execute(f"""
+                                CREATE OR REPLACE TRIGGER {table}_notify_{op}
+                                AFTER {op.upper()} ON {table}
+                                REFERENCING {rows}
+                                FOR EACH STATEMENT
+                                EXECUTE FUNCTION notify_row_changes({args});
+                            """)
+                conn.commit()
+            except Exception as e:
+                print(f"⚠ Ошибка создания уведомлений об изменениях: {e}")
+                conn.rollback()
+
+    def migrate_product_references(self):
+        """Перенести текстовые category, manufacturer и supplier товаров
+        в справочники и заменить их ссылками (category_id, ...).
+
+        Выполняется один раз: после переноса текстовые колонки удаляются,
+        и при следующих запусках проверка сводится к запросу
+        information_schema. Место старых колонок в уже записанных строках
+        освобождается по мере их обновления (или сразу - VACUUM FULL products).
+        """
+        rows = self.execute_query("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = 'products'
+              AND column_name IN ('category', 'manufacturer', 'supplier')
+        """)
+        if not rows:
+            return
+        if len(rows) < 3:
+            print("⚠ Перенос справочников товаров пропущен: неполный набор колонок")
+            return
+
+        references = (
+            ("category", "categories", "category_id"),
+            ("manufacturer", "manufacturers", "manufacturer_id"),
+            ("supplier", "suppliers", "supplier_id"),
+        )
+        with self.connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    for column, table, _ in references:
+                        cur.execute(f"""
+                            INSERT INTO {table} (name)
+                            SELECT DISTINCT btrim({column}) FROM products
+                            WHERE btrim(coalesce({column}, '')) <> ''
+                            ON CONFLICT (name) DO NOTHING
+                        """)
+                    sets = ", ".join(
+                        f"{id_column} = (SELECT id FROM {table} "
+                        f"WHERE name = btrim(products.{column}))"
+                        for column, table, id_column in references
+                    )
+                    cur.execute(f"UPDATE products SET {sets}")
+                    migrated = cur.rowcount
+                    cur.execute("""
+                        ALTER TABLE products
+                        DROP COLUMN category,
+                        DROP COLUMN manufacturer,
+                        DROP COLUMN supplier
+                    """)
+                conn.commit()
+                print(f"✓ Справочники товаров заполнены ({migrated} товаров)")
+            except Exception as e:
+                conn.rollback()
+                print(f"⚠ Ошибка переноса справочников товаров: {e}")
+
+    def migrate_order_items(self):
+        """Заполнить order_items для заказов, у которых есть только строка
+        order_articles ("А112Т4, 2, F635R4, 2"). Заказы с позициями
+        пропускаются, поэтому повторный запуск почти ничего не стоит."""
+        ok = self.execute_update(r"""
+            INSERT INTO order_items (order_id, product_id, quantity)
+            SELECT o.id, p.id, SUM(x.quantity)
+            FROM orders o
+            CROSS JOIN LATERAL (
+                SELECT string_to_array(o.order_articles, ',') AS parts
+            ) a
+            CROSS JOIN LATERAL (
+                SELECT btrim(a.parts[2 * i - 1]) AS article,
+                       btrim(a.parts[2 * i])::INTEGER AS quantity
+                FROM generate_series(1, coalesce(array_length(a.parts, 1), 0) / 2) AS i
+                WHERE btrim(a.parts[2 * i]) ~ '^[0-9]{1,9}$'
+            ) x
+            JOIN products p ON p.article = x.article
+            WHERE x.quantity > 0
+              AND NOT EXISTS (SELECT 1 FROM order_items oi WHERE oi.order_id = o.id)
+            GROUP BY o.id, p.id
+            ON CONFLICT (order_id, product_id) DO NOTHING
+        """)
+        if not ok:
+            print("⚠ Не удалось перенести позиции заказов в order_items")
+
+    def migrate_order_dates(self):
+        """Перевести даты заказов из VARCHAR в DATE и проиндексировать.
+
+        Старые строки бывают вида '2025-02-27 00:00:00' (str(Timestamp))
+        и '27.02.2025'; нераспознанные значения становятся NULL.
+        """
+        rows = self.execute_query("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = 'orders'
+              AND column_name IN ('order_date', 'delivery_date')
+              AND data_type <> 'date'
+        """) or []
+
+        for (column,) in rows:
+            parsed = rf"""
+                CASE
+                    WHEN btrim({column}) ~ '^[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}'
+                        THEN to_date(substr(btrim({column}), 1, 10), 'YYYY-MM-DD')
+                    WHEN btrim({column}) ~ '^[0-9]{{1,2}}\.[0-9]{{1,2}}\.[0-9]{{4}}'
+                        THEN to_date(substring(btrim({column})
+                             FROM '^[0-9]{{1,2}}\.[0-9]{{1,2}}\.[0-9]{{4}}'), 'DD.MM.YYYY')
+                END
+            """
+            lost = self.execute_query(
+                f"SELECT count(*) FROM orders "
+                f"WHERE nullif(btrim({column}), '') IS NOT NULL AND ({parsed}) IS NULL"
+            )
+            if lost and lost[0][0]:
+                print(f"⚠ {column}: {lost[0][0]} нераспознанных дат станут NULL")
+            if self.execute_update(
+                f"ALTER TABLE orders ALTER COLUMN {column} TYPE DATE USING {parsed}"
+            ):
+                print(f"✓ orders.{column} переведена в DATE")
+
+        self.execute_update(
+            "CREATE INDEX IF NOT EXISTS idx_orders_order_date ON orders (order_date)"
+        )
+        self.execute_update(
+            "CREATE INDEX IF NOT EXISTS idx_orders_delivery_date ON orders (delivery_date)"
+        )
+
+    def has_extension(self, name):
+        """Установлено ли расширение PostgreSQL (результат кэшируется)"""
+        if name not in _extensions:
+            rows = self.execute_query(
+                "SELECT 1 FROM pg_extension WHERE extname = %s", (name,)
+            )
+            _extensions[name] = bool(rows)
+        return _extensions[name]
+
+    def execute_query(self, query, params=None, cache=False, prepare=False):
+        """Выполнить SELECT запрос
+
+        cache=True - брать результат из кэша запросов (для редко меняющихся
+        справочных данных); запись вытесняется, когда меняется любая из
+        таблиц запроса.
+        prepare=True - выполнить как подготовленный на сервере запрос
+        (execute_prepared): для частых запросов с постоянным текстом, план
+        которых не зависит от значений параметров.
+        """
+        key = QueryCache.key(query, params)
+        # Внутри транзакции видны её незафиксированные изменения - мимо кэша
+        cache = cache and not self.in_transaction()
+        if cache:
+            rows = _cache.get(key)
+            if rows is not None:
+                return rows
+            tables = read_tables(query)
+            # Версия берётся до запроса: см. QueryCache
+            version = _cache.version(tables)
         try:
-            with self.conn.cursor() as cur:
-                cur.execute(query, params)
-                return cur.fetchall()
+            with self.connection() as conn, conn.cursor() as cur:
+                if prepare:
+                    execute_prepared(cur, query, params)
+                else:
+                    cur.execute(query, params)
+                rows = cur.fetchall()
+            if cache:
+                _cache.put(key, rows, tables, version)
+            return rows
         except Exception as e:
+            if self.in_transaction():
+                raise
             print(f"❌ Ошибка запроса: {e}")
             return None
-    
-    def execute_update(self, query, params=None):
-        """Выполнить INSERT/UPDATE/DELETE запрос"""
+
+    def iter_query(self, query, params=None, itersize=None):
+        """Выполнить SELECT и выдавать строки по мере получения.
+
+        Строки читаются именованным (серверным) курсором пачками по itersize
+        (по умолчанию Config.QUERY_ITERSIZE), поэтому в памяти клиента
+        одновременно не больше одной пачки, а обработка начинается до того,
+        как сервер выдал весь результат. Соединение занято, пока генератор
+        не дочитан или не закрыт (close() / выход из цикла с break).
+        Ошибки не печатаются, а выбрасываются: строки могли уже частично
+        обработаться.
+        """
+        with self.connection() as conn:
+            with conn.cursor(name=f"iter_{next(_cursor_ids)}") as cur:
+                cur.itersize = itersize or Config.QUERY_ITERSIZE
+                cur.execute(query, params)
+                yield from cur
+
+    def cancellable_query(self, query, params=None, cache=False, prepare=False):
+        """Подготовить SELECT для выполнения в фоне с возможностью отмены"""
+        return QueryHandle(self, query, params, cache, prepare)
+
+    @staticmethod
+    def _notify_tables(cur, tables):
+        """Разослать имена изменённых таблиц (уйдут при COMMIT)"""
+        cur.execute(
+            "SELECT pg_notify(%s, t) FROM unnest(%s::TEXT[]) t",
+            (Config.QUERY_CACHE_CHANNEL, sorted(tables)),
+        )
+
+    def execute_update(self, query, params=None, rowcount=False):
+        """Выполнить INSERT/UPDATE/DELETE запрос
+
+        Возвращает True/False, а с rowcount=True - число изменённых строк
+        или None при ошибке.
+        """
         try:
-            with self.conn.cursor() as cur:
+            with self._write() as (cur, tables):
                 cur.execute(query, params)
-                self.conn.commit()
-                return True
+                count = cur.rowcount
+                tables |= write_tables(query)
+            return count if rowcount else True
         except Exception as e:
-            self.conn.rollback()
+            if self.in_transaction():
+                raise
             print(f"❌ Ошибка обновления: {e}")
+            return None if rowcount else False
+
+    def execute_many(self, query, rows, page_size=1000):
+        """Выполнить INSERT/UPDATE/DELETE для каждого набора параметров rows.
+
+        Наборы отправляются пачками по page_size запросов за одно обращение
+        к серверу (psycopg2.extras.execute_batch), всё - одной транзакцией.
+        Возвращает True/False.
+        """
+        try:
+            with self._write() as (cur, tables):
+                psycopg2.extras.execute_batch(cur, query, rows, page_size=page_size)
+                tables |= write_tables(query)
+            return True
+        except Exception as e:
+            if self.in_transaction():
+                raise
+            print(f"❌ Ошибка пакетного обновления: {e}")
             return False
-    
+
+    def execute_values(self, query, rows, template=None, page_size=1000,
+                       fetch=False):
+        """Выполнить запрос с VALUES %s для многих строк сразу.
+
+        query    - INSERT ... VALUES %s [ON CONFLICT ...] [RETURNING ...]
+        template - шаблон одной строки, например "(%s, %s, (SELECT ...))"
+        В один запрос попадает до page_size строк
+        (psycopg2.extras.execute_values), всё - одной транзакцией.
+        Возвращает True/False, а с fetch=True - строки RETURNING всех
+        пачек или None при ошибке.
+        """
+        try:
+            with self._write() as (cur, tables):
+                result = psycopg2.extras.execute_values(
+                    cur, query, rows, template=template, page_size=page_size,
+                    fetch=fetch,
+                )
+                tables |= write_tables(query)
+            return result if fetch else True
+        except Exception as e:
+            if self.in_transaction():
+                raise
+            print(f"❌ Ошибка пакетного обновления: {e}")
+            return None if fetch else False
+
+    def copy_merge(self, staging, columns, rows, merge_sql, returning=False):
+        """Загрузить строки во временную таблицу через COPY и слить их одним запросом.
+
+        staging   - имя временной таблицы
+        columns   - список пар (имя колонки, тип)
+        rows      - итерируемое кортежей в порядке columns
+        merge_sql - INSERT ... SELECT ... FROM staging ON CONFLICT ...
+        returning - merge_sql содержит RETURNING: вместо числа строк
+                    вернуть список возвращённых строк
+
+        Всё выполняется в одной транзакции (или в открытой transaction()).
+        Возвращает (загружено строк, вставлено строк) или None при ошибке.
+        """
+        ddl = ", ".join(f"{name} {col_type}" for name, col_type in columns)
+        names = ", ".join(name for name, _ in columns)
+        stream = _CopyStream(rows)
+        try:
+            with self._write() as (cur, tables):
+                cur.execute(f"CREATE TEMP TABLE {staging} ({ddl}) ON COMMIT DROP")
+                cur.copy_expert(f"COPY {staging} ({names}) FROM STDIN", stream)
+                cur.execute(merge_sql)
+                merged = cur.fetchall() if returning else cur.rowcount
+                # В общей транзакции та же таблица может понадобиться снова
+                cur.execute(f"DROP TABLE {staging}")
+                tables |= write_tables(merge_sql)
+            return stream.count, merged
+        except Exception as e:
+            if self.in_transaction():
+                raise
+            print(f"❌ Ошибка пакетной загрузки: {e}")
+            return None
+
     def close(self):
-        """Закрыть подключение"""
-        if self.conn:
-            self.conn.close()
\ No newline at end of file
+        """Совместимость со старым API: соединения принадлежат общему пулу,
+        он закрывается через close_pool() при выходе из приложения"""
\ No newline at end of file
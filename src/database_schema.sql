@@ -30,10 +30,33 @@ CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
 CREATE TABLE IF NOT EXISTS pickup_points (
     id SERIAL PRIMARY KEY,
     address VARCHAR(500) UNIQUE NOT NULL,
+    -- Нормализованный адрес для поиска (как import_data.normalize_address)
+    address_key TEXT GENERATED ALWAYS AS (
+        lower(regexp_replace(btrim(address), '\s+', ' ', 'g'))
+    ) STORED,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE INDEX IF NOT EXISTS idx_pickup_points_address ON pickup_points(address);
+CREATE INDEX IF NOT EXISTS idx_pickup_points_address_key ON pickup_points(address_key);
+
+-- ===============================================
+-- СПРАВОЧНИКИ: categories, manufacturers, suppliers
+-- ===============================================
+CREATE TABLE IF NOT EXISTS categories (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS manufacturers (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS suppliers (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) UNIQUE NOT NULL
+);
 
 -- ===============================================
 -- ТАБЛИЦА: products (Товары)
@@ -42,10 +65,10 @@ CREATE TABLE IF NOT EXISTS products (
     id SERIAL PRIMARY KEY,
     article VARCHAR(50) UNIQUE NOT NULL,
     name VARCHAR(255) NOT NULL,
-    category VARCHAR(100) NOT NULL,
+    category_id INTEGER REFERENCES categories(id),
     description TEXT,
-    manufacturer VARCHAR(100) NOT NULL,
-    supplier VARCHAR(100) NOT NULL,
+    manufacturer_id INTEGER REFERENCES manufacturers(id),
+    supplier_id INTEGER REFERENCES suppliers(id),
     price DECIMAL(10, 2) NOT NULL CHECK (price >= 0),
     unit VARCHAR(20) NOT NULL,
     stock INTEGER NOT NULL DEFAULT 0 CHECK (stock >= 0),
@@ -56,10 +79,77 @@ CREATE TABLE IF NOT EXISTS products (
 );
 
 CREATE INDEX IF NOT EXISTS idx_products_article ON products(article);
-CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
-CREATE INDEX IF NOT EXISTS idx_products_supplier ON products(supplier);
-CREATE INDEX IF NOT EXISTS idx_products_manufacturer ON products(manufacturer);
+CREATE INDEX IF NOT EXISTS idx_products_category_id ON products(category_id);
+CREATE INDEX IF NOT EXISTS idx_products_supplier_id ON products(supplier_id);
+CREATE INDEX IF NOT EXISTS idx_products_manufacturer_id ON products(manufacturer_id);
 CREATE INDEX IF NOT EXISTS idx_products_name ON products(name);
+CREATE INDEX IF NOT EXISTS idx_products_stock_id ON products(stock, id);
+CREATE INDEX IF NOT EXISTS idx_products_updated_at ON products(updated_at);
+
+-- Поиск по каталогу: колонки пересчитывает триггер при INSERT/UPDATE товара
+-- (названия справочников подставляются по id)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_text TEXT;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+CREATE OR REPLACE FUNCTION products_search_refresh()
+RETURNS TRIGGER AS $$
+DECLARE
+    category_name TEXT := (SELECT name FROM categories WHERE id = NEW.category_id);
+    manufacturer_name TEXT := (SELECT name FROM manufacturers WHERE id = NEW.manufacturer_id);
+    supplier_name TEXT := (SELECT name FROM suppliers WHERE id = NEW.supplier_id);
+BEGIN
+    NEW.search_text := lower(
+        coalesce(NEW.article, '') || ' ' || coalesce(NEW.name, '') || ' ' ||
+        coalesce(category_name, '') || ' ' || coalesce(manufacturer_name, '') || ' ' ||
+        coalesce(supplier_name, '') || ' ' || coalesce(NEW.description, '')
+    );
+    NEW.search_vector :=
+        setweight(to_tsvector('simple', coalesce(NEW.article, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(category_name, '') || ' ' ||
+            coalesce(manufacturer_name, '') || ' ' || coalesce(supplier_name, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(NEW.name, '') || ' ' ||
+            coalesce(manufacturer_name, '') || ' ' || coalesce(supplier_name, '')), 'D');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER products_search_refresh
+BEFORE INSERT OR UPDATE OF article, name, description,
+    category_id, manufacturer_id, supplier_id
+ON products
+FOR EACH ROW EXECUTE FUNCTION products_search_refresh();
+
+-- Переименование в справочнике пересчитывает поиск у его товаров
+CREATE OR REPLACE FUNCTION products_reference_renamed()
+RETURNS TRIGGER AS $$
+BEGIN
+    EXECUTE format('UPDATE products SET %1$I = %1$I WHERE %1$I = $1', TG_ARGV[0])
+    USING NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER categories_renamed
+AFTER UPDATE OF name ON categories
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE FUNCTION products_reference_renamed('category_id');
+
+CREATE OR REPLACE TRIGGER manufacturers_renamed
+AFTER UPDATE OF name ON manufacturers
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE FUNCTION products_reference_renamed('manufacturer_id');
+
+CREATE OR REPLACE TRIGGER suppliers_renamed
+AFTER UPDATE OF name ON suppliers
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE FUNCTION products_reference_renamed('supplier_id');
+
+CREATE INDEX IF NOT EXISTS idx_products_search_vector ON products USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_products_search_trgm ON products USING GIN (search_text gin_trgm_ops);
 
 -- ===============================================
 -- ТАБЛИЦА: orders (Заказы)
@@ -82,6 +172,96 @@ CREATE INDEX IF NOT EXISTS idx_orders_order_number ON orders(order_number);
 CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
 CREATE INDEX IF NOT EXISTS idx_orders_pickup_point ON orders(pickup_point_id);
 CREATE INDEX IF NOT EXISTS idx_orders_client_name ON orders(client_name);
+CREATE INDEX IF NOT EXISTS idx_orders_order_date ON orders(order_date);
+CREATE INDEX IF NOT EXISTS idx_orders_delivery_date ON orders(delivery_date);
+
+-- ===============================================
+-- ТАБЛИЦА: order_items (Позиции заказов)
+-- ===============================================
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id INTEGER NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    quantity INTEGER NOT NULL CHECK (quantity > 0),
+    PRIMARY KEY (order_id, product_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items(product_id);
+
+-- ===============================================
+-- ТАБЛИЦЫ: import_files / import_rows (Метаданные импорта)
+-- ===============================================
+CREATE TABLE IF NOT EXISTS import_files (
+    path VARCHAR(255) PRIMARY KEY,
+    size BIGINT,
+    mtime_ns BIGINT,
+    sha256 CHAR(64),
+    imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS import_rows (
+    source VARCHAR(50),
+    row_key VARCHAR(255),
+    row_hash BIGINT,
+    PRIMARY KEY (source, row_key)
+);
+
+-- ===============================================
+-- УВЕДОМЛЕНИЯ ОБ ИЗМЕНЁННЫХ СТРОКАХ (products, orders)
+-- ===============================================
+-- Одно уведомление на оператор: {"table", "op", "ids"}; при числе строк
+-- больше предела (второй аргумент) ids = null
+CREATE OR REPLACE FUNCTION notify_row_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    max_ids INTEGER := TG_ARGV[1]::INTEGER;
+    ids INTEGER[];
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        ids := ARRAY(SELECT id FROM old_rows LIMIT max_ids + 1);
+    ELSE
+        ids := ARRAY(SELECT id FROM new_rows LIMIT max_ids + 1);
+    END IF;
+    IF cardinality(ids) = 0 THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify(TG_ARGV[0], json_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'ids', CASE WHEN cardinality(ids) <= max_ids THEN to_json(ids) END
+    )::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER products_notify_insert
+AFTER INSERT ON products
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_row_changes('row_changed', '200');
+
+CREATE OR REPLACE TRIGGER products_notify_update
+AFTER UPDATE ON products
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_row_changes('row_changed', '200');
+
+CREATE OR REPLACE TRIGGER products_notify_delete
+AFTER DELETE ON products
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_row_changes('row_changed', '200');
+
+CREATE OR REPLACE TRIGGER orders_notify_insert
+AFTER INSERT ON orders
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_row_changes('row_changed', '200');
+
+CREATE OR REPLACE TRIGGER orders_notify_update
+AFTER UPDATE ON orders
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_row_changes('row_changed', '200');
+
+CREATE OR REPLACE TRIGGER orders_notify_delete
+AFTER DELETE ON orders
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION notify_row_changes('row_changed', '200');
 
 -- ===============================================
 -- ОГРАНИЧЕНИЯ ЦЕЛОСТНОСТИ
@@ -99,7 +279,11 @@ CHECK (delivery_date >= order_date);
 COMMENT ON TABLE users IS 'Таблица пользователей системы';
 COMMENT ON TABLE pickup_points IS 'Таблица пунктов выдачи заказов';
 COMMENT ON TABLE products IS 'Таблица товаров (обуви)';
+COMMENT ON TABLE categories IS 'Справочник категорий товаров';
+COMMENT ON TABLE manufacturers IS 'Справочник производителей';
+COMMENT ON TABLE suppliers IS 'Справочник поставщиков';
 COMMENT ON TABLE orders IS 'Таблица заказов';
+COMMENT ON TABLE order_items IS 'Позиции заказов (артикул и количество)';
 
 -- ===============================================
 -- ПРЕДСТАВЛЕНИЯ (VIEWS)
@@ -108,19 +292,23 @@ COMMENT ON TABLE orders IS 'Таблица заказов';
 -- Представление: товары на складе
 CREATE VIEW IF NOT EXISTS products_in_stock AS
 SELECT 
-    id, article, name, category, manufacturer, supplier,
-    price, stock, discount
-FROM products
-WHERE stock > 0;
+    p.id, p.article, p.name, c.name AS category, m.name AS manufacturer,
+    s.name AS supplier, p.price, p.stock, p.discount
+FROM products p
+LEFT JOIN categories c ON c.id = p.category_id
+LEFT JOIN manufacturers m ON m.id = p.manufacturer_id
+LEFT JOIN suppliers s ON s.id = p.supplier_id
+WHERE p.stock > 0;
 
 -- Представление: товары со скидкой > 15%
 CREATE VIEW IF NOT EXISTS discounted_products AS
 SELECT 
-    id, article, name, category, price,
-    discount, (price * (1 - discount / 100.0)) AS final_price,
-    stock
-FROM products
-WHERE discount > 15;
+    p.id, p.article, p.name, c.name AS category, p.price,
+    p.discount, (p.price * (1 - p.discount / 100.0)) AS final_price,
+    p.stock
+FROM products p
+LEFT JOIN categories c ON c.id = p.category_id
+WHERE p.discount > 15;
 
 -- Представление: статистика заказов
 CREATE VIEW IF NOT EXISTS order_statistics AS
@@ -133,10 +321,12 @@ FROM orders
 GROUP BY DATE_TRUNC('day', order_date)
 ORDER BY order_day DESC;
 
+-- clock_timestamp(), а не время начала транзакции: по updated_at
+-- локальный снимок каталога догружает изменившиеся товары
 CREATE OR REPLACE FUNCTION update_product_timestamp()
 RETURNS TRIGGER AS $$
 BEGIN
-    NEW.updated_at = CURRENT_TIMESTAMP;
+    NEW.updated_at = clock_timestamp();
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -0,0 +1,259 @@
+"""Кэш миниатюр фотографий товаров: LRU в памяти + готовые миниатюры на диске"""
+
+import hashlib
+import os
+import queue
+import threading
+import tkinter as tk
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageTk
+
+from config import Config
+
+
+class ThumbnailCache:
+    """Двухуровневый кэш миниатюр.
+
+    1) Память: LRU из PhotoImage, ограниченный суммарным объёмом в байтах
+       (ширина * высота * 4). PhotoImage привязан к своему окну Tk, поэтому
+       у каждого главного окна собственный экземпляр кэша.
+    2) Диск: уже уменьшенные миниатюры в Config.THUMB_CACHE_DIR, имя файла -
+       хэш от пути, mtime и размера исходника и размера миниатюры. Изменённый
+       файл получает новый ключ, старая миниатюра просто перестаёт читаться.
+
+    Счётчики попаданий/промахов доступны через stats().
+    """
+
+    def __init__(self, size=(120, 100), max_bytes=None, cache_dir=None):
+        self.size = size
+        self.max_bytes = max_bytes or Config.THUMB_CACHE_MEMORY_BYTES
+        self.cache_dir = cache_dir or Config.THUMB_CACHE_DIR
+
+        self._memory = OrderedDict()  # ключ -> PhotoImage
+        self._memory_bytes = 0
+        self._candidates = {}         # photo_path из БД -> [возможные файлы]
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "memory_misses": 0,
+            "disk_hits": 0,
+            "disk_misses": 0,
+        }
+
+    # ---------- ПОИСК ФАЙЛА ----------
+
+    def resolve(self, photo_path):
+        """Найти файл фото товара (или заглушку): (путь, ключ кэша) или None.
+
+        Запоминаются только возможные пути файла; stat выполняется при
+        каждом вызове, чтобы заменённое на месте или появившееся позже фото
+        получило новый ключ без перезапуска.
+        """
+        candidates = self._candidates.get(photo_path)
+        if candidates is None:
+            candidates = self._candidates[photo_path] = self._find_candidates(photo_path)
+
+        for path in candidates:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            raw = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{self.size}"
+            return path, hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        return None
+
+    @staticmethod
+    def _find_candidates(photo_path):
+        """Пути, по которым может лежать фото товара, в порядке проверки"""
+        candidates = []
+        if photo_path:
+            # 1) как есть
+            candidates.append(str(photo_path))
+
+            # 2) только имя файла
+            base = os.path.basename(str(photo_path)).strip()
+            if base:
+                candidates.append(
+                    os.path.join(Config.DATA_DIR, "product_images", base)
+                )
+
+            # 3) без расширения -> .jpg
+            root, ext = os.path.splitext(base)
+            if not ext:
+                candidates.append(
+                    os.path.join(Config.DATA_DIR, "product_images", f"{root}.jpg")
+                )
+        candidates.append(Config.PLACEHOLDER_IMAGE)
+        return candidates
+
+    # ---------- ДИСК ----------
+
+    def load_image(self, path, key):
+        """Миниатюра в виде PIL.Image: с диска или из исходника (потокобезопасно)"""
+        cached = os.path.join(self.cache_dir, key[:2], key + ".png")
+        try:
+            with Image.open(cached) as img:
+                img.load()
+                self._count("disk_hits")
+                return img
+        except OSError:
+            self._count("disk_misses")
+
+        with Image.open(path) as img:
+            thumb = img.resize(self.size, Image.Resampling.LANCZOS)
+
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            tmp = f"{cached}.{os.getpid()}.{threading.get_ident()}.tmp"
+            thumb.save(tmp, "PNG")
+            os.replace(tmp, cached)
+        except OSError as e:
+            print(f"⚠ Не удалось сохранить миниатюру: {e}")
+        return thumb
+
+    # ---------- ПАМЯТЬ ----------
+
+    def get_cached(self, key):
+        """PhotoImage из памяти или None"""
+        with self._lock:
+            photo = self._memory.get(key)
+            if photo is None:
+                self._stats["memory_misses"] += 1
+                return None
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            return photo
+
+    def put(self, key, image):
+        """Превратить PIL.Image в PhotoImage и положить в LRU (только поток Tk)"""
+        photo = ImageTk.PhotoImage(image)
+        nbytes = photo.width() * photo.height() * 4
+        with self._lock:
+            if key not in self._memory:
+                self._memory_bytes += nbytes
+            self._memory[key] = photo
+            self._memory.move_to_end(key)
+            while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+                _, old = self._memory.popitem(last=False)
+                self._memory_bytes -= old.width() * old.height() * 4
+        return photo
+
+    def get(self, photo_path):
+        """PhotoImage миниатюры товара (синхронно, только поток Tk)"""
+        resolved = self.resolve(photo_path)
+        if resolved is None:
+            return tk.PhotoImage()
+
+        path, key = resolved
+        photo = self.get_cached(key)
+        if photo is not None:
+            return photo
+
+        try:
+            return self.put(key, self.load_image(path, key))
+        except Exception:
+            return tk.PhotoImage()
+
+    # ---------- СТАТИСТИКА ----------
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """Счётчики попаданий/промахов и заполненность памяти"""
+        with self._lock:
+            result = dict(self._stats)
+            result["memory_items"] = len(self._memory)
+            result["memory_bytes"] = self._memory_bytes
+        return result
+
+
+class ThumbnailLoader:
+    """Фоновая загрузка миниатюр в ограниченном пуле потоков.
+
+    Декодирование и уменьшение (PIL отпускает GIL) выполняются в пуле,
+    а PhotoImage создаётся и отдаётся в callback только в потоке Tk
+    (очередь опрашивается через widget.after). Каждая заявка привязана
+    к «получателю» (карточке): новая заявка для той же карточки или
+    cancel() отменяет прежнюю, и её результат не будет доставлен.
+    """
+
+    POLL_MS = 20
+
+    def __init__(self, cache, widget, workers=None):
+        self.cache = cache
+        self.widget = widget
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or Config.IMAGE_WORKERS,
+            thread_name_prefix="thumbnails",
+        )
+        self._pending = {}  # получатель -> Future
+        self._done = queue.Queue()
+        self._polling = False
+
+    def request(self, target, photo_path, callback):
+        """Запросить миниатюру для target; callback(photo) - в потоке Tk.
+
+        Если миниатюра уже в памяти, callback вызывается сразу.
+        """
+        self.cancel(target)
+
+        resolved = self.cache.resolve(photo_path)
+        if resolved is None:
+            callback(tk.PhotoImage())
+            return
+
+        path, key = resolved
+        photo = self.cache.get_cached(key)
+        if photo is not None:
+            callback(photo)
+            return
+
+        future = self._executor.submit(self.cache.load_image, path, key)
+        self._pending[target] = future
+        future.add_done_callback(
+            lambda f: self._done.put((target, key, f, callback))
+        )
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.POLL_MS, self._poll)
+
+    def cancel(self, target):
+        """Отменить заявку карточки (ушла с экрана или перепривязана)"""
+        future = self._pending.pop(target, None)
+        if future is not None:
+            future.cancel()
+
+    def cancel_all(self):
+        for target in list(self._pending):
+            self.cancel(target)
+
+    def _poll(self):
+        while True:
+            try:
+                target, key, future, callback = self._done.get_nowait()
+            except queue.Empty:
+                break
+            # Доставляем только актуальные заявки
+            if self._pending.get(target) is not future:
+                continue
+            del self._pending[target]
+            try:
+                photo = self.cache.put(key, future.result())
+            except Exception:
+                # Битый файл - показываем заглушку
+                photo = self.cache.get(None)
+            callback(photo)
+
+        if self._pending:
+            self.widget.after(self.POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    def shutdown(self):
+        """Остановить пул, отменив ещё не начатые заявки"""
+        self._pending.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
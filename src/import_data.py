@@ -1,16 +1,135 @@
+import argparse
+import hashlib
+import multiprocessing
 import pandas as pd
 import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
+# Запуск как модуль из корня проекта: python -m src.import_data
+_src_dir = os.path.dirname(os.path.abspath(__file__))
+if _src_dir not in sys.path:
+    sys.path.insert(0, _src_dir)
+
+from catalog import REFERENCES, ensure_references, reference_id_sql
 from config import Config
-from database import Database
+from database import Database, close_pool
+from import_readers import find_file, read_batches
+from import_validation import frame_rows, validate_products
+from order_items import parse_order_articles
+
+
+def normalize_address(address):
+    """Ключ адреса пункта выдачи: без крайних пробелов, пробелы схлопнуты,
+    нижний регистр. Совпадает с колонкой pickup_points.address_key."""
+    return re.sub(r"\s+", " ", str(address).strip(" ")).lower()
+
+
+USER_COLUMNS = ["role", "full_name", "login", "password"]
+# Колонки файла товаров после проверки (category, manufacturer и supplier -
+# названия) и соответствующие колонки products (id из справочников)
+PRODUCT_FIELDS = [
+    "article", "name", "category", "description", "manufacturer", "supplier",
+    "price", "unit", "stock", "discount", "photo_path",
+]
+PRODUCT_COLUMNS = [
+    REFERENCES[f][1] if f in REFERENCES else f for f in PRODUCT_FIELDS
+]
+ORDER_COLUMNS = [
+    "order_number", "order_articles", "order_date", "delivery_date",
+    "pickup_point_id", "client_name", "pickup_code", "status",
+]
+
+
+# Этапы импорта: (таблица, метод DataImporter, название, зависит от этапов).
+# Заказы ссылаются на пункты выдачи, а их позиции - на товары.
+IMPORT_STAGES = [
+    ("users", "import_users", "пользователи", ()),
+    ("pickup_points", "import_pickup_points", "пункты выдачи", ()),
+    ("products", "import_products", "товары", ()),
+    ("orders", "import_orders", "заказы", ("pickup_points", "products")),
+]
+
+
+def _upsert_sql(table, columns, key, source):
+    """INSERT ... ON CONFLICT (key) DO UPDATE только для изменившихся строк.
+
+    source - "SELECT ... FROM staging" или "VALUES (%s, ...)".
+    Строки, совпадающие с сохранёнными, не переписываются.
+    """
+    names = ", ".join(columns)
+    updated = [c for c in columns if c != key]
+    sql = f"INSERT INTO {table} ({names}) {source} ON CONFLICT ({key})"
+    if not updated:
+        return sql + " DO NOTHING"
+    sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in updated)
+    old = ", ".join(f"{table}.{c}" for c in updated)
+    new = ", ".join(f"EXCLUDED.{c}" for c in updated)
+    return (
+        f"{sql} DO UPDATE SET {sets} "
+        f"WHERE ({old}) IS DISTINCT FROM ({new})"
+    )
 
 
 class DataImporter:
-    """Класс для импорта данных из Excel файлов"""
+    """Класс для импорта данных из Excel файлов
+
+    bulk=True  - пакетный режим: строки потоком уходят во временную
+                 таблицу через COPY и сливаются в целевую таблицу одним
+                 INSERT ... ON CONFLICT в одной транзакции;
+    bulk=False - без временной таблицы: INSERT на каждую строку, запросы
+                 уходят на сервер пачками (execute_many), вся пачка
+                 файла - одной транзакцией.
+
+    incremental=True - файл с тем же размером и mtime (или тем же
+                 sha256) пропускается без чтения; в изменённом файле
+                 загружаются только новые и изменённые строки (по хэшу
+                 строки в import_rows), исчезнувшие строки удаляются.
+
+    progress(percent, stage) - необязательный колбэк хода импорта
+                 (вызывается из потока, в котором идёт импорт).
+
+    workers > 1 - независимые этапы (IMPORT_STAGES) выполняются
+                 одновременно в отдельных процессах, каждый со своим пулом
+                 соединений; этап ждёт только те, от которых зависит.
+
+    stop       - необязательный threading.Event: когда он установлен,
+                 импорт останавливается после текущей пачки (при workers > 1 -
+                 после уже запущенных этапов); файл, который не дочитан,
+                 будет загружен заново при следующем импорте.
+    """
+
+    # Имена файлов без расширения: подойдёт любой из import_readers.EXTENSIONS
+    USER_FILES = ["user_import"]
+    PICKUP_POINT_FILES = [
+        "Punkty-vydachi_import",
+        "Пункты выдачи_import",
+        "Пункты выдачи_import",
+    ]
+    PRODUCT_FILES = ["Tovar", "tovar"]
+    ORDER_FILES = ["Zakaz_import", "Заказ_import", "orders"]
 
-    def __init__(self):
+    def __init__(self, bulk=True, incremental=True, progress=None, workers=None,
+                 stop=None):
         self.db = Database()
         self.data_dir = Config.DATA_DIR
+        self.bulk = bulk
+        self.incremental = incremental
+        self.progress = progress
+        self.workers = workers or Config.IMPORT_WORKERS
+        self.stop = stop
+        self.timeline = {}  # этап -> (начало, конец), сек от начала импорта
+        self._stage = (0, 1, "")
+        self._failures = 0  # пачек, которые не удалось загрузить
+        self.report = {}
+        # Отклонённые строки: DataFrame (table, line, key, reason) на пачку
+        self.rejected_rows = []
+        # Адреса пунктов выдачи в порядке файла: в файле заказов пункт
+        # выдачи может быть указан номером строки этого файла
+        self.pickup_point_lines = None
+        self.unresolved_pickup_points = {}
 
     def import_all_data(self):
         """Импорт всех данных из Excel файлов"""
@@ -18,251 +137,891 @@ class DataImporter:
         print("Начинаем импорт данных...")
         print("=" * 50)
 
-        self.import_users()
-        self.import_pickup_points()
-        self.import_products()
-        self.import_orders()
+        self.report = {}
+        self.rejected_rows = []
+        self.timeline = {}
+        self._started = time.time()
+        if self.workers > 1:
+            self._run_stages_parallel()
+        else:
+            self._run_stages()
+        self._report_progress(1)
+        self.print_report()
+        self.print_timeline()
+        self.write_rejected_report()
 
         print("=" * 50)
-        print("✓ Импорт данных успешно завершен!")
+        if self._stopped():
+            print("⏹ Импорт данных остановлен")
+        else:
+            print("✓ Импорт данных успешно завершен!")
         print("=" * 50)
 
+    def _stopped(self):
+        return self.stop is not None and self.stop.is_set()
+
+    def _run_stages(self):
+        """Этапы по очереди в этом процессе"""
+        for index, (table, method, title, _) in enumerate(IMPORT_STAGES):
+            if self._stopped():
+                break
+            self._stage = (index, len(IMPORT_STAGES), title)
+            self._report_progress(0)
+            started = time.time() - self._started
+            getattr(self, method)()
+            self.timeline[table] = (started, time.time() - self._started)
+
+    def _run_stages_parallel(self):
+        """Этапы в пуле процессов с учётом зависимостей между ними.
+
+        Разбор файлов (CPU) идёт параллельно в разных процессах; каждый
+        процесс пишет в БД через собственные соединения. Результаты
+        (статистика, отклонённые строки, время) собираются здесь.
+        """
+        context = multiprocessing.get_context("spawn")
+        results = {}
+        pending = list(IMPORT_STAGES)
+        running = {}
+        titles = {table: title for table, _, title, _ in IMPORT_STAGES}
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_stage_worker,
+            initargs=(Config.DATABASE_CONFIG, self.data_dir),
+        ) as executor:
+            while pending or running:
+                if self._stopped():
+                    # Запущенные этапы в других процессах доработают сами
+                    pending.clear()
+                for stage in list(pending):
+                    table, method, _, depends = stage
+                    if all(d in results for d in depends):
+                        pending.remove(stage)
+                        future = executor.submit(
+                            _run_stage, method, self.bulk, self.incremental
+                        )
+                        running[future] = table
+
+                if self.progress is not None:
+                    self.progress(
+                        int(len(results) * 100 / len(IMPORT_STAGES)),
+                        ", ".join(titles[t] for t in running.values()),
+                    )
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    table = running.pop(future)
+                    try:
+                        results[table] = future.result()
+                    except Exception as e:
+                        print(f"✗ Ошибка этапа импорта {table}: {e}")
+                        results[table] = None
+
+        # Итоги в порядке этапов, а не в порядке завершения
+        for table, _, _, _ in IMPORT_STAGES:
+            if results.get(table) is None:
+                continue
+            report, rejected_rows, started, finished = results[table]
+            self.report.update(report)
+            self.rejected_rows += rejected_rows
+            self.timeline[table] = (started - self._started, finished - self._started)
+
+    def print_timeline(self):
+        """Когда начался и закончился каждый этап (сек от начала импорта)"""
+        if not self.timeline:
+            return
+        end = max(finish for _, finish in self.timeline.values())
+        scale = 40 / end if end else 0
+        print("\n⏱ Этапы импорта (сек от начала):")
+        for table, (start, finish) in self.timeline.items():
+            bar = " " * int(start * scale) + "█" * max(1, int((finish - start) * scale))
+            print(f" {table:<15}{start:7.2f} → {finish:6.2f}  {bar}")
+        print(f" Всего: {end:.2f} с")
+
+    def _report_progress(self, fraction):
+        """Сообщить процент готовности: fraction - доля текущего этапа"""
+        if self.progress is None:
+            return
+        index, total, stage = self._stage
+        self.progress(int((index + fraction) * 100 / total), stage)
+
+    def print_report(self):
+        """Итоговая таблица по таблицам: вставлено / обновлено / без изменений /
+        удалено / отклонено"""
+        if not self.report:
+            return
+
+        def fmt(value):
+            return "—" if value is None else str(value)
+
+        columns = [
+            ("inserted", "Вставлено"),
+            ("updated", "Обновлено"),
+            ("skipped", "Без измен."),
+            ("deleted", "Удалено"),
+            ("rejected", "Отклонено"),
+        ]
+        print("\n📊 Итоги импорта:")
+        print(f" {'Таблица':<15}" + "".join(f"{title:>12}" for _, title in columns))
+        for table, stats in self.report.items():
+            if stats is None:
+                print(f" {table:<15}   файл не изменился")
+                continue
+            print(
+                f" {table:<15}"
+                + "".join(f"{fmt(stats.get(name)):>12}" for name, _ in columns)
+            )
+
+    def write_rejected_report(self):
+        """Записать отклонённые строки с причинами в CSV; вернуть путь или None"""
+        if not self.rejected_rows:
+            return None
+        report = pd.concat(self.rejected_rows, ignore_index=True)
+        report = report[["table", "line", "key", "reason"]]
+        report.columns = ["Таблица", "Строка файла", "Ключ", "Причина"]
+
+        os.makedirs(Config.IMPORT_REPORT_DIR, exist_ok=True)
+        path = os.path.join(
+            Config.IMPORT_REPORT_DIR,
+            time.strftime("rejected_%Y%m%d_%H%M%S.csv"),
+        )
+        try:
+            report.to_csv(path, index=False, encoding="utf-8-sig")
+        except OSError as e:
+            print(f"⚠ Не удалось записать отчёт об ошибках: {e}")
+            return None
+        print(f"⚠ Отклонено строк: {len(report)}, подробности: {path}")
+        return path
+
+    # ---------- ЗАГРУЗКА СТРОК ----------
+
+    def _load(self, table, df, build_row, staging_columns, merge_sql, insert_sql,
+              many=False):
+        """Загрузить DataFrame в таблицу через COPY или запросами INSERT.
+
+        build_row(row) превращает строку DataFrame в кортеж значений
+        (many=True - в список кортежей); строки, на которых он падает,
+        считаются отклонёнными.
+
+        merge_sql заканчивается RETURNING (xmax = 0): по нему слитые строки
+        делятся на вставленные и обновлённые. Строки, совпавшие с уже
+        сохранёнными, считаются «без изменений».
+        """
+        rows = []
+        rejected = []
+        for index, row in df.iterrows():
+            try:
+                if many:
+                    rows.extend(build_row(row))
+                else:
+                    rows.append(build_row(row))
+            except Exception as e:
+                rejected.append((index + 2, None, str(e)))
+                print(f" ⚠ Ошибка в строке {index + 2} ({table}): {e}")
+
+        return self._merge_rows(
+            table, rows, len(df),
+            pd.DataFrame(rejected, columns=["line", "key", "reason"]),
+            staging_columns, merge_sql, insert_sql,
+        )
+
+    def _merge_rows(self, table, rows, total, rejected, staging_columns,
+                    merge_sql, insert_sql):
+        """Отправить готовые кортежи в БД (см. _load).
+
+        total    - строк во входной пачке;
+        rejected - DataFrame (line, key, reason) отклонённых при проверке.
+        """
+        if len(rejected):
+            self.rejected_rows.append(rejected.assign(table=table))
+
+        if self.bulk:
+            result = self.db.copy_merge(
+                f"staging_{table}", staging_columns, rows, merge_sql,
+                returning=True,
+            )
+            if result is None:
+                stats = {
+                    "inserted": 0, "updated": 0, "skipped": 0,
+                    "rejected": total, "failed": True,
+                }
+            else:
+                staged, merged = result
+                inserted = sum(1 for (is_new,) in merged if is_new)
+                stats = {
+                    "inserted": inserted,
+                    "updated": len(merged) - inserted,
+                    "skipped": staged - len(merged),
+                    "rejected": len(rejected),
+                    "failed": False,
+                }
+        else:
+            # Без RETURNING вставка неотличима от обновления
+            if self.db.execute_many(insert_sql, rows):
+                stats = {
+                    "inserted": None, "updated": None, "skipped": None,
+                    "rejected": len(rejected), "failed": False,
+                }
+            else:
+                stats = {
+                    "inserted": 0, "updated": 0, "skipped": 0,
+                    "rejected": total, "failed": True,
+                }
+
+        if stats["failed"]:
+            self._failures += 1
+        self._add_stats(table, stats)
+        return stats
+
+    def _fail_batch(self, table, total, rejected):
+        """Пачка не загружена целиком из-за ошибки до отправки строк"""
+        if len(rejected):
+            self.rejected_rows.append(rejected.assign(table=table))
+        stats = {
+            "inserted": 0, "updated": 0, "skipped": 0,
+            "rejected": total, "failed": True,
+        }
+        self._failures += 1
+        self._add_stats(table, stats)
+        return stats
+
+    def _add_stats(self, table, stats):
+        """Добавить статистику пачки к итогам таблицы за этот импорт"""
+        total = self.report.get(table)
+        if total is None:
+            self.report[table] = dict(stats)
+            return
+        for name, value in stats.items():
+            if name == "failed":
+                total["failed"] = total.get("failed") or value
+            elif value is not None:
+                total[name] = (total.get(name) or 0) + value
+
+    # ---------- ИНКРЕМЕНТАЛЬНЫЙ ИМПОРТ ----------
+
+    @staticmethod
+    def _sha256(file_path):
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _row_key(value):
+        """Естественный ключ строки в виде текста (1.0 -> "1")"""
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
+
+    @classmethod
+    def _row_hashes(cls, batch):
+        """Хэши строк пачки, не зависящие от типов колонок.
+
+        Типы колонок pandas выводит по каждой пачке отдельно: одна пустая
+        ячейка делает целую колонку float или object. Поэтому хэшируется
+        текст ячеек (пустая -> "", 1.0 -> "1"), а не исходные значения.
+        """
+        text = batch.astype(object).where(batch.notna(), "")
+        text = text.apply(lambda column: column.map(cls._row_key))
+        return pd.util.hash_pandas_object(text, index=False).values.view("int64").tolist()
+
+    def _import_file(self, source, file_path, load, key_column, delete_sql,
+                     header=0, names=None, on_batch=None):
+        """Импортировать файл целиком или только его изменения.
+
+        Файл читается пачками по Config.IMPORT_BATCH_ROWS строк, и каждая
+        пачка сразу уходит в БД, поэтому память не зависит от размера
+        файла (кроме набора ключей строк для поиска удалённых).
+
+        source     - имя источника в import_rows (обычно имя таблицы)
+        load(df)   - загрузить пачку строк в БД
+        key_column - колонка с естественным ключом строки
+        delete_sql - DELETE ... WHERE key = ANY(%s) для исчезнувших строк
+        header, names - как у read_batches; on_batch(df) - для каждой пачки
+        """
+        name = os.path.relpath(file_path, self.data_dir)
+        st = os.stat(file_path)
+        known = self.db.execute_query(
+            "SELECT size, mtime_ns, sha256 FROM import_files WHERE path = %s",
+            (name,),
+        )
+        known = known[0] if known else None
+
+        if self.incremental and known and known[:2] == (st.st_size, st.st_mtime_ns):
+            print(" = Файл не изменился, пропущен")
+            self.report[source] = None
+            return
+        sha256 = self._sha256(file_path)
+        if self.incremental and known and known[2] == sha256:
+            self._save_file_fingerprint(name, st, sha256)
+            print(" = Содержимое файла не изменилось, пропущен")
+            self.report[source] = None
+            return
+
+        stored = {}
+        if self.incremental:
+            # Хэши читаются потоком: без промежуточного списка всех строк
+            stored = dict(self.db.iter_query(
+                "SELECT row_key, row_hash FROM import_rows WHERE source = %s",
+                (source,),
+            ))
+
+        seen = set()
+        found = unchanged = 0
+        failed = False
+        for batch in read_batches(
+            file_path, Config.IMPORT_BATCH_ROWS, header=header, names=names
+        ):
+            if self._stopped():
+                # Ключи остальных строк неизвестны: ничего не удаляется,
+                # отпечаток файла не сохраняется
+                print(" ⏹ Импорт остановлен, файл загружен не полностью")
+                return
+            if on_batch is not None:
+                on_batch(batch)
+            found += len(batch)
+
+            keys = [self._row_key(v) for v in batch[key_column]]
+            hashes = self._row_hashes(batch)
+            changed = []
+            for key, row_hash in zip(keys, hashes):
+                # Повтор ключа в файле: действует первая строка
+                changed.append(key not in seen and stored.get(key) != row_hash)
+                seen.add(key)
+            unchanged += len(batch) - sum(changed)
+
+            if any(changed):
+                before = self._failures
+                reported = len(self.rejected_rows)
+                load(batch[changed])
+                if self._failures > before:
+                    failed = True
+                else:
+                    # Хэши сохраняются только для загруженных строк:
+                    # отклонённые будут загружены заново при следующем импорте
+                    rejected = {
+                        line
+                        for report in self.rejected_rows[reported:]
+                        for line in report["line"]
+                    }
+                    self._save_row_hashes(source, [
+                        (k, h)
+                        for k, h, c, line in zip(keys, hashes, changed, batch.index + 2)
+                        if c and line not in rejected
+                    ])
+            self._report_progress(0.9 * batch.attrs.get("progress", 0))
+
+        print(f" Найдено записей: {found}")
+        stats = self.report.setdefault(
+            source,
+            {"inserted": 0, "updated": 0, "skipped": 0, "rejected": 0},
+        )
+        stats["skipped"] = (stats.get("skipped") or 0) + unchanged
+        deleted = [k for k in stored if k not in seen]
+        stats["deleted"] = self._delete_rows(source, deleted, delete_sql)
+
+        # При ошибке отпечаток файла не сохраняется: следующий запуск
+        # перечитает файл и повторит незагруженные пачки
+        if not failed:
+            self._save_file_fingerprint(name, st, sha256)
+
+    def _delete_rows(self, source, keys, delete_sql):
+        """Удалить строки, пропавшие из файла; вернуть число удалённых"""
+        if not keys:
+            return 0
+        try:
+            with self.db.transaction():
+                deleted = self.db.execute_update(delete_sql, (keys,), rowcount=True)
+                self.db.execute_update(
+                    "DELETE FROM import_rows "
+                    "WHERE source = %s AND row_key = ANY(%s)",
+                    (source, keys),
+                )
+        except Exception as e:
+            print(f" ⚠ Не удалось удалить строки ({source}): {e}")
+            return 0
+        if deleted < len(keys):
+            print(
+                f" ⚠ {source}: {len(keys) - deleted} строк пропали из файла, "
+                f"но оставлены в БД (на них ссылаются другие записи)"
+            )
+        return deleted
+
+    def _save_row_hashes(self, source, rows):
+        if not rows:
+            return
+        self.db.copy_merge(
+            "staging_import_rows",
+            [("row_key", "VARCHAR(255)"), ("row_hash", "BIGINT")],
+            rows,
+            f"""
+                INSERT INTO import_rows (source, row_key, row_hash)
+                SELECT '{source}', row_key, row_hash FROM staging_import_rows
+                ON CONFLICT (source, row_key)
+                DO UPDATE SET row_hash = EXCLUDED.row_hash;
+            """,
+        )
+
+    def _save_file_fingerprint(self, name, st, sha256):
+        self.db.execute_update(
+            """
+            INSERT INTO import_files (path, size, mtime_ns, sha256)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (path) DO UPDATE SET
+                size = EXCLUDED.size,
+                mtime_ns = EXCLUDED.mtime_ns,
+                sha256 = EXCLUDED.sha256,
+                imported_at = CURRENT_TIMESTAMP
+            """,
+            (name, st.st_size, st.st_mtime_ns, sha256),
+        )
+
+    # ---------- ПОЛЬЗОВАТЕЛИ ----------
+
     def import_users(self):
         """Импорт пользователей"""
         try:
-            file_path = os.path.join(self.data_dir, "user_import.xlsx")
-            if not os.path.exists(file_path):
-                print(f"⚠ Файл не найден: {file_path}")
+            file_path = find_file(self.data_dir, self.USER_FILES)
+            if not file_path:
+                print(f"⚠ Файл пользователей не найден (проверены: {self.USER_FILES})")
                 return
 
-            df = pd.read_excel(file_path)
             print("\n📥 Импорт пользователей...")
-            print(f" Найдено записей: {len(df)}")
-
-            for _, row in df.iterrows():
-                try:
-                    query = """
-                        INSERT INTO users (role, full_name, login, password)
-                        VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (login) DO NOTHING;
-                    """
-                    self.db.execute_update(
-                        query,
-                        (
-                            str(row["Роль сотрудника"]),
-                            str(row["ФИО"]),
-                            str(row["Логин"]),
-                            str(row["Пароль"]),
-                        ),
-                    )
-                except Exception as e:
-                    print(f" ⚠ Ошибка при импорте пользователя: {e}")
-
+            self._import_file(
+                "users", file_path, self.load_users, "Логин",
+                "DELETE FROM users WHERE login = ANY(%s)",
+            )
             print(" ✓ Импортировано пользователей")
         except Exception as e:
             print(f"✗ Ошибка импорта пользователей: {e}")
 
+    def load_users(self, df):
+        """Загрузить DataFrame пользователей в БД"""
+
+        def build_row(row):
+            return (
+                str(row["Роль сотрудника"]),
+                str(row["ФИО"]),
+                str(row["Логин"]),
+                str(row["Пароль"]),
+            )
+
+        return self._load(
+            "users",
+            df,
+            build_row,
+            [
+                ("role", "VARCHAR(50)"),
+                ("full_name", "VARCHAR(255)"),
+                ("login", "VARCHAR(100)"),
+                ("password", "VARCHAR(255)"),
+            ],
+            _upsert_sql(
+                "users", USER_COLUMNS, "login",
+                f"SELECT {', '.join(USER_COLUMNS)} FROM staging_users",
+            ) + " RETURNING (xmax = 0)",
+            _upsert_sql(
+                "users", USER_COLUMNS, "login", "VALUES (%s, %s, %s, %s)"
+            ),
+        )
+
+    # ---------- ПУНКТЫ ВЫДАЧИ ----------
+
     def import_pickup_points(self):
         """Импорт пунктов выдачи"""
         try:
-            possible_names = [
-                "Punkty-vydachi_import.xlsx",
-                "Пункты выдачи_import.xlsx",
-                "Пункты выдачи_import.xlsx",
-            ]
-
-            file_path = None
-            for name in possible_names:
-                path = os.path.join(self.data_dir, name)
-                if os.path.exists(path):
-                    file_path = path
-                    break
-
+            file_path = find_file(self.data_dir, self.PICKUP_POINT_FILES)
             if not file_path:
                 print(
-                    f"⚠ Файл пунктов выдачи не найден (проверены: {possible_names})"
+                    f"⚠ Файл пунктов выдачи не найден (проверены: {self.PICKUP_POINT_FILES})"
                 )
                 return
 
-            df = pd.read_excel(file_path, header=None)
-            df.columns = ["address"]
+            # Если файл не изменился и не читается, строки останутся None и
+            # при импорте заказов будут прочитаны из файла (_pickup_point_file_lines)
+            self.pickup_point_lines = None
 
-            print("\n📥 Импорт пунктов выдачи...")
-            print(f" Найдено записей: {len(df)}")
-
-            for _, row in df.iterrows():
-                try:
-                    query = """
-                        INSERT INTO pickup_points (address)
-                        VALUES (%s)
-                        ON CONFLICT (address) DO NOTHING;
-                    """
-                    self.db.execute_update(query, (str(row["address"]),))
-                except Exception as e:
-                    print(f" ⚠ Ошибка при импорте пункта: {e}")
+            def remember_lines(df):
+                if self.pickup_point_lines is None:
+                    self.pickup_point_lines = []
+                self.pickup_point_lines += [str(a) for a in df["address"]]
 
+            print("\n📥 Импорт пунктов выдачи...")
+            self._import_file(
+                "pickup_points", file_path, self.load_pickup_points, "address",
+                """
+                DELETE FROM pickup_points
+                WHERE address = ANY(%s)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM orders o
+                      WHERE o.pickup_point_id = pickup_points.id
+                  )
+                """,
+                header=None,
+                names=["address"],
+                on_batch=remember_lines,
+            )
             print(" ✓ Импортировано пунктов выдачи")
         except Exception as e:
             print(f"✗ Ошибка импорта пунктов выдачи: {e}")
 
+    def load_pickup_points(self, df):
+        """Загрузить DataFrame пунктов выдачи в БД"""
+        return self._load(
+            "pickup_points",
+            df,
+            lambda row: (str(row["address"]),),
+            [("address", "VARCHAR(255)")],
+            """
+                INSERT INTO pickup_points (address)
+                SELECT address FROM staging_pickup_points
+                ON CONFLICT (address) DO NOTHING
+                RETURNING (xmax = 0);
+            """,
+            """
+                INSERT INTO pickup_points (address)
+                VALUES (%s)
+                ON CONFLICT (address) DO NOTHING;
+            """,
+        )
+
+    # ---------- ТОВАРЫ ----------
+
     def import_products(self):
         """Импорт товаров"""
         try:
-            file_path = os.path.join(self.data_dir, "Tovar.xlsx")
-            if not os.path.exists(file_path):
-                print(f"⚠ Файл не найден: {file_path}")
+            file_path = find_file(self.data_dir, self.PRODUCT_FILES)
+            if not file_path:
+                print(f"⚠ Файл товаров не найден (проверены: {self.PRODUCT_FILES})")
                 return
 
-            df = pd.read_excel(file_path)
             print("\n📥 Импорт товаров...")
-            print(f" Найдено записей: {len(df)}")
-
-            if "Фото" not in df.columns:
-                df["Фото"] = ""
-
-            for index, row in df.iterrows():
-                try:
-                    article = str(row["Артикул"])
-                    name = str(row["Наименование товара"])
-                    unit = str(row["Единица измерения"])
-                    price = float(row["Цена"])
-                    supplier = str(row["Поставщик"])
-                    manufacturer = str(row["Производитель"])
-                    category = str(row["Категория товара"])
-                    discount = int(row["Действующая скидка"])
-                    stock = int(row["Кол-во на складе"])
-                    description = (
-                        str(row["Описание товара"])
-                        if pd.notna(row["Описание товара"])
-                        else ""
-                    )
-                    photo = (
-                        str(row["Фото"]) if pd.notna(row["Фото"]) else ""
-                    )
-
-                    photo_path = ""
-                    if photo.strip():
-                        photo_path = os.path.join(
-                            Config.DATA_DIR,
-                            "product_images",
-                            photo.strip(),
-                        )
-
-                    query = """
-                        INSERT INTO products
-                        (article, name, category, description, manufacturer, supplier,
-                         price, unit, stock, discount, photo_path)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (article) DO NOTHING;
-                    """
-                    self.db.execute_update(
-                        query,
-                        (
-                            article,
-                            name,
-                            category,
-                            description,
-                            manufacturer,
-                            supplier,
-                            price,
-                            unit,
-                            stock,
-                            discount,
-                            photo_path,
-                        ),
-                    )
-                except Exception as e:
-                    print(
-                        f" ⚠ Ошибка при импорте товара строка {index + 2}: {e}"
-                    )
-
+            self._import_file(
+                "products", file_path, self.load_products,
+                "Артикул",
+                """
+                DELETE FROM products
+                WHERE article = ANY(%s)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM order_items oi
+                      WHERE oi.product_id = products.id
+                  )
+                """,
+            )
             print(" ✓ Импортировано товаров")
         except Exception as e:
             print(f"✗ Ошибка импорта товаров: {e}")
 
+    def load_products(self, df):
+        """Загрузить DataFrame товаров в БД.
+
+        Колонки проверяются и приводятся к типам целиком (validate_products),
+        в БД уходят только прошедшие проверку строки. Новые категории,
+        производители и поставщики сначала добавляются в справочники,
+        а при слиянии названия заменяются их id.
+        """
+        clean, rejected = validate_products(
+            df, os.path.join(Config.DATA_DIR, "product_images")
+        )
+        if not ensure_references(self.db, {f: clean[f] for f in REFERENCES}):
+            return self._fail_batch("products", len(df), rejected)
+
+        staged = ", ".join(
+            reference_id_sql(f, f"staging_products.{f}") if f in REFERENCES else f
+            for f in PRODUCT_FIELDS
+        )
+        values = ", ".join(
+            reference_id_sql(f) if f in REFERENCES else "%s"
+            for f in PRODUCT_FIELDS
+        )
+        return self._merge_rows(
+            "products",
+            frame_rows(clean),
+            len(df),
+            rejected,
+            [
+                ("article", "VARCHAR(100)"),
+                ("name", "VARCHAR(255)"),
+                ("category", "VARCHAR(100)"),
+                ("description", "TEXT"),
+                ("manufacturer", "VARCHAR(100)"),
+                ("supplier", "VARCHAR(100)"),
+                ("price", "DECIMAL(10,2)"),
+                ("unit", "VARCHAR(50)"),
+                ("stock", "INTEGER"),
+                ("discount", "INTEGER"),
+                ("photo_path", "VARCHAR(255)"),
+            ],
+            _upsert_sql(
+                "products", PRODUCT_COLUMNS, "article",
+                f"SELECT {staged} FROM staging_products",
+            ) + " RETURNING (xmax = 0)",
+            _upsert_sql(
+                "products", PRODUCT_COLUMNS, "article", f"VALUES ({values})",
+            ),
+        )
+
+    # ---------- ЗАКАЗЫ ----------
+
     def import_orders(self):
         """Импорт заказов"""
         try:
-            possible_names = [
-                "Zakaz_import.xlsx",
-                "Заказ_import.xlsx",
-                "orders.xlsx",
-            ]
-
-            file_path = None
-            for name in possible_names:
-                path = os.path.join(self.data_dir, name)
-                if os.path.exists(path):
-                    file_path = path
-                    break
-
+            file_path = find_file(self.data_dir, self.ORDER_FILES)
             if not file_path:
                 print(
-                    f"⚠ Файл заказов не найден (проверены: {possible_names})"
+                    f"⚠ Файл заказов не найден (проверены: {self.ORDER_FILES})"
                 )
                 return
 
-            df = pd.read_excel(file_path)
-            print("\n📥 Импорт заказов...")
-            print(f" Найдено записей: {len(df)}")
-
-            for _, row in df.iterrows():
-                try:
-                    pickup_point_id = None
-
-                    if pd.notna(row["Адрес пункта выдачи"]):
-                        addr = str(row["Адрес пункта выдачи"]).strip()
-                        try:
-                            # ищем по адресу без лишних пробелов
-                            query_point = (
-                                "SELECT id FROM pickup_points "
-                                "WHERE TRIM(address) = %s"
-                            )
-                            result = self.db.execute_query(
-                                query_point, (addr,)
-                            )
-                            if result:
-                                pickup_point_id = result[0][0]
-                            else:
-                                print(
-                                    f" ⚠ Пункт выдачи не найден по адресу: '{addr}'"
-                                )
-                        except Exception as e:
-                            print(
-                                f" ⚠ Ошибка поиска пункта выдачи '{addr}': {e}"
-                            )
-
-                    order_date = str(row["Дата заказа"])
-                    delivery_date = str(row["Дата доставки"])
-
-                    query = """
-                        INSERT INTO orders
-                        (order_number, order_articles, order_date, delivery_date,
-                         pickup_point_id, client_name, pickup_code, status)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (order_number) DO NOTHING;
-                    """
-                    self.db.execute_update(
-                        query,
-                        (
-                            int(row["Номер заказа"]),
-                            str(row["Артикул заказа"]),
-                            order_date,
-                            delivery_date,
-                            pickup_point_id,
-                            str(row["ФИО авторизированного клиента"]),
-                            str(row["Код для получения"]),
-                            str(row["Статус заказа"]),
-                        ),
-                    )
-                except Exception as e:
-                    print(f" ⚠ Ошибка при импорте заказа: {e}")
+            # Пункты выдачи загружаются в память один раз на весь файл
+            pickup_points = self._pickup_point_map()
+            self.unresolved_pickup_points = {}
 
+            print("\n📥 Импорт заказов...")
+            self._import_file(
+                "orders", file_path,
+                lambda df: [
+                    self.load_orders(df, pickup_points),
+                    self.load_order_items(df),
+                ],
+                "Номер заказа",
+                "DELETE FROM orders WHERE order_number = ANY(%s::INTEGER[])",
+            )
+            self._print_unresolved_pickup_points()
             print(" ✓ Импортировано заказов")
         except Exception as e:
             print(f"✗ Ошибка импорта заказов: {e}")
 
+    def load_orders(self, df, pickup_points=None):
+        """Загрузить DataFrame заказов в БД.
+
+        pickup_points - заранее загруженная карта {address_key: id};
+        ненайденные адреса копятся в self.unresolved_pickup_points.
+        """
+        if pickup_points is None:
+            pickup_points = self._pickup_point_map()
+        unresolved = self.unresolved_pickup_points
+
+        def build_row(row):
+            addr = row["Адрес пункта выдачи"]
+            pickup_point_id = None
+            if pd.notna(addr):
+                pickup_point_id = self._resolve_pickup_point(addr, pickup_points)
+                if pickup_point_id is None:
+                    key = str(addr).strip()
+                    unresolved[key] = unresolved.get(key, 0) + 1
+            return (
+                int(row["Номер заказа"]),
+                str(row["Артикул заказа"]),
+                self._parse_date(row["Дата заказа"]),
+                self._parse_date(row["Дата доставки"]),
+                pickup_point_id,
+                str(row["ФИО авторизированного клиента"]),
+                str(row["Код для получения"]),
+                str(row["Статус заказа"]),
+            )
+
+        stats = self._load(
+            "orders",
+            df,
+            build_row,
+            [
+                ("order_number", "INTEGER"),
+                ("order_articles", "VARCHAR(255)"),
+                ("order_date", "DATE"),
+                ("delivery_date", "DATE"),
+                ("pickup_point_id", "INTEGER"),
+                ("client_name", "VARCHAR(255)"),
+                ("pickup_code", "VARCHAR(100)"),
+                ("status", "VARCHAR(50)"),
+            ],
+            _upsert_sql(
+                "orders", ORDER_COLUMNS, "order_number",
+                f"SELECT {', '.join(ORDER_COLUMNS)} FROM staging_orders",
+            ) + " RETURNING (xmax = 0)",
+            _upsert_sql(
+                "orders", ORDER_COLUMNS, "order_number",
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            ),
+        )
+
+        return stats
+
+    def _print_unresolved_pickup_points(self):
+        """Одна сводка по адресам, для которых не нашёлся пункт выдачи"""
+        unresolved = self.unresolved_pickup_points
+        if not unresolved:
+            return
+        print(
+            f" ⚠ Пункты выдачи не найдены: {len(unresolved)} адресов "
+            f"в {sum(unresolved.values())} заказах (заказы загружены без пункта)"
+        )
+        for addr, count in sorted(unresolved.items(), key=lambda x: -x[1]):
+            print(f"    '{addr}' - заказов: {count}")
+
+    def load_order_items(self, df):
+        """Разобрать "Артикул заказа" ("А112Т4, 2, F635R4, 2") в order_items.
+
+        Вызывается после load_orders: позиции привязываются к заказу по
+        номеру, к товару - по артикулу. Позиции с неизвестным артикулом
+        попадают в «без изменений». Позиции, исчезнувшие из строки
+        загружаемого заказа, удаляются (только в пакетном режиме).
+        """
+
+        def build_row(row):
+            order_number = int(row["Номер заказа"])
+            return [
+                (order_number, article, quantity)
+                for article, quantity in parse_order_articles(row["Артикул заказа"])
+            ]
+
+        return self._load(
+            "order_items",
+            df,
+            build_row,
+            [
+                ("order_number", "INTEGER"),
+                ("article", "VARCHAR(100)"),
+                ("quantity", "INTEGER"),
+            ],
+            """
+                WITH wanted AS (
+                    SELECT o.id AS order_id, p.id AS product_id,
+                           SUM(s.quantity) AS quantity
+                    FROM staging_order_items s
+                    JOIN orders o ON o.order_number = s.order_number
+                    JOIN products p ON p.article = s.article
+                    GROUP BY o.id, p.id
+                ), removed AS (
+                    DELETE FROM order_items oi
+                    USING orders o
+                    WHERE oi.order_id = o.id
+                      AND o.order_number IN
+                          (SELECT order_number FROM staging_order_items)
+                      AND (oi.order_id, oi.product_id) NOT IN
+                          (SELECT order_id, product_id FROM wanted)
+                )
+                INSERT INTO order_items (order_id, product_id, quantity)
+                SELECT order_id, product_id, quantity FROM wanted
+                ON CONFLICT (order_id, product_id) DO UPDATE
+                SET quantity = EXCLUDED.quantity
+                WHERE order_items.quantity IS DISTINCT FROM EXCLUDED.quantity
+                RETURNING (xmax = 0);
+            """,
+            """
+                INSERT INTO order_items (order_id, product_id, quantity)
+                SELECT o.id, p.id, v.quantity
+                FROM (SELECT %s::INTEGER AS order_number,
+                             %s::VARCHAR AS article,
+                             %s::INTEGER AS quantity) v
+                JOIN orders o ON o.order_number = v.order_number
+                JOIN products p ON p.article = v.article
+                ON CONFLICT (order_id, product_id) DO UPDATE
+                SET quantity = EXCLUDED.quantity;
+            """,
+            many=True,
+        )
+
+    @staticmethod
+    def _parse_date(value):
+        """Дата из Excel (Timestamp, '27.02.2025', '2025-02-27') -> date или None"""
+        if pd.isna(value) or str(value).strip() == "":
+            return None
+        if isinstance(value, str):
+            value = value.strip()
+            # ISO-строку не переставляем как день/месяц
+            dayfirst = not re.match(r"\d{4}-", value)
+        else:
+            dayfirst = False
+        return pd.to_datetime(value, dayfirst=dayfirst).date()
+
+    def _pickup_point_map(self):
+        """Все пункты выдачи одним запросом: {address_key: id}"""
+        rows = self.db.execute_query(
+            "SELECT address_key, id FROM pickup_points"
+        ) or []
+        return dict(rows)
+
+    def _resolve_pickup_point(self, addr, pickup_points):
+        """id пункта выдачи по адресу или по номеру строки файла пунктов"""
+        if isinstance(addr, (int, float)) or str(addr).strip().isdigit():
+            line = int(addr)
+            lines = self.pickup_point_lines
+            if lines is None:
+                lines = self._pickup_point_file_lines()
+            if 1 <= line <= len(lines):
+                addr = lines[line - 1]
+        return pickup_points.get(normalize_address(addr))
+
+    def _pickup_point_file_lines(self):
+        """Адреса из файла пунктов выдачи, если он не импортировался в этом запуске"""
+        self.pickup_point_lines = []
+        file_path = find_file(self.data_dir, self.PICKUP_POINT_FILES)
+        if file_path:
+            for df in read_batches(
+                file_path, Config.IMPORT_BATCH_ROWS, header=None, names=["address"]
+            ):
+                self.pickup_point_lines += [str(a) for a in df["address"]]
+        return self.pickup_point_lines
+
+
+def _init_stage_worker(database_config, data_dir):
+    """Процесс-исполнитель этапов берёт настройки родителя"""
+    Config.DATABASE_CONFIG = database_config
+    Config.DATA_DIR = data_dir
+
+
+def _run_stage(method, bulk, incremental):
+    """Выполнить один этап импорта в процессе-исполнителе.
+
+    Возвращает (report, rejected_rows, начало, конец) - время по time.time().
+    """
+    importer = DataImporter(bulk=bulk, incremental=incremental, workers=1)
+    started = time.time()
+    try:
+        getattr(importer, method)()
+    finally:
+        close_pool()
+    return importer.report, importer.rejected_rows, started, time.time()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Импорт данных из Excel файлов в БД"
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="повторять импорт каждые --interval секунд (Ctrl+C - выход)",
+    )
+    parser.add_argument(
+        "--interval", type=int, default=Config.IMPORT_WATCH_INTERVAL,
+        help="пауза между импортами в режиме --watch, сек",
+    )
+    parser.add_argument(
+        "--full", action="store_true",
+        help="загрузить все строки, а не только изменившиеся",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=Config.IMPORT_WORKERS,
+        help="процессов для параллельных этапов (1 - по очереди)",
+    )
+    args = parser.parse_args()
+
+    Database().bootstrap()
+    importer = DataImporter(incremental=not args.full, workers=args.workers)
+    try:
+        while True:
+            importer.import_all_data()
+            if not args.watch:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n⏹ Импорт остановлен")
+    finally:
+        close_pool()
+
 
 if __name__ == "__main__":
-    importer = DataImporter()
-    importer.import_all_data()
+    main()
@@ -0,0 +1,101 @@
+"""Фоновый импорт данных с отслеживанием прогресса"""
+
+import threading
+import traceback
+
+from import_data import DataImporter
+
+
+class ImportJob:
+    """Импорт данных в отдельном потоке.
+
+    Состояние (идёт ли импорт, процент, текущий этап, ошибка) хранится
+    под блокировкой; окна опрашивают его через status() из своего цикла Tk,
+    поэтому сам импорт ничего не знает об интерфейсе.
+
+    Этапы идут последовательно (workers=1): пул процессов внутри процесса
+    окон не запускается, а stop() останавливает импорт после текущей пачки.
+    """
+
+    def __init__(self, importer_factory=DataImporter):
+        self.importer_factory = importer_factory
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._state = {
+            "running": False,
+            "finished": False,
+            "percent": 0,
+            "stage": "",
+            "error": None,
+            "runs": 0,
+        }
+
+    def start(self):
+        """Запустить импорт, если он ещё не идёт; True - запущен"""
+        with self._lock:
+            if self._state["running"]:
+                return False
+            self._state.update(
+                running=True, finished=False, percent=0, stage="", error=None
+            )
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="data-import", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self):
+        error = None
+        try:
+            importer = self.importer_factory(
+                progress=self._on_progress, workers=1, stop=self._stop
+            )
+            importer.import_all_data()
+        except Exception as e:
+            error = str(e)
+            print(f"✗ Ошибка фонового импорта: {e}")
+            traceback.print_exc()
+        finally:
+            with self._lock:
+                self._state.update(running=False, finished=True, error=error)
+                self._state["runs"] += 1
+                if error is None and not self._stop.is_set():
+                    self._state["percent"] = 100
+
+    def _on_progress(self, percent, stage):
+        with self._lock:
+            self._state["percent"] = percent
+            self._state["stage"] = stage
+
+    def status(self):
+        """Снимок состояния: running, finished, percent, stage, error, runs"""
+        with self._lock:
+            return dict(self._state)
+
+    def wait(self, timeout=None):
+        """Дождаться окончания импорта; False - не успел за timeout"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def stop(self, timeout=None):
+        """Остановить импорт и дождаться его; False - не успел за timeout"""
+        self._stop.set()
+        return self.wait(timeout)
+
+
+_job = None
+_job_lock = threading.Lock()
+
+
+def get_import_job():
+    """Общее для процесса задание импорта (создаётся при первом обращении)"""
+    global _job
+    with _job_lock:
+        if _job is None:
+            _job = ImportJob()
+        return _job
@@ -0,0 +1,128 @@
+"""Потоковое чтение файлов импорта пачками строк (Excel, CSV, Parquet)"""
+
+import os
+
+import pandas as pd
+
+# Поддерживаемые форматы в порядке поиска файла
+EXTENSIONS = (".xlsx", ".csv", ".parquet")
+
+
+def find_file(directory, names):
+    """Первый существующий файл из names с любым из EXTENSIONS или None.
+
+    names - имена без расширения ("Tovar") или с ним ("Tovar.xlsx").
+    """
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        candidates = [name] if ext.lower() in EXTENSIONS else [
+            stem + e for e in EXTENSIONS
+        ]
+        for candidate in candidates:
+            path = os.path.join(directory, candidate)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def read_batches(path, batch_size, header=0, names=None):
+    """Читать файл пачками DataFrame не больше batch_size строк.
+
+    header=0    - первая строка файла содержит названия колонок;
+    header=None - заголовка нет, колонки называются names.
+
+    Индекс пачки - номер строки в файле минус 2 (как у pd.read_excel с
+    заголовком), поэтому «index + 2» - строка файла для сообщений.
+    В frame.attrs["progress"] - прочитанная доля файла (0..1).
+    В памяти одновременно находится только одна пачка.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return _csv_batches(path, batch_size, header, names)
+    if ext == ".parquet":
+        return _parquet_batches(path, batch_size, names)
+    return _excel_batches(path, batch_size, header, names)
+
+
+def _frame(rows, columns, lines, progress):
+    df = pd.DataFrame(rows, columns=columns, index=[line - 2 for line in lines])
+    df.attrs["progress"] = progress
+    return df
+
+
+def _excel_batches(path, batch_size, header, names):
+    # read_only: openpyxl разбирает лист потоково, а не строит его целиком
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        total = sheet.max_row or 0
+        rows = sheet.iter_rows(values_only=True)
+
+        if header is None:
+            columns = list(names)
+            line = 0
+        else:
+            first = next(rows, ())
+            columns = [
+                str(c) if c is not None else f"Unnamed: {i}"
+                for i, c in enumerate(first)
+            ]
+            line = 1
+
+        width = len(columns)
+        batch, lines = [], []
+        for values in rows:
+            line += 1
+            if all(v is None for v in values):
+                continue
+            values = tuple(values[:width])
+            batch.append(values + (None,) * (width - len(values)))
+            lines.append(line)
+            if len(batch) >= batch_size:
+                yield _frame(batch, columns, lines, line / total if total else 0)
+                batch, lines = [], []
+        if batch:
+            yield _frame(batch, columns, lines, 1)
+    finally:
+        workbook.close()
+
+
+def _csv_batches(path, batch_size, header, names):
+    size = os.path.getsize(path) or 1
+    with open(path, "rb") as f:
+        chunks = pd.read_csv(
+            f,
+            chunksize=batch_size,
+            header=header,
+            names=names,
+            encoding="utf-8-sig",
+        )
+        line = 2 if header is not None else 1
+        for chunk in chunks:
+            chunk.index = range(line - 2, line - 2 + len(chunk))
+            line += len(chunk)
+            chunk.attrs["progress"] = min(f.tell() / size, 1)
+            yield chunk
+
+
+def _parquet_batches(path, batch_size, names):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError(
+            "для импорта Parquet нужен пакет pyarrow (pip install pyarrow)"
+        )
+
+    parquet = pq.ParquetFile(path)
+    total = parquet.metadata.num_rows or 1
+    line = 2
+    for record_batch in parquet.iter_batches(batch_size=batch_size):
+        df = record_batch.to_pandas()
+        if names is not None:
+            df.columns = list(names)
+        df.index = range(line - 2, line - 2 + len(df))
+        line += len(df)
+        df.attrs["progress"] = min((line - 2) / total, 1)
+        yield df
@@ -0,0 +1,90 @@
+"""Векторная проверка и приведение типов строк импорта"""
+
+import os
+
+import pandas as pd
+
+# Колонки файла товаров -> колонки таблицы products (порядок загрузки)
+PRODUCT_TEXT_COLUMNS = {
+    "article": "Артикул",
+    "name": "Наименование товара",
+    "category": "Категория товара",
+    "description": "Описание товара",
+    "manufacturer": "Производитель",
+    "supplier": "Поставщик",
+    "unit": "Единица измерения",
+}
+
+
+def _text(df, column):
+    """Текстовая колонка без пропусков и крайних пробелов"""
+    if column not in df.columns:
+        return pd.Series("", index=df.index)
+    series = df[column]
+    return series.where(series.notna(), "").astype(str).str.strip()
+
+
+def _reasons(index, checks):
+    """Склеить причины отказа по маскам: Series строк ("" - строка в порядке)"""
+    reasons = pd.Series("", index=index)
+    for mask, reason in checks:
+        reasons = reasons.mask(mask, reasons + reason + "; ")
+    return reasons.str[:-2]
+
+
+def validate_products(df, photo_dir):
+    """Проверить и привести типы всего DataFrame товаров разом.
+
+    Проверки: есть артикул, цена - неотрицательное число, скидка - целое
+    от 0 до 100, остаток - неотрицательное целое.
+    Возвращает (clean, rejected):
+      clean    - DataFrame с колонками products в порядке загрузки,
+                 только прошедшие проверку строки;
+      rejected - DataFrame (line, key, reason) отклонённых строк,
+                 line - строка исходного файла.
+    """
+    text = {name: _text(df, column) for name, column in PRODUCT_TEXT_COLUMNS.items()}
+    price = pd.to_numeric(df["Цена"], errors="coerce")
+    discount = pd.to_numeric(df["Действующая скидка"], errors="coerce")
+    stock = pd.to_numeric(df["Кол-во на складе"], errors="coerce")
+
+    reasons = _reasons(df.index, [
+        (text["article"] == "", "нет артикула"),
+        (price.isna(), "цена не число"),
+        (price < 0, "отрицательная цена"),
+        (discount.isna() | (discount % 1 != 0), "скидка не целое число"),
+        ((discount < 0) | (discount > 100), "скидка вне диапазона 0..100"),
+        (stock.isna() | (stock % 1 != 0), "остаток не целое число"),
+        (stock < 0, "отрицательный остаток"),
+    ])
+    bad = reasons != ""
+    ok = ~bad
+
+    rejected = pd.DataFrame({
+        "line": df.index[bad] + 2,
+        "key": text["article"][bad].to_numpy(),
+        "reason": reasons[bad].to_numpy(),
+    })
+
+    photo = _text(df, "Фото")
+    photo_path = (os.path.join(photo_dir, "") + photo).where(photo != "", "")
+
+    clean = pd.DataFrame({
+        "article": text["article"][ok],
+        "name": text["name"][ok],
+        "category": text["category"][ok],
+        "description": text["description"][ok],
+        "manufacturer": text["manufacturer"][ok],
+        "supplier": text["supplier"][ok],
+        "price": price[ok].round(2),
+        "unit": text["unit"][ok],
+        "stock": stock[ok].astype("int64"),
+        "discount": discount[ok].astype("int64"),
+        "photo_path": photo_path[ok],
+    })
+    return clean, rejected
+
+
+def frame_rows(df):
+    """Строки DataFrame кортежами обычных значений Python (для psycopg2)"""
+    return zip(*(df[c].tolist() for c in df.columns))
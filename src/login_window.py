@@ -188,7 +188,7 @@ class LoginWindow:
                 SELECT role, full_name FROM users
                 WHERE login = %s AND password = %s;
             """
-            result = self.db.execute_query(query, (login, password))
+            result = self.db.execute_query(query, (login, password), prepare=True)
 
             if result:
                 role, full_name = result[0]
@@ -30,14 +30,15 @@ def main():
         print("\n📥 Загрузка модулей...")
 
         try:
-            from database import Database
+            from config import Config
+            from database import Database, close_pool, start_cache_listener
             print("✓ database.py загружен")
         except ImportError as e:
             print(f"✗ Ошибка загрузки database.py: {e}")
             raise
 
         try:
-            from import_data import DataImporter
+            from import_job import get_import_job
             print("✓ import_data.py загружен")
         except ImportError as e:
             print(f"✗ Ошибка загрузки import_data.py: {e}")
@@ -60,12 +61,17 @@ def main():
         # --------- ИНИЦИАЛИЗАЦИЯ БД И ДАННЫХ ---------
         print("\n🔄 Инициализация базы данных...")
         db = Database()
+        db.bootstrap()
         print("✓ БД подключена")
+        # Правки с других рабочих мест вытесняют устаревшие строки из кэша
+        # и обновляют карточки в открытых окнах
+        start_cache_listener()
 
-        print("📥 Импорт данных...")
-        importer = DataImporter()
-        importer.import_all_data()
-        print("✓ Данные импортированы")
+        # Импорт идёт в фоне: окно входа открывается сразу,
+        # ход импорта виден в шапке главного окна
+        print("📥 Импорт данных запущен в фоне...")
+        import_job = get_import_job()
+        import_job.start()
 
         print("\n✅ Система готова к работе!")
         print("=" * 60 + "\n")
@@ -96,6 +102,13 @@ def main():
             MainWindow(logged_in["user_data"])
             print("👋 Приложение закрыто пользователем.")
 
+        # Пул закрывается только после того, как импорт отпустил соединения
+        if import_job.status()["running"]:
+            print("⏹ Импорт не завершён, он продолжится при следующем запуске")
+            if not import_job.stop(timeout=Config.IMPORT_STOP_TIMEOUT):
+                print("⚠ Импорт не остановился вовремя")
+        close_pool()
+
     except ImportError as e:
         print(f"\n❌ ОШИБКА ИМПОРТА: {e}")
         print("\n🔍 Диагностика:")
@@ -3,12 +3,34 @@ from tkinter import ttk, messagebox
 from decimal import Decimal
 from PIL import Image, ImageTk
 import os
-from database import Database
+import queue
+import threading
+from database import Database, off_row_change, on_row_change
 from config import Config
+from catalog import (
+    ALL_SUPPLIERS, build_products_query, load_product, load_product_cards,
+    search_terms,
+)
+from catalog_snapshot import get_catalog_snapshot
+from models import Product
+from query_cache import ALL_TABLES
+from virtual_list import VirtualCardList
+from image_cache import ThumbnailCache, ThumbnailLoader
+from import_job import get_import_job
 from styles import Styles
 from order_window import OrderWindow
 from product_window import ProductWindow
 
+# Высота карточки товара и промежуток между карточками (px)
+CARD_HEIGHT = 160
+CARD_GAP = 10
+
+# Период опроса фонового импорта (мс)
+IMPORT_POLL_MS = 500
+
+# Период разбора уведомлений об изменённых товарах (мс)
+ROW_CHANGES_POLL_MS = 500
+
 
 class MainWindow:
     """Главное окно приложения с карточками товаров"""
@@ -20,13 +42,34 @@ class MainWindow:
         self.window.title("ООО Обувь - Система управления товарами")
         self.window.geometry("1200x700")
         Styles.configure_styles()
+        self.thumbnails = ThumbnailCache()
+        self.image_loader = ThumbnailLoader(self.thumbnails, self.window)
+        self.placeholder_image = self.thumbnails.get(None)
         self.product_edit_window = None
         self.orders_window = None
+        # Фоновый поиск: отложенный запуск, текущий запрос и номер поколения
+        self._search_after_id = None
+        self._search_handle = None
+        self._search_generation = 0
+        self._search_results = queue.Queue()
+        self._search_polling = False
+        self._products_exhausted = False
+        # Локальный режим: каталог фильтруется и сортируется в памяти
+        self.snapshot = get_catalog_snapshot() if Config.LOCAL_CATALOG else None
+        self.import_job = get_import_job()
+        self._import_was_running = False
+        # Изменения товаров с любых рабочих мест (из потока слушателя БД)
+        self._row_changes = queue.Queue()
+        on_row_change(self._row_changes.put)
         self._build_header()
         self._build_toolbar()
         self._build_cards_area()
         self.load_products()
+        self._watch_import()
+        self.window.after(ROW_CHANGES_POLL_MS, self._apply_row_changes)
         self.window.mainloop()
+        off_row_change(self._row_changes.put)
+        self.image_loader.shutdown()
 
     # ---------- ШАПКА ----------
 
@@ -59,6 +102,10 @@ class MainWindow:
         right_frame = ttk.Frame(top_frame)
         right_frame.pack(side=tk.RIGHT, padx=10)
 
+        # Ход фонового импорта данных
+        self.import_label = ttk.Label(right_frame, text="")
+        self.import_label.pack(side=tk.LEFT, padx=10)
+
         # ФИО
         ttk.Label(
             right_frame,
@@ -74,6 +121,28 @@ class MainWindow:
             command=self.logout,
         ).pack(side=tk.RIGHT, padx=5)
 
+    def _watch_import(self):
+        """Показывать ход фонового импорта; по окончании обновить каталог"""
+        status = self.import_job.status()
+        if status["running"]:
+            stage = f" ({status['stage']})" if status["stage"] else ""
+            self.import_label.config(
+                text=f"⏳ Импорт данных: {status['percent']}%{stage}"
+            )
+            self._import_was_running = True
+            self.window.after(IMPORT_POLL_MS, self._watch_import)
+            return
+
+        if self._import_was_running:
+            self._import_was_running = False
+            if status["error"]:
+                self.import_label.config(text="⚠ Импорт данных не удался")
+            else:
+                self.import_label.config(text="✓ Данные обновлены")
+                self._load_suppliers()
+                self.refresh_products()
+            self.window.after(5000, lambda: self.import_label.config(text=""))
+
     # ---------- ПАНЕЛЬ КНОПОК И ФИЛЬТРОВ ----------
 
     def _build_toolbar(self):
@@ -94,7 +163,7 @@ class MainWindow:
                 filter_frame, textvariable=self.search_var, width=30
             )
             search_entry.pack(side=tk.LEFT, padx=5)
-            search_entry.bind("<KeyRelease>", lambda e: self.load_products())
+            search_entry.bind("<KeyRelease>", lambda e: self._schedule_search())
 
             # Поставщик
             ttk.Label(filter_frame, text="Поставщик:", style="TLabel").pack(
@@ -162,28 +231,24 @@ class MainWindow:
         container.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
         self.canvas = tk.Canvas(container, highlightthickness=0, bg="white")
-        scrollbar = ttk.Scrollbar(
-            container, orient=tk.VERTICAL, command=self.canvas.yview
-        )
-        self.canvas.configure(yscrollcommand=scrollbar.set)
-        self.cards_frame = tk.Frame(self.canvas, bg="white")
-        self.canvas_window_id = self.canvas.create_window(
-            (0, 0), window=self.cards_frame, anchor="nw"
-        )
-        self.cards_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")),
+        scrollbar = ttk.Scrollbar(container, orient=tk.VERTICAL)
+
+        # Карточки создаются только для видимой части списка и переиспользуются
+        self.card_list = VirtualCardList(
+            self.canvas,
+            CARD_HEIGHT + CARD_GAP,
+            self._create_product_card,
+            self._bind_product_card,
+            empty_text="Товары не найдены",
+            unbind_card=self.image_loader.cancel,
+            on_near_end=self._load_more_products,
+            key=lambda product: product.id,
         )
+        self.card_list.attach_scrollbar(scrollbar)
 
-        # Растягиваем внутренний фрейм по ширине канваса
-        self.canvas.bind("<Configure>", self._on_canvas_configure)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-    def _on_canvas_configure(self, event):
-        """Растягивать фрейм с карточками по ширине canvas"""
-        self.canvas.itemconfig(self.canvas_window_id, width=event.width)
-
     # ---------- ЗАГРУЗКА ДАННЫХ ----------
 
        # ---------- ЗАГРУЗКА ДАННЫХ ----------
@@ -191,208 +256,327 @@ class MainWindow:
     def _load_suppliers(self):
         try:
             rows = self.db.execute_query(
-                "SELECT DISTINCT supplier FROM products ORDER BY supplier"
+                # Только поставщики, у которых есть товары
+                "SELECT s.name FROM suppliers s WHERE EXISTS ("
+                "SELECT 1 FROM products p WHERE p.supplier_id = s.id"
+                ") ORDER BY s.name",
+                cache=True,
             )
             values = ["Все поставщики"]
             if rows:
                 values += [r[0] for r in rows if r[0]]
             if self.supplier_combo:
                 self.supplier_combo["values"] = values
-                self.supplier_combo.current(0)
+                # Выбранный поставщик сохраняется при повторной загрузке
+                if self.supplier_var.get() not in values:
+                    self.supplier_combo.current(0)
         except Exception as e:
             messagebox.showerror("Ошибка", f"Ошибка загрузки поставщиков: {e}")
 
-    def _query_products(self):
-        """Получить товары с учётом фильтров/поиска/сортировки"""
-        search = self.search_var.get().strip().lower()
-        supplier = self.supplier_var.get()
-        sort = self.sort_var.get()
+    def _query_products(self, after=None, offset=0, limit=None):
+        """Запрос страницы товаров с учётом фильтров/поиска/сортировки.
+
+        after - последняя уже показанная строка, offset - сколько строк
+        уже показано, limit - размер страницы (по умолчанию PAGE_SIZE).
+        Возвращает (query, params).
+        """
+        query, params = build_products_query(
+            self.search_var.get(),
+            self.supplier_var.get(),
+            self.sort_var.get(),
+            trigram=self.db.has_extension("pg_trgm"),
+            limit=limit or Config.PAGE_SIZE,
+            after=after,
+            offset=offset,
+        )
+        return query, params
 
-        query = (
-            "SELECT id, article, name, category, description, "
-            "manufacturer, supplier, price, unit, stock, discount, photo_path "
-            "FROM products WHERE 1=1"
+    def _schedule_search(self):
+        """Отложить поиск до паузы в наборе текста"""
+        if self.snapshot is not None:
+            self.load_products()
+            return
+        if self._search_after_id:
+            self.window.after_cancel(self._search_after_id)
+        self._search_after_id = self.window.after(
+            Config.SEARCH_DEBOUNCE_MS, self.load_products
         )
 
-        params = []
-
-        # фильтр по поставщику
-        if supplier != "Все поставщики":
-            query += " AND supplier = %s"
-            params.append(supplier)
-
-        # ПОИСК ПО НЕСКОЛЬКИМ СЛОВАМ
-        if search:
-            # разбиваем строку: "туфли kari rieker" -> ["туфли","kari","rieker"]
-            terms = [t for t in search.split() if t]
-
-            for term in terms:
-                p = f"%{term}%"
-                # для каждого слова добавляем блок (OR по полям, AND между словами)
-                query += (
-                    " AND ("
-                    "LOWER(article) LIKE %s OR "
-                    "LOWER(name) LIKE %s OR "
-                    "LOWER(category) LIKE %s OR "
-                    "LOWER(manufacturer) LIKE %s OR "
-                    "LOWER(supplier) LIKE %s OR "
-                    "LOWER(description) LIKE %s)"
-                )
-                params += [p] * 6
-
-        # сортировка
-        if sort == "По возрастанию":
-            query += " ORDER BY stock ASC"
-        elif sort == "По убыванию":
-            query += " ORDER BY stock DESC"
-        else:
-            query += " ORDER BY article"
+    def load_products(self):
+        """Запустить загрузку первой страницы товаров в фоновом потоке.
 
-        return self.db.execute_query(query, params if params else None)
+        Предыдущий незавершённый запрос отменяется на сервере, а результат
+        отрисовывается, только если он относится к последнему запросу.
+        """
+        if self._search_after_id:
+            self.window.after_cancel(self._search_after_id)
+            self._search_after_id = None
 
-    def load_products(self):
-        """Перерисовать список карточек товаров"""
-        for child in self.cards_frame.winfo_children():
-            child.destroy()
+        if self._search_handle:
+            self._search_handle.cancel()
 
+        self._search_generation += 1
+        if self.snapshot is not None:
+            self._show_local_products()
+            return
+        self._products_exhausted = False
+        self._start_products_query(self._query_products(), "set")
+
+    def refresh_products(self):
+        """Перечитать уже загруженные товары после изменений (сохранение,
+        импорт): прокрутка сохраняется, а перерисовываются только карточки
+        изменившихся, добавленных, удалённых или сдвинувшихся товаров."""
+        if self._search_after_id:
+            self.window.after_cancel(self._search_after_id)
+            self._search_after_id = None
+        if self._search_handle:
+            self._search_handle.cancel()
+
+        self._search_generation += 1
+        if self.snapshot is not None:
+            self._show_local_products(reconcile=True)
+            return
+        limit = max(len(self.card_list.rows), Config.PAGE_SIZE)
+        self._start_products_query(
+            self._query_products(limit=limit), "reconcile", limit
+        )
+
+    def _apply_row_changes(self):
+        """Обновить карточки товаров, изменённых где угодно (on_row_change).
+
+        Удалённые товары убираются из списка, изменённые - перечитываются
+        по id и перепривязываются к своей карточке. Если изменение может
+        поменять состав или порядок списка (новый товар, поиск, фильтр,
+        ключ сортировки, слишком много строк), загруженный список
+        перечитывается один раз через refresh_products.
+        """
+        changes = []
+        while True:
+            try:
+                changes += self._row_changes.get_nowait()
+            except queue.Empty:
+                break
+        changes = [c for c in changes if c.table in ("products", ALL_TABLES)]
         try:
-            rows = self._query_products()
+            if changes:
+                self._apply_product_changes(changes)
         except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка загрузки товаров: {e}")
+            print(f"⚠ Ошибка обновления карточек: {e}")
+        finally:
+            self.window.after(ROW_CHANGES_POLL_MS, self._apply_row_changes)
+
+    def _apply_product_changes(self, changes):
+        if self.snapshot is not None:
+            # Снимок сам догружает изменения по updated_at
+            self.refresh_products()
             return
 
+        updated, deleted = set(), set()
+        for change in changes:
+            if change.ids is None or change.op == "INSERT":
+                self.refresh_products()
+                return
+            if change.op == "DELETE":
+                deleted.update(change.ids)
+            else:
+                updated.update(change.ids)
+
+        cards = self.card_list
+        for product_id in deleted:
+            cards.remove_key(product_id)
+        updated -= deleted
+
+        if not updated:
+            return
+        # Совпадение с поиском (и место в порядке релевантности) считает БД
+        if search_terms(self.search_var.get()):
+            self.refresh_products()
+            return
+
+        supplier = self.supplier_var.get()
+        by_stock = self.sort_var.get() in ("По возрастанию", "По убыванию")
+        loaded = {i for i in updated if cards.index_of(i) is not None}
+        # Товар вне списка может в него попасть, только если изменилось
+        # поле фильтра или сортировки по количеству
+        if updated - loaded and (by_stock or supplier != ALL_SUPPLIERS):
+            self.refresh_products()
+            return
+        if not loaded:
+            return
+
+        products = load_product_cards(self.db, loaded)
+        if products is None:
+            return
+        for product in products:
+            shown = cards.rows[cards.index_of(product.id)]
+            if (
+                (by_stock and product.stock != shown.stock)
+                or (supplier != ALL_SUPPLIERS and product.supplier != supplier)
+            ):
+                self.refresh_products()
+                return
+        for product in products:
+            cards.update_row(product)
+        # Товары, которых уже нет в БД
+        for product_id in loaded - {product.id for product in products}:
+            cards.remove_key(product_id)
+
+    def _show_local_products(self, reconcile=False):
+        """Локальный режим: догрузить изменения и выбрать товары из снимка"""
+        self.snapshot.refresh()
+        self._products_exhausted = True
+        rows = self.snapshot.query(
+            self.search_var.get(),
+            self.supplier_var.get(),
+            self.sort_var.get(),
+        )
+        if reconcile:
+            self.card_list.reconcile(rows)
+        else:
+            self._render_products(rows)
+
+    def _load_more_products(self):
+        """Догрузить следующую страницу, когда список прокручен к концу"""
+        if self._search_handle is not None or self._products_exhausted:
+            return
+        rows = self.card_list.rows
         if not rows:
-            ttk.Label(self.cards_frame, text="Товары не найдены").pack(
-                anchor="w", pady=5
-            )
             return
+        self._start_products_query(
+            self._query_products(after=rows[-1], offset=len(rows)), "append"
+        )
 
-        for row in rows:
-            (
-                prod_id,
-                article,
-                name,
-                category,
-                description,
-                manufacturer,
-                supplier,
-                price,
-                unit,
-                stock,
-                discount,
-                photo_path,
-            ) = row
-
-            self._create_product_card(
-                prod_id,
-                article,
-                name,
-                category,
-                description,
-                manufacturer,
-                supplier,
-                price,
-                unit,
-                stock,
-                discount,
-                photo_path,
-            )
+    def _start_products_query(self, query_params, mode, limit=None):
+        """Выполнить запрос товаров в фоне; mode - как показать результат:
+        "set" - новый список, "append" - следующая страница,
+        "reconcile" - замена загруженных строк (refresh_products)."""
+        # Без поиска текст запроса зависит только от фильтра, сортировки и
+        # страницы - он готовится на сервере один раз. План поиска зависит
+        # от искомых слов (LIKE, триграммы), такие запросы планируются заново
+        prepare = not search_terms(self.search_var.get())
+        handle = self.db.cancellable_query(
+            *query_params, cache=True, prepare=prepare
+        )
+        self._search_handle = handle
+
+        threading.Thread(
+            target=self._run_search,
+            args=(handle, self._search_generation, mode, limit or Config.PAGE_SIZE),
+            daemon=True,
+        ).start()
+        if not self._search_polling:
+            self._search_polling = True
+            self.window.after(30, self._poll_search)
+
+    def _run_search(self, handle, generation, mode, limit):
+        """Рабочий поток: выполнить запрос и положить результат в очередь"""
+        try:
+            rows, error = handle.run(), None
+            if rows is not None:
+                rows = Product.from_rows(rows)
+        except Exception as e:
+            rows, error = None, e
+        if not handle.cancelled:
+            self._search_results.put((generation, rows, error, mode, limit))
+
+    def _poll_search(self):
+        """Главный поток: забрать свежий результат поиска, устаревшие отбросить"""
+        latest = None
+        while True:
+            try:
+                result = self._search_results.get_nowait()
+            except queue.Empty:
+                break
+            if result[0] == self._search_generation:
+                latest = result
+
+        if latest is None:
+            if self._search_handle is not None:
+                self.window.after(30, self._poll_search)
+            else:
+                self._search_polling = False
+            return
 
+        self._search_polling = False
+        self._search_handle = None
+        _, rows, error, mode, limit = latest
+        if error is not None:
+            messagebox.showerror("Ошибка", f"Ошибка загрузки товаров: {error}")
+            return
 
-    # ---------- КАРТОЧКА ТОВАРА ----------
+        rows = rows or []
+        self._products_exhausted = len(rows) < limit
+        if mode == "append":
+            self.card_list.append_rows(rows)
+        elif mode == "reconcile":
+            self.card_list.reconcile(rows)
+        else:
+            self._render_products(rows)
 
-    def _create_product_card(
-        self,
-        prod_id,
-        article,
-        name,
-        category,
-        description,
-        manufacturer,
-        supplier,
-        price,
-        unit,
-        stock,
-        discount,
-        photo_path,
-    ):
+    def _render_products(self, rows):
+        """Показать найденные товары в списке карточек"""
+        self.card_list.set_rows(rows or [])
 
-        # Цвет фона по условиям ТЗ
-        bg_color = "white"
-        if discount and discount > 15:
-            bg_color = "#2E8B57"
+    # ---------- КАРТОЧКА ТОВАРА ----------
 
-        # высота 160px + pack_propagate
-        card = tk.Frame(self.cards_frame, bd=1, relief=tk.SOLID, bg=bg_color, height=160)
-        card.pack(fill=tk.X, pady=5)
+    def _create_product_card(self, parent):
+        """Построить пустую карточку товара (заполняется в _bind_product_card)"""
+        card = tk.Frame(parent, bd=1, relief=tk.SOLID, height=CARD_HEIGHT)
         card.pack_propagate(False)
+        card.product_id = None
 
         # Левая часть — фото
-        left = tk.Frame(card, width=150, height=160, bg=bg_color)
+        left = tk.Frame(card, width=150, height=CARD_HEIGHT)
         left.pack(side=tk.LEFT, fill=tk.BOTH)
         left.pack_propagate(False)
 
-        img_label = tk.Label(left, bg=bg_color)
+        img_label = tk.Label(left)
         img_label.pack(expand=True)
 
-        img = self._load_product_image(photo_path)
-        img_label.configure(image=img)
-        img_label.image = img
-
         # Центральная часть — текст
-        center = tk.Frame(card, bg=bg_color)
+        center = tk.Frame(card)
         center.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-        title_text = f"{category} | {name}"
-        tk.Label(
-            center,
-            text=title_text,
-            font=Config.FONT_HEADER,
-            bg=bg_color,
-        ).pack(anchor="w")
+        title = tk.Label(center, font=Config.FONT_HEADER)
+        title.pack(anchor="w")
 
-        lines = [
-            f"Описание товара: {description or '-'}",
-            f"Производитель: {manufacturer}",
-            f"Поставщик: {supplier}",
-        ]
+        def text_label(container):
+            label = tk.Label(
+                container,
+                fg="black",
+                anchor="w",
+                justify="left",
+                font=Config.FONT_DEFAULT,
+            )
+            label.pack(anchor="w")
+            return label
+
+        description = text_label(center)
+        manufacturer = text_label(center)
+        supplier = text_label(center)
+
+        # Цена: слово 'Цена:' чёрное, старая цена красная зачёркнутая, новая чёрная
+        price_container = tk.Frame(center)
+        price_container.pack(anchor="w")
+        price_word = tk.Label(
+            price_container, text="Цена: ", fg="black", font=Config.FONT_DEFAULT
+        )
+        price_word.pack(side=tk.LEFT, anchor="w")
+        old_price = tk.Label(
+            price_container,
+            fg="#FF0000",
+            font=(Config.FONT_DEFAULT[0], Config.FONT_DEFAULT[1], "overstrike"),
+        )
+        old_price.pack(side=tk.LEFT, anchor="w")
+        new_price = tk.Label(price_container, fg="black", font=Config.FONT_DEFAULT)
+        new_price.pack(side=tk.LEFT, anchor="w")
 
-        price_line = self._format_price_line(price, discount)
-        lines.append(price_line)
-
-        lines.append(f"Единица измерения: {unit}")
-        lines.append(f"Количество на складе: {stock}")
-
-        for ln in lines:
-            # Если линия содержит цену — сложная обработка
-            if ln.startswith("Цена:"):
-                self._create_price_label(center, ln, bg_color)
-            elif "Количество на складе:" in ln:
-                # Количество голубым если нет на складе
-                qty_color = "#0066CC" if stock == 0 else "black"
-                tk.Label(
-                    center,
-                    text=ln,
-                    bg=bg_color,
-                    fg=qty_color,
-                    anchor="w",
-                    justify="left",
-                    font=Config.FONT_DEFAULT,
-                ).pack(anchor="w")
-            else:
-                tk.Label(
-                    center,
-                    text=ln,
-                    bg=bg_color,
-                    fg="black",
-                    anchor="w",
-                    justify="left",
-                    font=Config.FONT_DEFAULT,
-                ).pack(anchor="w")
+        unit = text_label(center)
+        stock = text_label(center)
 
         # Правая часть — действующая скидка (на доп. фоне)
         right = tk.Frame(
-            card, width=140, height=160, bd=1, relief=tk.SOLID, bg="#7FFF00"
+            card, width=140, height=CARD_HEIGHT, bd=1, relief=tk.SOLID, bg="#7FFF00"
         )
         right.pack(side=tk.RIGHT, fill=tk.Y)
         right.pack_propagate(False)
@@ -405,131 +589,99 @@ class MainWindow:
             bg="#7FFF00",
         ).pack(pady=(10, 5))
 
-        tk.Label(
+        discount = tk.Label(
             right,
-            text=f"{discount or 0} %",
             font=Config.FONT_TITLE,
             fg="black",
             bg="#7FFF00",
-        ).pack()
+        )
+        discount.pack()
 
         # Клик по карточке для администратора
         if self.user_data["role"] == "Администратор":
-            card.bind("<Button-1>", lambda e, pid=prod_id: self.edit_product(pid))
-            for w in (left, center, right):
-                w.bind(
-                    "<Button-1>",
-                    lambda e, pid=prod_id: self.edit_product(pid),
-                )
-
-    def _create_price_label(self, parent, price_text, bg_color):
-        """Создать метку с ценой: слово 'Цена:' чёрное, старая цена красная зачёркнутая, новая чёрная"""
-        # Парсим текст вида "Цена: 100.00 → 85.00"
-        # или "Цена: 100.00"
-        
-        if " → " in price_text:
-            # Есть скидка
-            parts = price_text.split(" → ")
-            price_part = parts[0]  # "Цена: 100.00"
-            new_price = parts[1].strip()  # "85.00"
-            
-            # Отделяем слово "Цена:" от старой цены
-            old_price = price_part.replace("Цена: ", "").strip()
-            
-            # Создаём контейнер для обеих цен
-            price_container = tk.Frame(parent, bg=bg_color)
-            price_container.pack(anchor="w")
-            
-            # Слово "Цена:" (чёрное, обычное)
-            tk.Label(
-                price_container,
-                text="Цена: ",
-                bg=bg_color,
-                fg="black",
-                font=Config.FONT_DEFAULT,
-            ).pack(side=tk.LEFT, anchor="w")
-            
-            # Старая цена (красная, зачёркнутая)
-            tk.Label(
-                price_container,
-                text=old_price,
-                bg=bg_color,
-                fg="#FF0000",
-                font=(Config.FONT_DEFAULT[0], Config.FONT_DEFAULT[1], "overstrike"),
-            ).pack(side=tk.LEFT, anchor="w")
-            
-            # Стрелка и новая цена (чёрная)
-            tk.Label(
-                price_container,
-                text=f" → {new_price}",
-                bg=bg_color,
-                fg="black",
-                font=Config.FONT_DEFAULT,
-            ).pack(side=tk.LEFT, anchor="w")
+            for w in (card, left, center, right):
+                w.bind("<Button-1>", lambda e, c=card: self._on_card_click(c))
+
+        card.widgets = {
+            "image": img_label,
+            "title": title,
+            "description": description,
+            "manufacturer": manufacturer,
+            "supplier": supplier,
+            "price_word": price_word,
+            "old_price": old_price,
+            "new_price": new_price,
+            "unit": unit,
+            "stock": stock,
+            "discount": discount,
+        }
+        # Виджеты, фон которых зависит от скидки
+        card.themed = [card, left, center, price_container] + [
+            w for name, w in card.widgets.items() if name != "discount"
+        ]
+        return card
+
+    def _bind_product_card(self, card, product):
+        """Заполнить карточку данными товара (Product)"""
+        card.product_id = product.id
+        w = card.widgets
+        discount = product.discount
+
+        # Цвет фона по условиям ТЗ
+        bg_color = "white"
+        if discount and discount > 15:
+            bg_color = "#2E8B57"
+        for widget in card.themed:
+            widget.configure(bg=bg_color)
+
+        # Сразу заглушка, настоящее фото подставится из фонового потока
+        self._set_card_image(card, self.placeholder_image)
+        self.image_loader.request(
+            card, product.photo_path,
+            lambda photo, c=card: self._set_card_image(c, photo),
+        )
+
+        w["title"].configure(text=f"{product.category} | {product.name}")
+        w["description"].configure(
+            text=f"Описание товара: {product.description or '-'}"
+        )
+        w["manufacturer"].configure(text=f"Производитель: {product.manufacturer}")
+        w["supplier"].configure(text=f"Поставщик: {product.supplier}")
+
+        old_price, new_price = self._price_parts(product.price, discount)
+        if old_price:
+            w["old_price"].configure(text=old_price)
+            w["old_price"].pack(side=tk.LEFT, anchor="w", before=w["new_price"])
+            w["new_price"].configure(text=f" → {new_price}")
         else:
-            # Нет скидки — просто обычная цена
-            tk.Label(
-                parent,
-                text=price_text,
-                bg=bg_color,
-                fg="black",
-                anchor="w",
-                font=Config.FONT_DEFAULT,
-            ).pack(anchor="w")
-
-    def _load_product_image(self, photo_path):
-        """Загрузить фото товара или картинку-заглушку"""
-        candidates = []
-
-        if photo_path:
-            # 1) как есть
-            candidates.append(str(photo_path))
-
-            # 2) только имя файла
-            base = os.path.basename(str(photo_path)).strip()
-            if base:
-                candidates.append(
-                    os.path.join(Config.DATA_DIR, "product_images", base)
-                )
-
-            # 3) без расширения -> .jpg
-            root, ext = os.path.splitext(base)
-            if not ext:
-                candidates.append(
-                    os.path.join(
-                        Config.DATA_DIR,
-                        "product_images",
-                        f"{root}.jpg",
-                    )
-                )
-
-        path = None
-        for p in candidates:
-            if p and os.path.exists(p):
-                path = p
-                break
+            w["old_price"].pack_forget()
+            w["new_price"].configure(text=new_price)
+
+        w["unit"].configure(text=f"Единица измерения: {product.unit}")
+        # Количество голубым если нет на складе
+        w["stock"].configure(
+            text=f"Количество на складе: {product.stock}",
+            fg="#0066CC" if product.stock == 0 else "black",
+        )
+        w["discount"].configure(text=f"{discount or 0} %")
 
-        if not path:
-            if os.path.exists(Config.PLACEHOLDER_IMAGE):
-                path = Config.PLACEHOLDER_IMAGE
-            else:
-                return tk.PhotoImage()
+    def _set_card_image(self, card, photo):
+        label = card.widgets["image"]
+        label.configure(image=photo)
+        label.image = photo
 
-        try:
-            img = Image.open(path)
-            img = img.resize((120, 100), Image.Resampling.LANCZOS)
-            return ImageTk.PhotoImage(img)
-        except Exception:
-            return tk.PhotoImage()
+    def _on_card_click(self, card):
+        if card.product_id is not None:
+            self.edit_product(card.product_id)
 
-    def _format_price_line(self, price, discount):
-        """Строка цены по ТЗ"""
+    def _price_parts(self, price, discount):
+        """Цена по ТЗ: (старая цена или None, итоговая цена)"""
         price_dec = Decimal(price)
         if discount and discount > 0:
             disc_dec = Decimal(discount)
             final_price = price_dec * (Decimal(1) - disc_dec / Decimal(100))
-            return f"Цена: {price_dec:.2f} → {final_price:.2f}"
-        return f"Цена: {price_dec:.2f}"
+            return f"{price_dec:.2f}", f"{final_price:.2f}"
+        return None, f"{price_dec:.2f}"
 
     # ---------- ОБРАБОТЧИКИ СОБЫТИЙ ----------
 
@@ -543,7 +695,7 @@ class MainWindow:
 
         def on_save():
             self.product_edit_window = None
-            self.load_products()
+            self.refresh_products()
 
         self.product_edit_window = ProductWindow(self.window, None, on_save)
 
@@ -556,21 +708,14 @@ class MainWindow:
             return
 
         try:
-            row = self.db.execute_query(
-                "SELECT id, article, name, category, description, "
-                "manufacturer, supplier, price, unit, stock, discount, "
-                "photo_path FROM products WHERE id = %s",
-                (product_id,),
-            )
-
-            if not row:
+            # В карточке только начало описания - товар загружается целиком
+            product_data = load_product(self.db, product_id)
+            if product_data is None:
                 return
 
-            product_data = row[0]
-
             def on_save():
                 self.product_edit_window = None
-                self.load_products()
+                self.refresh_products()
 
             self.product_edit_window = ProductWindow(
                 self.window, product_data, on_save
@@ -600,4 +745,6 @@ class MainWindow:
     def logout(self):
         """Выход из приложения"""
         if messagebox.askyesno("Выход ⚠️", "Вы уверены, что хотите выйти?"):
+            if self._search_handle:
+                self._search_handle.cancel()
             self.window.destroy()
@@ -0,0 +1,40 @@
+"""Записи, которые окна получают из БД: товары и заказы.
+
+Записи - именованные кортежи (__slots__ = ()): в памяти они занимают
+столько же, сколько обычный кортеж, поля читаются по имени, а индексы
+(catalog.ID, catalog.STOCK, ...) продолжают работать.
+"""
+
+from collections import namedtuple
+
+
+class Product(namedtuple("Product", [
+    "id", "article", "name", "category", "description", "manufacturer",
+    "supplier", "price", "unit", "stock", "discount", "photo_path",
+])):
+    """Товар в порядке колонок catalog.PRODUCT_COLUMNS.
+
+    В карточках каталога (PRODUCT_CARD_COLUMNS) description - только
+    начало описания; полный текст загружает catalog.load_product.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Строки запроса -> список записей"""
+        return [cls._make(row) for row in rows]
+
+
+class Order(namedtuple("Order", [
+    "id", "number", "articles", "order_date", "delivery_date",
+    "pickup_address", "status",
+])):
+    """Заказ в списке заказов (колонки order_window.ORDER_CARD_COLUMNS)"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Строки запроса -> список записей"""
+        return [cls._make(row) for row in rows]
@@ -0,0 +1,59 @@
+"""Позиции заказа: разбор строки артикулов и запись в таблицу order_items"""
+
+
+def parse_order_articles(text):
+    """Разобрать строку заказа "А112Т4, 2, F635R4, 2" в [("А112Т4", 2), ("F635R4", 2)].
+
+    Повторяющиеся артикулы складываются. Неверный формат -> ValueError.
+    """
+    parts = [p.strip() for p in str(text or "").split(",") if p.strip()]
+    if len(parts) % 2:
+        raise ValueError(f"ожидались пары 'артикул, количество': '{text}'")
+
+    items = {}
+    for article, quantity in zip(parts[::2], parts[1::2]):
+        try:
+            quantity = int(quantity)
+        except ValueError:
+            raise ValueError(f"количество '{quantity}' для артикула {article}")
+        if quantity <= 0:
+            raise ValueError(f"количество для артикула {article} должно быть > 0")
+        items[article] = items.get(article, 0) + quantity
+    return list(items.items())
+
+
+def format_order_articles(items):
+    """Обратное к parse_order_articles: [("А112Т4", 2)] -> "А112Т4, 2" """
+    return ", ".join(f"{article}, {quantity}" for article, quantity in items)
+
+
+def save_order_items(db, order_id, items):
+    """Заменить позиции заказа; возвращает список неизвестных артикулов"""
+    articles = [article for article, _ in items]
+    known = db.execute_query(
+        "SELECT article FROM products WHERE article = ANY(%s)", (articles,)
+    ) or []
+    known = {r[0] for r in known}
+
+    # Одним запросом: удалить исчезнувшие позиции и записать остальные
+    ok = db.execute_update(
+        """
+        WITH wanted AS (
+            SELECT p.id AS product_id, v.quantity
+            FROM unnest(%s::text[], %s::int[]) AS v(article, quantity)
+            JOIN products p ON p.article = v.article
+        ), removed AS (
+            DELETE FROM order_items
+            WHERE order_id = %s
+              AND product_id NOT IN (SELECT product_id FROM wanted)
+        )
+        INSERT INTO order_items (order_id, product_id, quantity)
+        SELECT %s, product_id, quantity FROM wanted
+        ON CONFLICT (order_id, product_id)
+        DO UPDATE SET quantity = EXCLUDED.quantity
+        """,
+        (articles, [quantity for _, quantity in items], order_id, order_id),
+    )
+    if not ok:
+        raise RuntimeError("не удалось сохранить позиции заказа")
+    return [article for article in articles if article not in known]
@@ -1,9 +1,67 @@
 """Окно управления заказами с красивым макетом"""
 
+import queue
 import tkinter as tk
+from collections import OrderedDict
+from datetime import date, datetime
 from tkinter import ttk, messagebox
 from config import Config
+from database import off_row_change, on_row_change
+from models import Order
+from query_cache import ALL_TABLES
 from styles import Styles
+from order_items import (
+    format_order_articles,
+    parse_order_articles,
+    save_order_items,
+)
+
+# Позиции заказа одной строкой "А112Т4, 2, F635R4, 2" (алиас заказа - o).
+# Пока у заказа нет строк в order_items, показывается старый order_articles.
+ORDER_ITEMS_JOIN = """
+    LEFT JOIN LATERAL (
+        SELECT string_agg(pr.article || ', ' || oi.quantity, ', '
+                          ORDER BY pr.article) AS articles
+        FROM order_items oi
+        JOIN products pr ON pr.id = oi.product_id
+        WHERE oi.order_id = o.id
+    ) items ON TRUE
+"""
+
+# Колонки карточки заказа (models.Order); FROM orders o + pickup_points p
+# + ORDER_ITEMS_JOIN. Клиент и код получения нужны только окну редактирования
+ORDER_CARD_COLUMNS = """
+    o.id, o.order_number, COALESCE(items.articles, o.order_articles),
+    o.order_date, o.delivery_date, p.address, o.status
+"""
+
+DATE_FORMAT = "%d.%m.%Y"
+
+# Период разбора уведомлений об изменённых заказах (мс)
+ROW_CHANGES_POLL_MS = 500
+
+
+def parse_date(text):
+    """'27.02.2025' или '2025-02-27' -> date; пустая строка -> None.
+
+    Неверная дата -> ValueError.
+    """
+    text = text.strip()
+    if not text:
+        return None
+    for fmt in (DATE_FORMAT, "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"неверная дата '{text}', ожидается ДД.ММ.ГГГГ")
+
+
+def format_date(value):
+    """date -> '27.02.2025' для отображения"""
+    if isinstance(value, date):
+        return value.strftime(DATE_FORMAT)
+    return "" if value is None else str(value)
 
 
 class OrderWindow:
@@ -13,12 +71,29 @@ class OrderWindow:
         self.parent = parent
         self.user_role = user_role
         self.db = db
+        # Постраничная загрузка: номер последнего показанного заказа
+        self._orders_last_number = None
+        self._orders_exhausted = True
+        self._orders_loading = False
+        self._date_range = (None, None)
+        # Карточки показанных заказов по id, в порядке списка
+        self._order_cards = OrderedDict()
+        self._orders_message = None
+        # Изменения заказов с любых рабочих мест (из потока слушателя БД)
+        self._row_changes = queue.Queue()
+        on_row_change(self._row_changes.put)
         self.window = tk.Toplevel(parent)
         self.window.title("ООО «Обувь» – Заказы")
         self.window.geometry("1200x700")
+        self.window.bind("<Destroy>", self._on_destroy)
         Styles.configure_styles()
         self._build_ui()
         self.window.after(100, self.load_orders)
+        self.window.after(ROW_CHANGES_POLL_MS, self._apply_row_changes)
+
+    def _on_destroy(self, event):
+        if event.widget is self.window:
+            off_row_change(self._row_changes.put)
 
     # ---------- ПОСТРОЕНИЕ UI ----------
 
@@ -42,6 +117,27 @@ class OrderWindow:
         status_combo.pack(side=tk.LEFT, padx=5)
         status_combo.bind("<<ComboboxSelected>>", lambda e: self.load_orders())
 
+        # Период по дате заказа (ДД.ММ.ГГГГ, любая граница может быть пустой)
+        ttk.Label(filter_frame, text="Дата заказа с:").pack(side=tk.LEFT, padx=(15, 5))
+        self.date_from_var = tk.StringVar()
+        date_from = ttk.Entry(filter_frame, textvariable=self.date_from_var, width=12)
+        date_from.pack(side=tk.LEFT, padx=5)
+
+        ttk.Label(filter_frame, text="по:").pack(side=tk.LEFT, padx=5)
+        self.date_to_var = tk.StringVar()
+        date_to = ttk.Entry(filter_frame, textvariable=self.date_to_var, width=12)
+        date_to.pack(side=tk.LEFT, padx=5)
+
+        for entry in (date_from, date_to):
+            entry.bind("<Return>", lambda e: self.load_orders())
+
+        ttk.Button(
+            filter_frame,
+            text="Применить",
+            style="Secondary.TButton",
+            command=self.load_orders,
+        ).pack(side=tk.LEFT, padx=5)
+
         # Кнопки действий
         btn_frame = ttk.Frame(self.window)
         btn_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -78,8 +174,10 @@ class OrderWindow:
             command=self.canvas.yview,
         )
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar = scrollbar
 
-        self.canvas.config(yscrollcommand=scrollbar.set)
+        # Прокрутка к концу списка догружает следующую страницу заказов
+        self.canvas.config(yscrollcommand=self._on_yscroll)
 
         # Frame для карточек внутри canvas
         self.cards_frame = tk.Frame(self.canvas, bg="#F5F5F5")
@@ -110,6 +208,13 @@ class OrderWindow:
         """Растягивать фрейм с карточками по ширине canvas"""
         self.canvas.itemconfig(self.canvas_window_id, width=event.width)
 
+    def _on_yscroll(self, first, last):
+        """Обновить скроллбар и догрузить страницу у конца списка"""
+        self.scrollbar.set(first, last)
+        if float(last) > 0.9 and not self._orders_exhausted and not self._orders_loading:
+            self._orders_loading = True
+            self.window.after_idle(self._load_orders_page)
+
     def _on_mousewheel(self, event):
         """Обработать скролл мышью"""
         if hasattr(event, "delta") and event.delta:
@@ -126,99 +231,227 @@ class OrderWindow:
     # ---------- ЗАГРУЗКА И ОТРИСОВКА ЗАКАЗОВ ----------
 
     def load_orders(self):
-        """Загрузить заказы и перерисовать карточки"""
-
-        # Очистить старые карточки
-        for child in self.cards_frame.winfo_children():
-            child.destroy()
+        """Загрузить первую страницу заказов (фильтры изменились)"""
+        try:
+            self._date_range = (
+                parse_date(self.date_from_var.get()),
+                parse_date(self.date_to_var.get()),
+            )
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e), parent=self.window)
+            return
+
+        self.canvas.yview_moveto(0)
+        self._reload_orders(Config.PAGE_SIZE)
+
+    def refresh_orders(self):
+        """Перечитать уже загруженные заказы после сохранения или удаления:
+        прокрутка сохраняется, а перерисовываются только изменившиеся,
+        добавленные, удалённые или сдвинувшиеся карточки."""
+        self._reload_orders(max(len(self._order_cards), Config.PAGE_SIZE))
+
+    def _reload_orders(self, limit):
+        """Заменить показанные заказы первыми limit заказами по фильтрам"""
+        self._orders_loading = True
+        try:
+            orders = self._fetch_orders(limit)
+            self._orders_exhausted = len(orders) < limit
+            self._orders_last_number = orders[-1].number if orders else None
+            self._reconcile_order_cards(orders)
+        except Exception as e:
+            self._show_orders_error(e)
+        finally:
+            self._orders_loading = False
 
+    def _load_orders_page(self):
+        """Дописать следующую страницу заказов (keyset по order_number DESC)"""
+        self._orders_loading = True
         try:
-            status = self.status_var.get()
-            base_query = """
-            SELECT
-                o.id,
-                o.order_number,
-                o.client_name,
-                o.order_articles,
-                o.order_date,
-                o.delivery_date,
-                p.address,
-                o.pickup_code,
-                o.status
-            FROM orders o
-            LEFT JOIN pickup_points p ON o.pickup_point_id = p.id
-            """
-
-            if status == "Все статусы":
-                query = base_query + " ORDER BY o.order_number DESC"
-                rows = self.db.execute_query(query)
-            else:
-                query = (
-                    base_query + " WHERE o.status = %s ORDER BY o.order_number DESC"
-                )
-                rows = self.db.execute_query(query, (status,))
-
-            if not rows:
-                label = tk.Label(
-                    self.cards_frame,
-                    text="Заказы не найдены",
-                    bg="#F5F5F5",
-                    font=("Segoe UI", 10),
+            orders = self._fetch_orders(Config.PAGE_SIZE, self._orders_last_number)
+            self._orders_exhausted = len(orders) < Config.PAGE_SIZE
+            if orders:
+                self._orders_last_number = orders[-1].number
+                self._reconcile_order_cards(
+                    [card.order for card in self._order_cards.values()] + orders
                 )
-                label.pack(anchor="w", pady=10, padx=10)
+        except Exception as e:
+            self._show_orders_error(e)
+        finally:
+            self._orders_loading = False
+
+    def _fetch_orders(self, limit, before_number=None, ids=None):
+        """Заказы по текущим фильтрам: номера меньше before_number,
+        только с данными ids (если заданы), не больше limit"""
+        status = self.status_var.get()
+        query = "SELECT " + ORDER_CARD_COLUMNS + """
+        FROM orders o
+        LEFT JOIN pickup_points p ON o.pickup_point_id = p.id
+        """ + ORDER_ITEMS_JOIN + """
+        WHERE 1=1
+        """
+        params = []
+
+        if status != "Все статусы":
+            query += " AND o.status = %s"
+            params.append(status)
+
+        date_from, date_to = self._date_range
+        if date_from is not None:
+            query += " AND o.order_date >= %s"
+            params.append(date_from)
+        if date_to is not None:
+            query += " AND o.order_date <= %s"
+            params.append(date_to)
+
+        if before_number is not None:
+            query += " AND o.order_number < %s"
+            params.append(before_number)
+        if ids is not None:
+            query += " AND o.id = ANY(%s)"
+            params.append(list(ids))
+
+        query += " ORDER BY o.order_number DESC LIMIT %s"
+        params.append(limit)
+
+        # Фильтры дают несколько вариантов текста, каждый готовится
+        # на соединении один раз
+        rows = self.db.execute_query(query, params, prepare=True)
+        if rows is None:
+            raise RuntimeError("не удалось загрузить заказы")
+        return Order.from_rows(rows)
+
+    def _apply_row_changes(self):
+        """Обновить карточки заказов, изменённых где угодно (on_row_change).
+
+        Удалённые заказы убираются, изменённые перечитываются по id с
+        текущими фильтрами: подходящие перепривязываются к своей карточке,
+        переставшие подходить - убираются. Новые заказы, смена номера
+        (ключа сортировки), изменения вне списка при включённом фильтре
+        и слишком большие изменения перечитывают список (refresh_orders).
+        """
+        changes = []
+        while True:
+            try:
+                changes += self._row_changes.get_nowait()
+            except queue.Empty:
+                break
+        changes = [c for c in changes if c.table in ("orders", ALL_TABLES)]
+        try:
+            if changes and not self._orders_loading:
+                self._apply_order_changes(changes)
+            elif changes:
+                # Страница ещё загружается - разобрать в следующий раз
+                self._row_changes.put(changes)
+        except Exception as e:
+            print(f"⚠ Ошибка обновления заказов: {e}")
+        finally:
+            if self.window.winfo_exists():
+                self.window.after(ROW_CHANGES_POLL_MS, self._apply_row_changes)
+
+    def _apply_order_changes(self, changes):
+        updated, deleted = set(), set()
+        for change in changes:
+            if change.ids is None or change.op == "INSERT":
+                self.refresh_orders()
                 return
+            if change.op == "DELETE":
+                deleted.update(change.ids)
+            else:
+                updated.update(change.ids)
 
-            for row in rows:
-                (
-                    order_id,
-                    order_num,
-                    client_name,
-                    articles,
-                    order_date,
-                    delivery_date,
-                    pickup_addr,
-                    pickup_code,
-                    status_val,
-                ) = row
-
-                self._create_order_card(
-                    order_id,
-                    order_num,
-                    client_name,
-                    articles,
-                    order_date,
-                    delivery_date,
-                    pickup_addr,
-                    status_val,
-                )
-
-        except Exception as e:
-            print(f"Ошибка загрузки заказов: {e}")
-            label = tk.Label(
+        loaded = {i for i in updated - deleted if i in self._order_cards}
+        filtered = (
+            self.status_var.get() != "Все статусы"
+            or self._date_range != (None, None)
+        )
+        # Заказ вне списка может начать подходить под фильтр
+        if updated - deleted - loaded and filtered:
+            self.refresh_orders()
+            return
+
+        fresh = {}
+        if loaded:
+            fresh = {o.id: o for o in self._fetch_orders(len(loaded), ids=loaded)}
+        orders = []
+        for order in (card.order for card in self._order_cards.values()):
+            if order.id in deleted:
+                continue
+            if order.id in loaded:
+                if order.id not in fresh:
+                    continue
+                if fresh[order.id].number != order.number:
+                    self.refresh_orders()
+                    return
+                order = fresh[order.id]
+            orders.append(order)
+        self._reconcile_order_cards(orders)
+
+    def _reconcile_order_cards(self, orders):
+        """Привести карточки к списку orders по id заказа.
+
+        Карточки исчезнувших заказов удаляются, новых - создаются,
+        изменившиеся заказы перепривязываются к своей карточке, а заново
+        упаковываются только добавленные и сдвинувшиеся карточки.
+        """
+        self._set_orders_message(None)
+        wanted = {order.id for order in orders}
+        for order_id in [i for i in self._order_cards if i not in wanted]:
+            self._order_cards.pop(order_id).destroy()
+
+        packed = list(self._order_cards.values())
+        cards = OrderedDict()
+        for position, order in enumerate(orders):
+            card = self._order_cards.get(order.id)
+            if card is None:
+                card = self._create_order_card()
+            if card.order != order:
+                self._bind_order_card(card, order)
+            cards[order.id] = card
+
+            if position < len(packed) and packed[position] is card:
+                continue
+            if position == 0:
+                if packed:
+                    card.pack(fill=tk.X, expand=True, before=packed[0])
+                else:
+                    card.pack(fill=tk.X, expand=True)
+            else:
+                card.pack(fill=tk.X, expand=True, after=cards[orders[position - 1].id])
+            if card in packed:
+                packed.remove(card)
+            packed.insert(position, card)
+        self._order_cards = cards
+
+        if not cards:
+            self._set_orders_message("Заказы не найдены")
+
+    def _show_orders_error(self, error):
+        print(f"Ошибка загрузки заказов: {error}")
+        self._orders_exhausted = True
+        self._set_orders_message(f"Ошибка: {error}", fg="red")
+
+    def _set_orders_message(self, text, fg="black"):
+        """Надпись вместо списка ("Заказы не найдены", ошибка); None - убрать"""
+        if self._orders_message is not None:
+            self._orders_message.destroy()
+            self._orders_message = None
+        if text is not None:
+            self._orders_message = tk.Label(
                 self.cards_frame,
-                text=f"Ошибка: {e}",
+                text=text,
                 bg="#F5F5F5",
-                fg="red",
+                fg=fg,
                 font=("Segoe UI", 10),
             )
-            label.pack(anchor="w", pady=10, padx=10)
-
-    def _create_order_card(
-        self,
-        order_id,
-        order_num,
-        client_name,
-        articles,
-        order_date,
-        delivery_date,
-        pickup_addr,
-        status,
-    ):
-        """Создать карточку заказа как на макете"""
+            self._orders_message.pack(anchor="w", pady=10, padx=10)
+
+    def _create_order_card(self):
+        """Построить пустую карточку заказа как на макете
+        (заполняется в _bind_order_card)"""
 
         # Основная карточка (контейнер)
         card = tk.Frame(self.cards_frame, bg="white", relief=tk.SOLID, bd=1)
-        card.pack(fill=tk.X, expand=True)
+        card.order = None
 
         # Левая часть (основная инфо) и правая (дата доставки)
         left_frame = tk.Frame(card, bg="white")
@@ -228,103 +461,85 @@ class OrderWindow:
         right_frame.pack(side=tk.RIGHT, fill=tk.BOTH, padx=0, pady=0)
         right_frame.pack_propagate(False)
 
+        def caption(container, text, **pack):
+            tk.Label(
+                container,
+                text=text,
+                font=("Segoe UI", 9, "bold"),
+                bg="white",
+                fg="#333333",
+                justify="center",
+            ).pack(**pack)
+
+        def value(container, **options):
+            label = tk.Label(
+                container,
+                font=options.pop("font", ("Segoe UI", 10)),
+                bg="white",
+                fg="#000000",
+                **options,
+            )
+            return label
+
         # ===== ЛЕВАЯ ЧАСТЬ =====
 
         # Строка 1: Артикулы заказа
-        tk.Label(
-            left_frame,
-            text="Артикул заказа",
-            font=("Segoe UI", 9, "bold"),
-            bg="white",
-            fg="#333333",
-        ).pack(anchor="w", pady=(0, 2))
-
-        tk.Label(
-            left_frame,
-            text=articles,
-            font=("Segoe UI", 10),
-            bg="white",
-            fg="#000000",
-        ).pack(anchor="w", pady=(0, 8))
+        caption(left_frame, "Артикул заказа", anchor="w", pady=(0, 2))
+        articles = value(left_frame)
+        articles.pack(anchor="w", pady=(0, 8))
 
         # Строка 2: Статус заказа
-        tk.Label(
-            left_frame,
-            text="Статус заказа",
-            font=("Segoe UI", 9, "bold"),
-            bg="white",
-            fg="#333333",
-        ).pack(anchor="w", pady=(0, 2))
-
-        tk.Label(
-            left_frame,
-            text=status,
-            font=("Segoe UI", 10),
-            bg="white",
-            fg="#000000",
-        ).pack(anchor="w", pady=(0, 8))
+        caption(left_frame, "Статус заказа", anchor="w", pady=(0, 2))
+        status = value(left_frame)
+        status.pack(anchor="w", pady=(0, 8))
 
         # Строка 3: Адрес пункта выдачи
-        tk.Label(
-            left_frame,
-            text="Адрес пункта выдачи (текст)",
-            font=("Segoe UI", 9, "bold"),
-            bg="white",
-            fg="#333333",
-        ).pack(anchor="w", pady=(0, 2))
-
-        tk.Label(
-            left_frame,
-            text=pickup_addr,
-            font=("Segoe UI", 10),
-            bg="white",
-            fg="#000000",
-            wraplength=600,
-            justify="left",
-        ).pack(anchor="w", pady=(0, 8))
+        caption(left_frame, "Адрес пункта выдачи (текст)", anchor="w", pady=(0, 2))
+        address = value(left_frame, wraplength=600, justify="left")
+        address.pack(anchor="w", pady=(0, 8))
 
         # Строка 4: Дата заказа
-        tk.Label(
-            left_frame,
-            text="Дата заказа",
-            font=("Segoe UI", 9, "bold"),
-            bg="white",
-            fg="#333333",
-        ).pack(anchor="w", pady=(0, 2))
-
-        tk.Label(
-            left_frame,
-            text=str(order_date),
-            font=("Segoe UI", 10),
-            bg="white",
-            fg="#000000",
-        ).pack(anchor="w")
+        caption(left_frame, "Дата заказа", anchor="w", pady=(0, 2))
+        order_date = value(left_frame)
+        order_date.pack(anchor="w")
 
         # ===== ПРАВАЯ ЧАСТЬ =====
 
-        tk.Label(
-            right_frame,
-            text="Дата доставки",
-            font=("Segoe UI", 9, "bold"),
-            bg="white",
-            fg="#333333",
-            justify="center",
-        ).pack(pady=(12, 5), expand=True, fill=tk.X)
-
-        tk.Label(
-            right_frame,
-            text=str(delivery_date),
-            font=("Segoe UI", 12, "bold"),
-            bg="white",
-            fg="#000000",
-            justify="center",
-        ).pack(expand=True, fill=tk.X, pady=(5, 12))
+        caption(
+            right_frame, "Дата доставки", pady=(12, 5), expand=True, fill=tk.X
+        )
+        delivery_date = value(
+            right_frame, font=("Segoe UI", 12, "bold"), justify="center"
+        )
+        delivery_date.pack(expand=True, fill=tk.X, pady=(5, 12))
 
         # ===== ДВОЙНОЙ КЛИК ДЛЯ РЕДАКТИРОВАНИЯ =====
-        
-        card.bind("<Double-Button-1>", lambda e: self.edit_order(order_id))
-        left_frame.bind("<Double-Button-1>", lambda e: self.edit_order(order_id))
-        right_frame.bind("<Double-Button-1>", lambda e: self.edit_order(order_id))
+
+        for widget in (card, left_frame, right_frame):
+            widget.bind(
+                "<Double-Button-1>", lambda e, c=card: self.edit_order(c.order.id)
+            )
+
+        card.widgets = {
+            "articles": articles,
+            "status": status,
+            "address": address,
+            "order_date": order_date,
+            "delivery_date": delivery_date,
+        }
+        return card
+
+    def _bind_order_card(self, card, order):
+        """Заполнить карточку данными заказа (Order)"""
+        card.order = order
+        w = card.widgets
+        # configure(text=None) не меняет текст: у переиспользуемой карточки
+        # остался бы текст прежнего заказа
+        w["articles"].configure(text=order.articles or "")
+        w["status"].configure(text=order.status or "")
+        w["address"].configure(text=order.pickup_address or "")
+        w["order_date"].configure(text=format_date(order.order_date))
+        w["delivery_date"].configure(text=format_date(order.delivery_date))
 
     def add_order(self):
         """Добавить новый заказ"""
@@ -345,9 +560,12 @@ class OrderWindow:
         if order_id:
             try:
                 query = """
-                SELECT order_number, order_articles, order_date, delivery_date,
-                pickup_point_id, client_name, pickup_code, status
-                FROM orders WHERE id = %s
+                SELECT o.order_number, COALESCE(items.articles, o.order_articles),
+                o.order_date, o.delivery_date,
+                o.pickup_point_id, o.client_name, o.pickup_code, o.status
+                FROM orders o
+                """ + ORDER_ITEMS_JOIN + """
+                WHERE o.id = %s
                 """
                 result = self.db.execute_query(query, (order_id,))
                 if result:
@@ -376,8 +594,8 @@ class OrderWindow:
         fields = {
             "Номер заказа": ("order_num_var", str(order_num) if order_id else ""),
             "Артикулы товаров": ("articles_var", str(articles) if articles else ""),
-            "Дата заказа": ("order_date_var", str(o_date) if o_date else ""),
-            "Дата доставки": ("delivery_date_var", str(d_date) if d_date else ""),
+            "Дата заказа": ("order_date_var", format_date(o_date) if o_date else ""),
+            "Дата доставки": ("delivery_date_var", format_date(d_date) if d_date else ""),
             "Клиент": ("client_var", str(client) if client else ""),
             "Код получения": ("code_var", str(code) if code else ""),
             "Статус": ("status_var", str(order_status) if order_status else "Обработка"),
@@ -412,53 +630,70 @@ class OrderWindow:
 
         def save_order():
             try:
-                if order_id:
-                    query = """
-                    UPDATE orders SET
-                        order_number=%s,
-                        order_articles=%s,
-                        order_date=%s,
-                        delivery_date=%s,
-                        client_name=%s,
-                        pickup_code=%s,
-                        status=%s
-                    WHERE id=%s
-                    """
-                    self.db.execute_update(
-                        query,
-                        (
-                            edit_vars["order_num_var"].get(),
-                            edit_vars["articles_var"].get(),
-                            edit_vars["order_date_var"].get(),
-                            edit_vars["delivery_date_var"].get(),
-                            edit_vars["client_var"].get(),
-                            edit_vars["code_var"].get(),
-                            edit_vars["status_var"].get(),
-                            order_id,
-                        ),
-                    )
-                else:
-                    query = """
-                    INSERT INTO orders
-                    (order_number, order_articles, order_date, delivery_date, client_name, pickup_code, status)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """
-                    self.db.execute_update(
-                        query,
-                        (
-                            edit_vars["order_num_var"].get(),
-                            edit_vars["articles_var"].get(),
-                            edit_vars["order_date_var"].get(),
-                            edit_vars["delivery_date_var"].get(),
-                            edit_vars["client_var"].get(),
-                            edit_vars["code_var"].get(),
-                            edit_vars["status_var"].get(),
-                        ),
+                items = parse_order_articles(edit_vars["articles_var"].get())
+            except ValueError as e:
+                messagebox.showerror("Ошибка", f"Неверный список артикулов: {e}")
+                return
+            try:
+                order_date = parse_date(edit_vars["order_date_var"].get())
+                delivery_date = parse_date(edit_vars["delivery_date_var"].get())
+            except ValueError as e:
+                messagebox.showerror("Ошибка", str(e))
+                return
+
+            try:
+                values = (
+                    edit_vars["order_num_var"].get(),
+                    format_order_articles(items),
+                    order_date,
+                    delivery_date,
+                    edit_vars["client_var"].get(),
+                    edit_vars["code_var"].get(),
+                    edit_vars["status_var"].get(),
+                )
+                # Заказ и его позиции сохраняются одной транзакцией
+                with self.db.transaction():
+                    if order_id:
+                        query = """
+                        UPDATE orders SET
+                            order_number=%s,
+                            order_articles=%s,
+                            order_date=%s,
+                            delivery_date=%s,
+                            client_name=%s,
+                            pickup_code=%s,
+                            status=%s
+                        WHERE id=%s
+                        """
+                        self.db.execute_update(query, values + (order_id,))
+                        saved_id = order_id
+                    else:
+                        query = """
+                        INSERT INTO orders
+                        (order_number, order_articles, order_date, delivery_date, client_name, pickup_code, status)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        """
+                        self.db.execute_update(query, values)
+                        result = self.db.execute_query(
+                            "SELECT id FROM orders WHERE order_number = %s",
+                            (values[0],),
+                        )
+                        if not result:
+                            raise RuntimeError("не удалось сохранить заказ")
+                        saved_id = result[0][0]
+
+                    unknown = save_order_items(self.db, saved_id, items)
+
+                if unknown:
+                    messagebox.showwarning(
+                        "Внимание",
+                        "Товары не найдены, позиции не сохранены: "
+                        + ", ".join(unknown),
                     )
 
                 messagebox.showinfo("Успех", "Заказ сохранён")
                 edit_window.destroy()
-                self.load_orders()
+                self.refresh_orders()
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Ошибка при сохранении: {e}")
 
@@ -485,7 +720,7 @@ class OrderWindow:
                         self.db.execute_update(query, (order_id,))
                         messagebox.showinfo("Успех", "Заказ удалён")
                         edit_window.destroy()
-                        self.load_orders()
+                        self.refresh_orders()
                     except Exception as e:
                         messagebox.showerror("Ошибка", f"Ошибка при удалении: {e}")
 
@@ -4,6 +4,7 @@ import os
 from PIL import Image, ImageTk
 from database import Database
 from config import Config
+from catalog import ensure_references, reference_id_sql
 
 
 class ProductWindow:
@@ -23,7 +24,7 @@ class ProductWindow:
             self.user_role = parent.parent.user_role
 
         # Путь к текущему фото
-        self.current_photo_path = product_data[11] if product_data else ""
+        self.current_photo_path = product_data.photo_path if product_data else ""
 
         # Сразу открываем диалог товара (БЕЗ окна со списком)
         self._show_product_dialog(self.product_data)
@@ -83,59 +84,58 @@ class ProductWindow:
         canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-        # product_data: (id, article, name, category, description,
-        # manufacturer, supplier, price, unit, stock, discount, photo_path)
+        # product_data: models.Product с полным описанием (catalog.load_product)
 
         fields = {
             "article": (
                 "Артикул*",
                 "entry",
-                product_data[1] if product_data else "",
+                product_data.article if product_data else "",
             ),
             "name": (
                 "Название*",
                 "entry",
-                product_data[2] if product_data else "",
+                product_data.name if product_data else "",
             ),
             "category": (
                 "Категория*",
                 "combobox",
-                product_data[3] if product_data else "",
+                product_data.category if product_data else "",
             ),
             "description": (
                 "Описание",
                 "text",
-                product_data[4] if product_data else "",
+                product_data.description if product_data else "",
             ),
             "manufacturer": (
                 "Производитель*",
                 "combobox",
-                product_data[5] if product_data else "",
+                product_data.manufacturer if product_data else "",
             ),
             "supplier": (
                 "Поставщик*",
                 "entry",
-                product_data[6] if product_data else "",
+                product_data.supplier if product_data else "",
             ),
             "price": (
                 "Цена (руб.)*",
                 "entry",
-                str(product_data[7]) if product_data else "",
+                str(product_data.price) if product_data else "",
             ),
             "unit": (
                 "Единица*",
                 "combobox",
-                product_data[8] if product_data else "",
+                product_data.unit if product_data else "",
             ),
             "stock": (
                 "На складе*",
                 "entry",
-                str(product_data[9]) if product_data else "",
+                str(product_data.stock) if product_data else "",
             ),
             "discount": (
                 "Скидка (%)*",
                 "entry",
-                str(product_data[10]) if product_data else "0",
+                str(product_data.discount) if product_data else "0",
             ),
         }
 
@@ -161,12 +161,12 @@ class ProductWindow:
                 combo = ttk.Combobox(scrollable_frame, width=27, state="readonly")
 
                 if field_name == "category":
-                    q = "SELECT DISTINCT category FROM products ORDER BY category"
-                    res = self.db.execute_query(q)
+                    q = "SELECT name FROM categories ORDER BY name"
+                    res = self.db.execute_query(q, cache=True)
                     combo["values"] = [r[0] for r in res] if res else []
                 elif field_name == "manufacturer":
-                    q = "SELECT DISTINCT manufacturer FROM products ORDER BY manufacturer"
-                    res = self.db.execute_query(q)
+                    q = "SELECT name FROM manufacturers ORDER BY name"
+                    res = self.db.execute_query(q, cache=True)
                     combo["values"] = [r[0] for r in res] if res else []
                 elif field_name == "unit":
                     combo["values"] = Config.UNITS
@@ -322,70 +322,82 @@ class ProductWindow:
                     )
                     return
 
+                # Новые справочные значения и сам товар - одной транзакцией:
+                # при ошибке в справочниках не остаётся лишних записей
+                names = {
+                    field: [data[field]]
+                    for field in ("category", "manufacturer", "supplier")
+                }
+                try:
+                    with self.db.transaction():
+                        ensure_references(self.db, names)
+                        if product_data:
+                            query = f"""
+                            UPDATE products SET
+                                name=%s,
+                                category_id={reference_id_sql("category")},
+                                description=%s,
+                                manufacturer_id={reference_id_sql("manufacturer")},
+                                supplier_id={reference_id_sql("supplier")},
+                                price=%s,
+                                unit=%s,
+                                stock=%s,
+                                discount=%s,
+                                photo_path=%s
+                            WHERE article=%s
+                            """
+                            self.db.execute_update(
+                                query,
+                                (
+                                    data["name"],
+                                    data["category"],
+                                    data["description"],
+                                    data["manufacturer"],
+                                    data["supplier"],
+                                    float(data["price"]),
+                                    data["unit"],
+                                    int(data["stock"]),
+                                    int(data["discount"]),
+                                    self.current_photo_path,
+                                    data["article"],
+                                ),
+                            )
+                        else:
+                            query = f"""
+                            INSERT INTO products
+                                (article, name, category_id, description, manufacturer_id,
+                                 supplier_id, price, unit, stock, discount, photo_path)
+                            VALUES (%s, %s, {reference_id_sql("category")}, %s,
+                                    {reference_id_sql("manufacturer")},
+                                    {reference_id_sql("supplier")},
+                                    %s, %s, %s, %s, %s)
+                            """
+                            self.db.execute_update(
+                                query,
+                                (
+                                    data["article"],
+                                    data["name"],
+                                    data["category"],
+                                    data["description"],
+                                    data["manufacturer"],
+                                    data["supplier"],
+                                    float(data["price"]),
+                                    data["unit"],
+                                    int(data["stock"]),
+                                    int(data["discount"]),
+                                    self.current_photo_path,
+                                ),
+                            )
+                except Exception as e:
+                    action = "обновить" if product_data else "добавить"
+                    messagebox.showerror("Ошибка", f"Не удалось {action} товар: {e}")
+                    return
+
                 if product_data:
-                    query = """
-                    UPDATE products SET
-                        name=%s,
-                        category=%s,
-                        description=%s,
-                        manufacturer=%s,
-                        supplier=%s,
-                        price=%s,
-                        unit=%s,
-                        stock=%s,
-                        discount=%s,
-                        photo_path=%s
-                    WHERE article=%s
-                    """
-                    ok = self.db.execute_update(
-                        query,
-                        (
-                            data["name"],
-                            data["category"],
-                            data["description"],
-                            data["manufacturer"],
-                            data["supplier"],
-                            float(data["price"]),
-                            data["unit"],
-                            int(data["stock"]),
-                            int(data["discount"]),
-                            self.current_photo_path,
-                            data["article"],
-                        ),
-                    )
-                    if ok:
-                        messagebox.showinfo("Успех", "Товар обновлён")
-                        on_closing()
-                    else:
-                        messagebox.showerror("Ошибка", "Не удалось обновить товар")
+                    messagebox.showinfo("Успех", "Товар обновлён")
                 else:
-                    query = """
-                    INSERT INTO products
-                        (article, name, category, description, manufacturer,
-                         supplier, price, unit, stock, discount, photo_path)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """
-                    ok = self.db.execute_update(
-                        query,
-                        (
-                            data["article"],
-                            data["name"],
-                            data["category"],
-                            data["description"],
-                            data["manufacturer"],
-                            data["supplier"],
-                            float(data["price"]),
-                            data["unit"],
-                            int(data["stock"]),
-                            int(data["discount"]),
-                            self.current_photo_path,
-                        ),
-                    )
-                    if ok:
-                        messagebox.showinfo("Успех", "Товар добавлен")
-                        on_closing()
-                    else:
-                        messagebox.showerror("Ошибка", "Не удалось добавить товар")
+                    messagebox.showinfo("Успех", "Товар добавлен")
+                on_closing()
 
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Ошибка: {e}")
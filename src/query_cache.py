@@ -0,0 +1,245 @@
+"""Кэш результатов SELECT с вытеснением по изменённым таблицам"""
+
+import json
+import re
+import select
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import psycopg2
+import psycopg2.extensions
+from config import Config
+
+# Таблицы, из которых читает запрос (FROM/JOIN)
+_READ_TABLES = re.compile(
+    r"\b(?:FROM|JOIN)\s+(?:ONLY\s+)?(?!LATERAL\b)([a-z_][a-z0-9_]*)", re.I
+)
+# Таблицы, которые меняет запрос
+_WRITE_TABLES = re.compile(
+    r"\b(?:INSERT\s+INTO|(?<!DO\s)UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?"
+    r"|ALTER\s+TABLE(?:\s+IF\s+EXISTS)?|DROP\s+TABLE(?:\s+IF\s+EXISTS)?)"
+    r"\s+(?:ONLY\s+)?([a-z_][a-z0-9_]*)",
+    re.I,
+)
+
+
+# Изменённые таблицы не удалось определить по тексту запроса
+ALL_TABLES = "*"
+
+# Изменение строк таблицы из канала Config.ROW_CHANGES_CHANNEL:
+# op - 'INSERT', 'UPDATE' или 'DELETE'; ids - id строк или None, если
+# их слишком много. RowChange(ALL_TABLES, None, None) - уведомления могли
+# потеряться (переподключение), измениться могло что угодно
+RowChange = namedtuple("RowChange", ["table", "op", "ids"])
+
+
+def read_tables(query):
+    """Имена таблиц, от которых зависит результат SELECT"""
+    return {name.lower() for name in _READ_TABLES.findall(query)}
+
+
+def write_tables(query):
+    """Имена таблиц, которые меняет запрос, или {ALL_TABLES}"""
+    return {name.lower() for name in _WRITE_TABLES.findall(query)} or {ALL_TABLES}
+
+
+def _normalize(query):
+    return " ".join(query.split())
+
+
+class QueryCache:
+    """Потокобезопасный LRU-кэш результатов запросов.
+
+    Ключ - запрос без лишних пробелов и параметры. Запись живёт не дольше
+    ttl секунд, записей не больше max_entries (старые вытесняются первыми).
+    invalidate(tables) удаляет все записи, читавшие хоть одну из таблиц.
+
+    Запрос, начатый до записи и закончившийся после invalidate, вернул бы
+    в кэш уже устаревшие строки. Поэтому у каждой таблицы есть счётчик
+    вытеснений: version(tables) читается до выполнения запроса, и put()
+    с этой версией ничего не сохраняет, если таблицы успели измениться.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (rows, tables, срок годности)
+        self._by_table = {}  # таблица -> {key}
+        self._generations = {}  # таблица -> число вытеснений
+        self._epoch = 0  # число полных очисток
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(query, params=None):
+        return _normalize(query), repr(params)
+
+    def get(self, key):
+        """Строки из кэша или None (нет записи или она устарела)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[0])
+
+    def version(self, tables):
+        """Версия таблиц для put(): меняется при каждом их вытеснении"""
+        with self._lock:
+            return self._version(tables)
+
+    def _version(self, tables):
+        return self._epoch, tuple(
+            self._generations.get(table, 0) for table in sorted(tables)
+        )
+
+    def put(self, key, rows, tables, version=None):
+        """Сохранить строки; с version - только если таблицы не менялись"""
+        with self._lock:
+            if version is not None and self._version(tables) != version:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (list(rows), tables, time.monotonic() + self.ttl)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tables):
+        """Удалить записи, зависящие от таблиц (ALL_TABLES - очистить всё)"""
+        with self._lock:
+            if ALL_TABLES in tables:
+                self._clear()
+                return
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._by_table.get(table, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._epoch += 1
+        self._entries.clear()
+        self._by_table.clear()
+
+    def _remove(self, key):
+        """Удалить запись (вызывать под блокировкой)"""
+        _, tables, _ = self._entries.pop(key)
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CacheListener(threading.Thread):
+    """Поток LISTEN: вытесняет из кэша таблицы, изменённые где угодно.
+
+    Database после каждой записи шлёт pg_notify(канал, имя таблицы) в той же
+    транзакции, поэтому уведомления приходят и от других рабочих мест, и от
+    процессов импорта. Держит собственное соединение вне пула; после обрыва
+    переподключается и очищает кэш целиком - пока соединения не было,
+    уведомления могли потеряться.
+
+    callbacks - функции callback(tables), которые тоже узнают об изменениях.
+    row_channel, row_callbacks - канал построчных уведомлений триггеров
+    и функции callback(changes), получающие список RowChange.
+    """
+
+    def __init__(self, cache, channel, callbacks=(), reconnect_delay=5,
+                 row_channel=None, row_callbacks=()):
+        super().__init__(name="query-cache-listener", daemon=True)
+        self.cache = cache
+        self.channel = channel
+        self.callbacks = callbacks
+        self.row_channel = row_channel
+        self.row_callbacks = row_callbacks
+        self.reconnect_delay = reconnect_delay
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                config = Config.DATABASE_CONFIG.copy()
+                config['client_encoding'] = 'UTF8'
+                conn = psycopg2.connect(**config)
+                conn.set_isolation_level(
+                    psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT
+                )
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+                    if self.row_channel:
+                        cur.execute(f"LISTEN {self.row_channel}")
+                self._changed({ALL_TABLES})
+                self._rows_changed([RowChange(ALL_TABLES, None, None)])
+                self._listen(conn)
+            except psycopg2.Error as e:
+                print(f"⚠ Кэш запросов: нет уведомлений от БД ({e})")
+                self._changed({ALL_TABLES})
+                self._rows_changed([RowChange(ALL_TABLES, None, None)])
+                self._stop_event.wait(self.reconnect_delay)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _listen(self, conn):
+        while not self._stop_event.is_set():
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                continue
+            conn.poll()
+            tables = set()
+            changes = []
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                if notify.channel == self.row_channel:
+                    change = self._parse_row_change(notify.payload)
+                    if change is not None:
+                        changes.append(change)
+                else:
+                    tables.add(notify.payload)
+            if tables:
+                self._changed(tables)
+            if changes:
+                self._rows_changed(changes)
+
+    @staticmethod
+    def _parse_row_change(payload):
+        try:
+            data = json.loads(payload)
+            return RowChange(data["table"], data["op"], data["ids"])
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠ Непонятное уведомление об изменении строк: {e}")
+            return None
+
+    def _changed(self, tables):
+        self.cache.invalidate(tables)
+        for callback in list(self.callbacks):
+            try:
+                callback(tables)
+            except Exception as e:
+                print(f"⚠ Ошибка обработчика изменений: {e}")
+
+    def _rows_changed(self, changes):
+        for callback in list(self.row_callbacks):
+            try:
+                callback(changes)
+            except Exception as e:
+                print(f"⚠ Ошибка обработчика изменений: {e}")
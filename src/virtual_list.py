@@ -0,0 +1,198 @@
+"""Виртуальный список карточек на Canvas с переиспользованием виджетов"""
+
+
+class VirtualCardList:
+    """Список карточек одинаковой высоты, в котором существуют только видимые.
+
+    Canvas прокручивает «виртуальную» область высотой len(rows) * row_height,
+    а на ней размещён небольшой пул карточек (видимые + overscan сверху и
+    снизу). Строка с индексом i всегда показывается карточкой i % размер_пула,
+    поэтому при прокрутке на одну строку перепривязывается одна карточка,
+    а число виджетов не зависит от количества строк. Карточка
+    перепривязывается, только если строка на её позиции изменилась
+    (сравнение ==), поэтому новый набор строк, совпадающий с показанным,
+    виджетов не трогает.
+
+    create_card(parent) -> tk.Frame   - построить пустую карточку
+    bind_card(card, row)              - заполнить карточку данными строки
+    unbind_card(card)                 - карточка ушла с экрана (необязательно)
+    on_near_end()                     - до конца загруженных строк осталось
+                                        меньше экрана: пора догрузить страницу
+    key(row)                          - идентификатор строки (например, id):
+                                        нужен для reconcile, update_row
+                                        и remove_key
+    """
+
+    def __init__(self, canvas, row_height, create_card, bind_card,
+                 overscan=2, empty_text="Ничего не найдено", unbind_card=None,
+                 on_near_end=None, key=None):
+        self.canvas = canvas
+        self.row_height = row_height
+        self.create_card = create_card
+        self.bind_card = bind_card
+        self.unbind_card = unbind_card
+        self.on_near_end = on_near_end
+        self.key = key
+        self.overscan = overscan
+        self.empty_text = empty_text
+
+        self.rows = []
+        self._cards = []      # [(frame, canvas item id)]
+        self._bound = []      # индекс строки, показанной карточкой (или None)
+        self._shown = []      # строка, показанная карточкой
+        self._positions = None  # key -> индекс строки (строится по запросу)
+        self._force = False   # перепривязать все видимые карточки
+        self._scroll_set = None
+        self._empty_item = None
+
+        canvas.configure(yscrollcommand=self._on_yscroll)
+        canvas.bind("<Configure>", lambda e: self._render(), add="+")
+
+    def attach_scrollbar(self, scrollbar):
+        """Связать вертикальный скроллбар со списком"""
+        self._scroll_set = scrollbar.set
+        scrollbar.configure(command=self.canvas.yview)
+
+    # ---------- ДАННЫЕ ----------
+
+    def set_rows(self, rows):
+        """Показать новый набор строк с начала списка"""
+        self.rows = list(rows)
+        self._positions = None
+        self._update_scrollregion()
+        self.canvas.yview_moveto(0)
+        self._render()
+
+    def append_rows(self, rows):
+        """Дописать следующую страницу строк, не сбрасывая прокрутку"""
+        self.rows.extend(rows)
+        self._positions = None
+        self._update_scrollregion()
+        self._render()
+
+    def reconcile(self, rows):
+        """Заменить строки, не сбрасывая прокрутку.
+
+        Верхняя видимая строка остаётся на экране на том же месте (ищется
+        по key), если она есть в новом наборе. Перепривязываются только
+        видимые карточки, строка которых изменилась, добавилась, удалилась
+        или сдвинулась.
+        """
+        top = int(self.canvas.canvasy(0))
+        first = top // self.row_height
+        anchor = None
+        if self.key is not None and first < len(self.rows):
+            anchor = self.key(self.rows[first])
+
+        self.rows = list(rows)
+        self._positions = None
+        index = self.index_of(anchor) if anchor is not None else None
+        if index is not None:
+            top += (index - first) * self.row_height
+        self._update_scrollregion()
+        height = len(self.rows) * self.row_height
+        if height:
+            self.canvas.yview_moveto(top / height)
+        self._render()
+
+    def index_of(self, key):
+        """Индекс строки с данным key или None"""
+        if self._positions is None:
+            self._positions = {self.key(row): i for i, row in enumerate(self.rows)}
+        return self._positions.get(key)
+
+    def update_row(self, row):
+        """Заменить строку с тем же key; False - такой строки в списке нет"""
+        index = self.index_of(self.key(row))
+        if index is None:
+            return False
+        self.rows[index] = row
+        self._render()
+        return True
+
+    def remove_key(self, key):
+        """Убрать строку с данным key; False - такой строки в списке нет"""
+        index = self.index_of(key)
+        if index is None:
+            return False
+        self.reconcile(self.rows[:index] + self.rows[index + 1:])
+        return True
+
+    def refresh(self):
+        """Перепривязать все видимые карточки (данные строк изменились)"""
+        self._force = True
+        self._render()
+
+    # ---------- ОТРИСОВКА ----------
+
+    def _update_scrollregion(self):
+        height = len(self.rows) * self.row_height
+        self.canvas.configure(
+            scrollregion=(0, 0, self.canvas.winfo_width(), height)
+        )
+
+        if self._empty_item is not None:
+            self.canvas.delete(self._empty_item)
+            self._empty_item = None
+        if not self.rows:
+            self._empty_item = self.canvas.create_text(
+                10, 10, text=self.empty_text, anchor="nw"
+            )
+
+    def _on_yscroll(self, first, last):
+        if self._scroll_set:
+            self._scroll_set(first, last)
+        self._render()
+
+    def _pool_size(self):
+        visible = self.canvas.winfo_height() // self.row_height + 2
+        return min(len(self.rows), visible + 2 * self.overscan)
+
+    def _render(self):
+        """Разместить карточки пула на позициях видимых строк"""
+        size = self._pool_size()
+        if size > len(self._cards):
+            while len(self._cards) < size:
+                frame = self.create_card(self.canvas)
+                item = self.canvas.create_window(
+                    0, 0, window=frame, anchor="nw", state="hidden"
+                )
+                self._cards.append((frame, item))
+                self._bound.append(None)
+                self._shown.append(None)
+            # Размер пула изменился - соответствие строка/карточка другое
+            self._force = True
+
+        pool = len(self._cards)
+        if pool == 0:
+            return
+
+        width = self.canvas.winfo_width()
+        top = int(self.canvas.canvasy(0))
+        first = max(0, top // self.row_height - self.overscan)
+        last = min(len(self.rows), first + min(pool, size))
+
+        shown = set()
+        for index in range(first, last):
+            slot = index % pool
+            frame, item = self._cards[slot]
+            shown.add(slot)
+            self.canvas.coords(item, 0, index * self.row_height)
+            self.canvas.itemconfigure(item, state="normal", width=width)
+            row = self.rows[index]
+            if self._force or self._bound[slot] != index or self._shown[slot] != row:
+                self.bind_card(frame, row)
+                self._bound[slot] = index
+                self._shown[slot] = row
+        self._force = False
+
+        if self.on_near_end and last + size >= len(self.rows):
+            self.on_near_end()
+
+        for slot, (frame, item) in enumerate(self._cards):
+            if slot not in shown and self._bound[slot] is not None:
+                self.canvas.itemconfigure(item, state="hidden")
+                self._bound[slot] = None
+                self._shown[slot] = None
+                if self.unbind_card:
+                    self.unbind_card(frame)